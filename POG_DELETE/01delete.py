@@ -1,6 +1,20 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 from typing import Dict, Optional, List, Tuple
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # 仓库根目录下的公共模块
+from layer_occupancy import LayerOccupancy
+from knapsack import knapsack_dp
+from layer_pool import run_layer_tasks, knapsack_01_layer
+from layer_spacing import respace_layers
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from pog_log import get_logger
+
+log = get_logger('delete_dp')
+
 
 class RemoveSKU:
     """
@@ -14,7 +28,7 @@ class RemoveSKU:
     def __init__(self):
         self.dataframes: Dict[str, pd.DataFrame] = {}
         self.affected_layers_by_removal: List[Tuple[int, int]] = []
-        print("✅ RemoveSKU 初始化完成。")
+        log.info("✅ RemoveSKU 初始化完成。")
 
     def remove_sku_items(self, var_dict: Dict):
         pog_data: pd.DataFrame = var_dict['bases_data']['pog_data']
@@ -24,8 +38,8 @@ class RemoveSKU:
         target_module_id = params.get('target_module_id', None) or params.get('module_id', None)
         target_layer_id = params.get('target_layer_id', None) or params.get('layer_id', None)
 
-        print(f"\n--- 开始执行 'remove_sku_items' 删除SKU: {delete_skus} ---")
-        print(f"🔎 限定检查层：module_id={target_module_id}, layer_id={target_layer_id}")
+        log.info("\n--- 开始执行 'remove_sku_items' 删除SKU: {delete_skus} ---", delete_skus=delete_skus)
+        log.info("🔎 限定检查层：module_id={target_module_id}, layer_id={target_layer_id}", target_module_id=target_module_id, target_layer_id=target_layer_id)
 
         # 基本检查
         if pog_data is None or pog_data.empty:
@@ -48,12 +62,12 @@ class RemoveSKU:
                 tray_pair_df['item_code'] = tray_pair_df['item_code'].astype(str)
                 for _, r in tray_pair_df.iterrows():
                     tray_links.setdefault(r['item_code'], []).append(r['tray_id'])
-                print(f"📦 载入 tray_item 映射，{len(tray_pair_df)} 条记录，映射项数 {len(tray_links)}。")
+                log.info("📦 载入 tray_item 映射，{tray_pair_df_count} 条记录，映射项数 {tray_links_count}。", tray_pair_df_count=len(tray_pair_df), tray_links_count=len(tray_links))
             except Exception as e:
-                print(f"⚠️ 处理 tray_item 文件时出错：{e}")
+                log.warning("⚠️ 处理 tray_item 文件时出错：{error}", error=e)
                 tray_links = {}
         else:
-            print("ℹ️ 未提供 tray_item 数据或文件为空，跳过 tray-item 映射检查。")
+            log.info("ℹ️ 未提供 tray_item 数据或文件为空，跳过 tray-item 映射检查。")
 
         # 如果用户未给定 target layer，提示报错（按你的设计需要指定）
         if target_module_id is None or target_layer_id is None:
@@ -110,7 +124,7 @@ class RemoveSKU:
         # 记录受影响层（只有目标层）
         self.affected_layers_by_removal = [(target_module_id, target_layer_id)]
 
-        print(f"🗑️ 已从指定层删除 {removed_num} 条 SKU（仅限指定层）。")
+        log.info("🗑️ 已从指定层删除 {removed_num} 条 SKU（仅限指定层）。", removed_num=removed_num)
         return new_pog, {'status': 'success', 'msg': f'成功删除 {removed_num} 个SKU', 'deleted_skus': delete_skus}
 
 
@@ -128,10 +142,13 @@ class FillLayerSKU(RemoveSKU):
         super().__init__()
         self.affected_layer_space: Optional[pd.DataFrame] = None
         self.sorted_items_by_position: Dict[Tuple[int, int], pd.DataFrame] = {}
-        self.sales_df: Optional[pd.DataFrame] = None
+        self.sales_index: Optional[SalesIndex] = None
+        self.layer_occupancy: Optional[LayerOccupancy] = None
         # 背包基准宽度 — 按你之前约定用 995mm 作为上限基准（可修改）
         self.dp_capacity_baseline = 995
-        print("✅ FillLayerSKU 初始化完成。")
+        # 各层背包求解的进程数（1 为当前进程内顺序求解，None/0 为CPU核数），可由 del_item_func.workers 覆盖
+        self.workers = 1
+        log.info("✅ FillLayerSKU 初始化完成。")
 
     def analyze_layer_space(self, pog_data: pd.DataFrame, total_layer_width: int = None) -> pd.DataFrame:
         # 如果未传 total_layer_width，则使用 baseline（以便保持一致）
@@ -139,28 +156,24 @@ class FillLayerSKU(RemoveSKU):
             total_layer_width = self.dp_capacity_baseline
         if pog_data.empty:
             return pd.DataFrame(columns=['module_id', 'layer_id', 'item_count', 'used_width', 'remaining_width'])
-        layer_summary = pog_data.groupby(['module_id', 'layer_id']).agg(
-            used_width=('item_width', 'sum'),
-            item_count=('item_code', 'count')
-        ).reset_index()
-        layer_summary['total_width'] = total_layer_width
-        layer_summary['remaining_width'] = layer_summary['total_width'] - layer_summary['used_width']
-        return layer_summary
+        # 一行即一个陈列单元（不乘 facing），空间汇总由层占用索引给出，后续按层查询不再扫描 pog_data
+        self.layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=False, total_width=total_layer_width)
+        return self.layer_occupancy.summary()
 
     def calculate_space_for_affected_layers(self, pog_data: pd.DataFrame, total_layer_width: int = None):
-        print("\n--- 计算受影响层剩余空间 ---")
+        log.info("\n--- 计算受影响层剩余空间 ---")
         if total_layer_width is None:
             total_layer_width = self.dp_capacity_baseline
         if not self.affected_layers_by_removal:
-            print("ℹ️ 无受影响层。")
+            log.info("ℹ️ 无受影响层。")
             return
         all_layers = self.analyze_layer_space(pog_data, total_layer_width)
         affected = all_layers.set_index(['module_id', 'layer_id']).reindex(self.affected_layers_by_removal)
         self.affected_layer_space = affected.reset_index()
-        print("✅ 受影响层空间计算完成。")
+        log.info("✅ 受影响层空间计算完成。")
 
     def sort_items_by_position(self, pog_data: pd.DataFrame):
-        print("\n--- 排序受影响层内商品 ---")
+        log.info("\n--- 排序受影响层内商品 ---")
         self.sorted_items_by_position.clear()
         for mod_id, lay_id in self.affected_layers_by_removal:
             df = pog_data[(pog_data['module_id'] == mod_id) & (pog_data['layer_id'] == lay_id)].copy()
@@ -168,7 +181,7 @@ class FillLayerSKU(RemoveSKU):
                 continue
             sorted_df = df.sort_values(by='position')
             self.sorted_items_by_position[(mod_id, lay_id)] = sorted_df
-        print("✅ 排序完成。")
+        log.info("✅ 排序完成。")
 
     @staticmethod
     def _knapsack_01(weights: List[int], values: List[float], capacity: int):
@@ -176,81 +189,59 @@ class FillLayerSKU(RemoveSKU):
         0-1 knapsack dynamic programming (returns indices selected)
         weights: list of positive ints
         values: list of floats (values)
-        capacity: int capacity
+        capacity: int capacity（层剩余宽度，毫米；不同 module_meter 宽度共用同一实现）
         返回: set(selected indices)
+
+        由 knapsack.knapsack_dp 求解（与 layer_pool.knapsack_01_layer 逐层求解所用的实现相同），
+        仅在严格更优时选入、从满容量回溯，结果与逐格循环一致
         """
-        n = len(weights)
-        if n == 0 or capacity <= 0:
+        if len(weights) == 0 or capacity <= 0:
             return set()
-
-        # dp[w] = max value achievable with capacity w
-        dp = [0.0] * (capacity + 1)
-        # keep choice info: for reconstruction, keep a 2D predecessor or use item-based backtracking table
-        # 为节省内存，用二维表记录是否选择 item i at capacity w
-        choose = [[False] * (capacity + 1) for _ in range(n)]
-
-        for i in range(n):
-            wt = weights[i]
-            val = values[i]
-            # traverse capacity descending for 0-1 knapsack
-            for w in range(capacity, wt - 1, -1):
-                if dp[w - wt] + val > dp[w]:
-                    dp[w] = dp[w - wt] + val
-                    choose[i][w] = True
-
-        # reconstruct chosen indices
-        w = capacity
-        chosen = set()
-        for i in range(n - 1, -1, -1):
-            if w >= 0 and choose[i][w]:
-                chosen.add(i)
-                w -= weights[i]
-
-        return chosen
+        chosen = knapsack_dp(values, np.asarray(weights, dtype='int64'), int(capacity))
+        return set(chosen.tolist())
 
     def fill_and_reposition_layers(self, pog_data: pd.DataFrame, total_layer_width: int = None):
         """
-        使用 0-1 DP 选出要增加的 facing（每个 SKU 最多 +1）。
+        使用 0-1 DP（knapsack.knapsack_dp，见 layer_pool.knapsack_01_layer）选出要增加的 facing（每个 SKU 最多 +1）。
         重排时采用“两端留空”的等距分布（与原逻辑保持一致）。
+        各层背包互不相关，按 self.workers 分发到进程池求解（见 layer_pool.run_layer_tasks）。
         """
         if total_layer_width is None:
             total_layer_width = self.dp_capacity_baseline
 
-        print("\n--- 开始执行 DP-based 填充与重新定位（0-1 Knapsack） ---")
-        updated_layers = []
+        log.info("\n--- 开始执行 DP-based 填充与重新定位（0-1 Knapsack） ---")
+        layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=False, total_width=total_layer_width)
 
+        # 第一步：逐层准备候选；各层的背包输入拼接为一组数组，之后一次性（可并行）求解
+        plans = []      # (layer_df, cand, feasible_idx)；feasible_idx 为 None 表示该层只需等距重排
+        tasks = []
+        all_weights: List[int] = []
+        all_values: List[float] = []
         for layer_key, layer_df in self.sorted_items_by_position.items():
             mod_id, lay_id = layer_key
-            print(f"\n处理层：module {mod_id} - layer {lay_id}")
-
-            # 获取该层剩余宽度（基于 analyze_layer_space 的 baseline）
-            layer_space = self.analyze_layer_space(pog_data, total_layer_width)
-            remain_series = layer_space[
-                (layer_space['module_id'] == mod_id) &
-                (layer_space['layer_id'] == lay_id)
-            ]['remaining_width']
-            if remain_series.empty:
-                print(f"⚠️ 无法读取层 {mod_id}-{lay_id} 的剩余宽度，跳过。")
+            log.debug("\n处理层：module {mod_id} - layer {lay_id}", mod_id=mod_id, lay_id=lay_id)
+
+            # 获取该层剩余宽度（基于 baseline），直接查层占用索引
+            if layer_key not in layer_occupancy:
+                log.warning("⚠️ 无法读取层 {mod_id}-{lay_id} 的剩余宽度，跳过。", mod_id=mod_id, lay_id=lay_id)
                 continue
-            remaining_width = int(max(0, int(remain_series.iloc[0])))  # 转为整数毫米
-            print(f"剩余宽度（capacity）: {remaining_width} mm")
+            remaining_width = int(max(0, int(layer_occupancy.remaining_width(layer_key))))  # 转为整数毫米
+            log.debug("剩余宽度（capacity）: {remaining_width} mm", remaining_width=remaining_width)
 
             # 仅考虑非 tray items 作为 candidate（且必须在该层存在）
             candidates_df = layer_df.copy()
             if 'item_type' in candidates_df.columns:
                 candidates_df = candidates_df[candidates_df['item_type'] != 'tray'].copy()
             if candidates_df.empty:
-                print("无候选商品（非tray），跳过该层。")
+                log.debug("无候选商品（非tray），跳过该层。")
                 # 仍需重排以保证间距一致 -> 但若无变化可直接跳过
                 continue
 
-            # 计算 revenue = sales * qty（sales_df 已在 run_delete_fill_pipeline 里预处理）
+            # revenue = sales * qty（SalesIndex 已在 run_delete_fill_pipeline 里构建）
             # 将 revenue 合并进候选
             cand = candidates_df.copy()
-            if self.sales_df is not None:
-                # sales_df 已包含 item_code (str) 与 revenue 字段
-                cand = cand.merge(self.sales_df[['item_code', 'revenue']], on='item_code', how='left')
-                cand['revenue'] = cand['revenue'].fillna(0.0)
+            if self.sales_index is not None:
+                cand['revenue'] = self.sales_index.revenues(cand['item_code'])
             else:
                 cand['revenue'] = 0.0
 
@@ -261,26 +252,29 @@ class FillLayerSKU(RemoveSKU):
             # filter out items whose width > remaining_width (they can't be added)
             feasible_idx = [i for i, w in enumerate(weights) if w <= remaining_width and w > 0]
             if not feasible_idx:
-                print("没有宽度可放下的候选商品，执行等距重排。")
-                # 按照原逻辑做等距重排（无新增 facing）
-                new_items = []
-                for _, row in layer_df.iterrows():
-                    new_items.append(row.to_dict())
-                total_width = sum(i['item_width'] for i in new_items)
-                spacing = (total_layer_width - total_width) / (len(new_items) + 1) if len(new_items) > 0 else 0
-                pos = spacing
-                for item in new_items:
-                    item['position'] = pos
-                    pos += item['item_width'] + spacing
-                updated_layers.append(pd.DataFrame(new_items))
+                log.debug("没有宽度可放下的候选商品，执行等距重排。")
+                # 按照原逻辑做等距重排（无新增 facing），位置在最后统一计算
+                plans.append((layer_df, None, None))
                 continue
 
-            # prepare arrays limited to candidates
-            cand_weights = [weights[i] for i in feasible_idx]
-            cand_values = [values[i] for i in feasible_idx]
+            # prepare arrays limited to candidates (capacity = remaining_width)
+            tasks.append((len(all_weights), len(all_weights) + len(feasible_idx), remaining_width))
+            all_weights.extend(weights[i] for i in feasible_idx)
+            all_values.extend(values[i] for i in feasible_idx)
+            plans.append((layer_df, cand, feasible_idx))
+
+        # 第二步：各层背包互不相关，按 workers 分发到进程池（结果按层的顺序返回）
+        arrays = {'weights': np.array(all_weights, dtype='int64'), 'values': np.array(all_values, dtype=float)}
+        with log.timed('delete_dp.knapsack', rows=len(all_weights), layers=len(tasks), workers=self.workers):
+            layer_results = iter(run_layer_tasks(knapsack_01_layer, arrays, tasks, workers=self.workers))
 
-            # run knapsack (capacity = remaining_width)
-            chosen_indices_local = self._knapsack_01(cand_weights, cand_values, remaining_width)
+        # 第三步：按层的原顺序构建新层
+        updated_layers = []
+        for layer_df, cand, feasible_idx in plans:
+            if feasible_idx is None:
+                updated_layers.append(layer_df.copy())
+                continue
+            chosen_indices_local = next(layer_results)
 
             # map back to original candidate indices
             chosen_global_idx = [feasible_idx[i] for i in chosen_indices_local]
@@ -291,9 +285,9 @@ class FillLayerSKU(RemoveSKU):
 
             if picked_codes:
                 total_gain = sum(float(cand.iloc[idx]['revenue']) for idx in chosen_global_idx)
-                print(f"DP 选择的 SKU 集合: {picked_codes}，预计额外 revenue: {total_gain:.3f}")
+                log.debug("DP 选择的 SKU 集合: {picked_codes}，预计额外 revenue: {total_gain:.3f}", picked_codes=picked_codes, total_gain=total_gain)
             else:
-                print("DP 未选择任何额外 facing（或收益为0），进行等距重排。")
+                log.debug("DP 未选择任何额外 facing（或收益为0），进行等距重排。")
 
             # 构建新层数据（原件 + 复制品）
             new_items = []
@@ -306,29 +300,22 @@ class FillLayerSKU(RemoveSKU):
                     # 标记复制的行可以用某标志位（例如 facing=2 或新增字段），但这里保留原结构，仅新增一行
                     new_items.append(copy)
 
-            # 计算等距位置（两端空）
-            total_width = sum(i['item_width'] for i in new_items)
-            num_items = len(new_items)
-            spacing = (total_layer_width - total_width) / (num_items + 1) if num_items > 0 else 0
-            pos = spacing
-            for item in new_items:
-                item['position'] = pos
-                pos += item['item_width'] + spacing
-
             updated_layers.append(pd.DataFrame(new_items))
 
         # 合并更新层与未受影响层
         if not updated_layers:
             return pog_data, {'status': 'success', 'msg': '无可更新层'}
 
+        # 所有更新层一次性计算等距位置（两端空），层内保持复制品紧跟原件的顺序
         new_layers = pd.concat(updated_layers, ignore_index=True)
+        new_layers = respace_layers(new_layers, 'edge_margin', total_width=total_layer_width, use_facing=False, sort_by_position=False)
         unaffected = pog_data.set_index(['module_id', 'layer_id']).drop(
             index=pd.MultiIndex.from_tuples(self.affected_layers_by_removal, names=['module_id', 'layer_id']),
             errors='ignore'
         ).reset_index()
         new_pog = pd.concat([unaffected, new_layers], ignore_index=True)
 
-        print("✅ DP-based 填充与重新定位完成。")
+        log.info("✅ DP-based 填充与重新定位完成。")
         return new_pog, {'status': 'success', 'msg': '填充与重新定位成功'}
 
     def run_delete_fill_pipeline(self, var_dict: Dict) -> Tuple[pd.DataFrame, Dict]:
@@ -341,19 +328,18 @@ class FillLayerSKU(RemoveSKU):
         # load sales and compute revenue = sales * qty (if provided)
         sales_df = var_dict['bases_data'].get('sales_item_sum', None)
         if sales_df is not None and not sales_df.empty:
-            sales_df = sales_df.copy()
             # ensure columns
             if 'item_code' in sales_df.columns and 'sales' in sales_df.columns and 'qty' in sales_df.columns:
-                sales_df['item_code'] = sales_df['item_code'].astype(str)
-                sales_df['revenue'] = sales_df['sales'].astype(float) * sales_df['qty'].astype(float)
-                self.sales_df = sales_df[['item_code', 'revenue']].copy()
-                print("✅ 已载入 sales_item_sum，并计算 revenue = sales * qty。")
+                self.sales_index = SalesIndex(sales_df)
+                log.info("✅ 已载入 sales_item_sum，并计算 revenue = sales * qty。")
             else:
-                print("⚠️ sales_item_sum 文件缺少必要列 (item_code, sales, qty)。将默认 revenue=0。")
-                self.sales_df = None
+                log.warning("⚠️ sales_item_sum 文件缺少必要列 (item_code, sales, qty)。将默认 revenue=0。")
+                self.sales_index = None
         else:
-            print("ℹ️ 未提供 sales_item_sum，double 选择默认 revenue=0。")
-            self.sales_df = None
+            log.info("ℹ️ 未提供 sales_item_sum，double 选择默认 revenue=0。")
+            self.sales_index = None
+
+        self.workers = var_dict['func'].get('del_item_func', {}).get('workers', self.workers)
 
         # step1: 删除（限定层）
         new_pog, status = self.remove_sku_items(var_dict)
@@ -365,7 +351,8 @@ class FillLayerSKU(RemoveSKU):
         self.sort_items_by_position(new_pog)
 
         # step3: 使用 DP 进行填充与重排
-        final_pog, status2 = self.fill_and_reposition_layers(new_pog)
+        with log.timed('delete_dp.fill', rows=len(new_pog), layers=len(self.sorted_items_by_position)):
+            final_pog, status2 = self.fill_and_reposition_layers(new_pog)
         return final_pog, status2
 
 
@@ -379,9 +366,9 @@ if __name__ == "__main__":
 
     var_dict = {
         'bases_data': {
-            'pog_data': pd.read_csv(pog_file),
-            'tray_item': pd.read_csv(tray_item_file),
-            'sales_item_sum': pd.read_csv(sales_file)
+            'pog_data': read_csv_cached(pog_file),
+            'tray_item': read_csv_cached(tray_item_file),
+            'sales_item_sum': read_csv_cached(sales_file)
         },
         'func': {
             'del_item_func': {
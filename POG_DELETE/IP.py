@@ -1,100 +1,31 @@
+import os
+import sys
 import pandas as pd
-import math
 import numpy as np
-from scipy.optimize import linprog
 from typing import Dict, Optional, List, Tuple, Any
 
-import numpy as np
-from scipy.optimize import linprog
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # 仓库根目录下的公共模块
+from layer_occupancy import LayerOccupancy
+from layer_spacing import respace_layers
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from knapsack import solve_knapsack, solve_multiple_knapsack
+from layer_pool import run_layer_tasks, bounded_knapsack_layer
+from pog_config import PogConfig
+from pog_log import get_logger
+
+log = get_logger('delete_ip')
 
 
-def solve_integer_knapsack_bnb(values, weights, capacity):
+def solve_integer_knapsack_bnb(values, weights, capacity, method='auto', time_limit=None, node_limit=None):
     """
-    手写分支定界求解 0/1 背包：
+    求解 0/1 背包，返回与输入等长的 0/1 数组：
     max sum v_i x_i
     s.t. sum w_i x_i <= capacity
          x_i ∈ {0,1}
+    具体求解（整数容量动态规划 / Dantzig 界最优优先分支定界，及时间、节点预算）见 knapsack.solve_knapsack
     """
-
-    n = len(values)
-    best_value = -np.inf
-    best_solution = None
-
-    # ---------------------------------------------------------
-    # LP 松弛求解的函数（一个子问题）
-    # additional_bounds 是对变量的额外固定约束
-    # ---------------------------------------------------------
-    def solve_relaxation(additional_bounds):
-        bounds = [(0, 1)] * n
-        for idx, b in additional_bounds.items():
-            bounds[idx] = (b, b)
-
-        res = linprog(
-            c=-np.array(values),
-            A_ub=[weights],
-            b_ub=[capacity],
-            bounds=bounds,
-            method="highs"
-        )
-
-        if res.success:
-            return res.fun, res.x
-        return None, None
-
-    # ---------------------------------------------------------
-    # 主分支定界递归框架
-    # ---------------------------------------------------------
-    def branch_and_bound(additional_bounds):
-        nonlocal best_value, best_solution
-
-        # ① 求 LP Relaxation
-        lp_val, lp_x = solve_relaxation(additional_bounds)
-        if lp_x is None:
-            return  # infeasible → 剪枝
-
-        # lp_val = 最小化目标值（负数），所以真实价值是：
-        ub = -lp_val   # 上界（LP 解）
-
-        # ② 剪枝（如果连上界都不如当前最优，直接放弃）
-        if ub <= best_value:
-            return
-
-        # ③ 检查是否全整数
-        fractional_indices = [i for i, x in enumerate(lp_x) if not (np.isclose(x, 0) or np.isclose(x, 1))]
-
-        if len(fractional_indices) == 0:
-            # 是整数可行解 → 更新最优解
-            if ub > best_value:
-                best_value = ub
-                best_solution = lp_x.astype(int)
-            return
-
-        # ④ 选择一个变量进行分支
-        i = fractional_indices[0]
-
-        # --- 分支1: x_i = 0 ---
-        new_bounds_0 = additional_bounds.copy()
-        new_bounds_0[i] = 0
-        branch_and_bound(new_bounds_0)
-
-        # --- 分支2: x_i = 1 ---
-        new_bounds_1 = additional_bounds.copy()
-        new_bounds_1[i] = 1
-
-        # 若 x_i = 1 会超容量，则直接剪掉
-        if weights[i] <= capacity:
-            branch_and_bound(new_bounds_1)
-
-    # ---------------------------------------------------------
-    # 开始搜索
-    # ---------------------------------------------------------
-    branch_and_bound({})
-
-    # 如果没有找到任何解（理论上不会）
-    if best_solution is None:
-        return np.zeros(n, dtype=int)
-
-    return best_solution
+    return solve_knapsack(values, weights, capacity, method=method, time_limit=time_limit, node_limit=node_limit)['selected']
 
 
 
@@ -110,7 +41,7 @@ class RemoveSKU:
     def __init__(self):
         self.dataframes: Dict[str, pd.DataFrame] = {}
         self.affected_layers_by_removal: List[Tuple[int, int]] = []
-        print("✅ RemoveSKU 初始化完成。")
+        log.info("✅ RemoveSKU 初始化完成。")
 
     def remove_sku_items(self, var_dict: Dict[str, Any]):
         pog_data: pd.DataFrame = var_dict['bases_data']['pog_data']
@@ -119,7 +50,7 @@ class RemoveSKU:
 
         delete_skus = params.get('del_item_list', [])
 
-        print(f"\n--- 开始执行 'remove_sku_items' 全局删除SKU: {delete_skus} ---")
+        log.info("\n--- 开始执行 'remove_sku_items' 全局删除SKU: {delete_skus} ---", delete_skus=delete_skus)
 
         if pog_data is None or pog_data.empty:
             return pog_data, {'status': 'fail', 'msg': 'POG数据为空'}
@@ -141,13 +72,13 @@ class RemoveSKU:
                     it = r['item_code']
                     item_to_trays.setdefault(it, []).append(tid)
                     tray_to_items.setdefault(tid, []).append(it)
-                print(f"📦 载入 tray_item 映射，共 {len(pair)} 条记录，item->tray 映射项数 {len(item_to_trays)}。")
+                log.info("📦 载入 tray_item 映射，共 {pair_count} 条记录，item->tray 映射项数 {item_to_trays_count}。", pair_count=len(pair), item_to_trays_count=len(item_to_trays))
             except Exception as e:
-                print(f"⚠️ 处理 tray_item 文件出错：{e}")
+                log.warning("⚠️ 处理 tray_item 文件出错：{error}", error=e)
                 item_to_trays = {}
                 tray_to_items = {}
         else:
-            print("ℹ️ 未提供 tray_item 数据或文件为空，跳过 tray-item 映射检查。")
+            log.info("ℹ️ 未提供 tray_item 数据或文件为空，跳过 tray-item 映射检查。")
 
         # ==== 全局搜索要删除的商品 ====
         found_rows = pog_data[pog_data['item_code'].isin([str(x) for x in delete_skus])]
@@ -194,7 +125,7 @@ class RemoveSKU:
         # ==== 执行删除 ====
         new_pog = pog_data.drop(found_rows.index).reset_index(drop=True)
         removed_num = len(found_rows)
-        print(f"🗑️ 已删除 {removed_num} 条SKU记录（全局）。")
+        log.info("🗑️ 已删除 {removed_num} 条SKU记录（全局）。", removed_num=removed_num)
 
         status_dict = {
             'status': 'success',
@@ -209,10 +140,10 @@ class FillLayerSKU(RemoveSKU):
     ------------------
     删除SKU后：
     1. 计算受影响层剩余空间（基于 module_width）
-    2. 在每个受影响层使用整数规划（HiGHS B&B）选择额外 +1 facing 的 SKU 集合以最大化 revenue
+    2. 在每个受影响层求解 0/1 背包（knapsack.solve_knapsack：动态规划或分支定界）选择额外 +1 facing 的 SKU 集合以最大化 revenue
        （每个 SKU 最多 +1）
     3. 若无法增加任何 facing，则仅等距重排（含两端空隙）
-    4. 约束：每层最终展示单元数 <= 18（超过时按 revenue 优先保留）
+    4. 约束：每层最终展示单元数（facing 之和）<= 18（超过时按收益从低到高撤回新增的 facing，不删除原有商品）
     5. spacing 与 position 向下取整为整数
     6. 输出时会调整 facing 列，反映最终每个 base item 的 facing 数量
     """
@@ -221,34 +152,39 @@ class FillLayerSKU(RemoveSKU):
         super().__init__()
         self.affected_layer_space: Optional[pd.DataFrame] = None
         self.sorted_items_by_position: Dict[Tuple[int, int], pd.DataFrame] = {}
-        self.sales_df: Optional[pd.DataFrame] = None
+        self.sales_index: Optional[SalesIndex] = None
+        self.layer_occupancy: Optional[LayerOccupancy] = None
 
         self.max_items_per_layer = 18
-        print("✅ FillLayerSKU 初始化完成。")
+        # 背包求解：'auto' / 'dp' / 'bnb'，分支定界的时间（秒）与节点预算，None 为不限
+        self.knapsack_method = 'auto'
+        self.knapsack_time_limit: Optional[float] = 1.0
+        self.knapsack_node_limit: Optional[int] = 200000
+        # 每个 SKU 最多增加的 facing 数（配置 item.max_vert_facing 覆盖），第 j 个新增 facing 的收益按 facing_decay^(j-1) 折减
+        self.max_extra_facings = 1
+        self.facing_decay = 1.0
+        # 补位方式：'layer' 逐层独立求解；'global' 所有受影响层合并为一个多重背包（见 fill_and_reposition_layers_global）
+        self.refill_mode = 'layer'
+        # 逐层模式下各层背包求解的进程数（1 为当前进程内顺序求解，None/0 为CPU核数），可由 del_item_func.workers 覆盖
+        self.workers = 1
+        log.info("✅ FillLayerSKU 初始化完成。")
 
     def analyze_layer_space(self, pog_data: pd.DataFrame) -> pd.DataFrame:
         if pog_data.empty:
             return pd.DataFrame(columns=['module_id', 'layer_id', 'item_count', 'used_width', 'remaining_width'])
 
-        layer_width = pog_data.groupby(['module_id', 'layer_id'])['module_width'].max().reset_index()
-        layer_width.rename(columns={'module_width': 'total_width'}, inplace=True)
-
-        layer_summary = pog_data.groupby(['module_id', 'layer_id']).agg(
-            used_width=('item_width', 'sum'),
-            item_count=('item_code', 'count')
-        ).reset_index()
-
-        layer_summary = layer_summary.merge(layer_width, on=['module_id', 'layer_id'], how='left')
-
-        layer_summary['remaining_width'] = (layer_summary['total_width'] - layer_summary['used_width']).astype(int)
+        # 一行即一个 SKU，占用 item_width × facing，每层宽度取该层的 module_width
+        self.layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=True)
+        layer_summary = self.layer_occupancy.summary()
+        layer_summary['remaining_width'] = layer_summary['remaining_width'].astype(int)
 
         return layer_summary
 
     def calculate_space_for_affected_layers(self, pog_data: pd.DataFrame, total_layer_width: int = None):
-        print("\n--- 计算受影响层剩余空间（自动读取 module_width） ---")
+        log.info("\n--- 计算受影响层剩余空间（自动读取 module_width） ---")
 
         if not self.affected_layers_by_removal:
-            print("ℹ️ 无受影响层。")
+            log.info("ℹ️ 无受影响层。")
             return
 
         all_layers = self.analyze_layer_space(pog_data)
@@ -257,10 +193,10 @@ class FillLayerSKU(RemoveSKU):
             .reindex(self.affected_layers_by_removal)
 
         self.affected_layer_space = affected.reset_index()
-        print("✅ 受影响层空间计算完成（已基于 module_width）。")
+        log.info("✅ 受影响层空间计算完成（已基于 module_width）。")
 
     def sort_items_by_position(self, pog_data: pd.DataFrame):
-        print("\n--- 排序受影响层内商品 ---")
+        log.info("\n--- 排序受影响层内商品 ---")
         self.sorted_items_by_position.clear()
         for mod_id, lay_id in self.affected_layers_by_removal:
             df = pog_data[(pog_data['module_id'] == mod_id) & (pog_data['layer_id'] == lay_id)].copy()
@@ -271,223 +207,316 @@ class FillLayerSKU(RemoveSKU):
             else:
                 sorted_df = df
             self.sorted_items_by_position[(mod_id, lay_id)] = sorted_df.reset_index(drop=True)
-        print("✅ 排序完成。")
+        log.info("✅ 排序完成。")
 
-    def _enforce_max_items(self, df_layer_items: pd.DataFrame) -> pd.DataFrame:
-        if len(df_layer_items) <= self.max_items_per_layer:
+    def _enforce_max_items(self, df_layer_items: pd.DataFrame, base_facing) -> pd.DataFrame:
+        """
+        每层最终展示单元数（facing 之和）不超过 max_items_per_layer：超出时按边际收益从低到高撤回新增的 facing
+        （第 j 个新增 facing 的收益为 revenue × facing_decay^(j-1)），原有的行和 facing 不动。
+        base_facing 为各行补位前的 facing（新增行为 0）。
+        """
+        excess = int(df_layer_items['facing'].sum()) - self.max_items_per_layer
+        if excess <= 0:
             return df_layer_items
-        df = df_layer_items.copy().reset_index(drop=False)
-        if 'revenue' not in df.columns:
-            df['revenue'] = 0.0
-        df_sorted = df.sort_values(by=['revenue', 'index'], ascending=[False, True])
-        df_keep = df_sorted.head(self.max_items_per_layer).sort_values(by='index')
-        df_keep = df_keep.drop(columns=['index']).reset_index(drop=True)
-        return df_keep
+        extra = np.clip(df_layer_items['facing'].to_numpy(dtype=int) - np.asarray(base_facing, dtype=int), 0, None)
+        if excess > extra.sum():
+            log.warning("⚠️ 该层原有展示单元数已超过上限 {max_items}，只撤回新增的 facing。", max_items=self.max_items_per_layer)
+        rows = np.repeat(np.arange(len(extra)), extra)
+        rank = np.arange(len(rows)) - np.repeat(np.cumsum(extra) - extra, extra)
+        revenue = df_layer_items['revenue'].to_numpy(dtype=float) if 'revenue' in df_layer_items.columns else np.zeros(len(extra))
+        # 收益相同时先撤回同一行中靠后的 facing
+        order = np.lexsort((-rank, revenue[rows] * self.facing_decay ** rank))
+        df = df_layer_items.copy()
+        df['facing'] = df['facing'].to_numpy(dtype=int) - np.bincount(rows[order[:excess]], minlength=len(extra))
+        return df
 
     def fill_and_reposition_layers(self, pog_data: pd.DataFrame, total_layer_width: int = None):
         """
         填充与重新定位（基于每层真实 module_width）。
         spacing/position 向下取整（int）。
-        仅使用 B&B（HiGHS via linprog）求解子问题；不再使用 DP 回退。
+        每层求解有界背包：每个 SKU 可增加 0..max_extra_facings 个 facing（交给 knapsack.solve_bounded_knapsack，
+        按规模自动选择整数容量动态规划或 Dantzig 界分支定界），结果直接写入该行的 facing，行数不变；
+        新增 facing 总数不超过本层剩余的展示单元数（max_items_per_layer - 现有 facing 之和）。
+        各层背包互不相关，按 self.workers 分发到进程池求解（见 layer_pool.run_layer_tasks）。
         """
-        print("\n--- 开始执行 B&B-based 填充与重新定位（基于真实 module_width） ---")
-        updated_layers = []
-
-        layer_space = self.analyze_layer_space(pog_data)
+        log.info("\n--- 开始执行基于背包求解的填充与重新定位（基于真实 module_width） ---")
+        # 第一步逐层准备候选，各层背包输入拼接为一组数组；第二步一次性（可并行）求解；第三步按层的原顺序构建新层
+        plans = []      # (layer_df, cand, feasible_idx, total_layer_width)；feasible_idx 为 None 表示该层只需等距重排
+        tasks = []
+        all_weights: List[int] = []
+        all_values: List[float] = []
+        all_max_counts: List[int] = []
+        options = {'decay': self.facing_decay, 'method': self.knapsack_method,
+                   'time_limit': self.knapsack_time_limit, 'node_limit': self.knapsack_node_limit}
+
+        layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=True)
 
         for layer_key, layer_df in self.sorted_items_by_position.items():
             mod_id, lay_id = layer_key
-            print(f"\n处理层：module {mod_id} - layer {lay_id}")
-
-            row = layer_space[
-                (layer_space['module_id'].astype(str) == str(mod_id)) &
-                (layer_space['layer_id'].astype(str) == str(lay_id))
-            ]
+            log.debug("\n处理层：module {mod_id} - layer {lay_id}", mod_id=mod_id, lay_id=lay_id)
 
-            if row.empty:
-                print(f"⚠️ 找不到层 {mod_id}-{lay_id} 的 module_width/剩余宽度信息，跳过该层。")
+            # 直接查层占用索引，不再为每层筛选空间汇总表
+            if layer_key not in layer_occupancy:
+                log.warning("⚠️ 找不到层 {mod_id}-{lay_id} 的 module_width/剩余宽度信息，跳过该层。", mod_id=mod_id, lay_id=lay_id)
                 continue
 
-            try:
-                total_layer_width_val = row['total_width'].iloc[0]
-                total_layer_width = int(total_layer_width_val) if pd.notna(total_layer_width_val) else None
-            except Exception:
-                total_layer_width = None
-
-            try:
-                remaining_width_val = row['remaining_width'].iloc[0]
-                remaining_width = int(remaining_width_val) if pd.notna(remaining_width_val) else None
-            except Exception:
-                remaining_width = None
+            total_layer_width_val = layer_occupancy.module_width(layer_key)
+            used_width_val = layer_occupancy.used_width(layer_key)
 
             baseline = getattr(self, 'dp_capacity_baseline', 995)
-            if total_layer_width is None:
+            if pd.notna(total_layer_width_val):
+                total_layer_width = int(total_layer_width_val)
+            else:
                 total_layer_width = int(baseline)
-                print(f"⚠️ total_width 缺失，回退到 baseline = {total_layer_width} mm")
-            if remaining_width is None:
-                used_w = row.get('used_width', None)
-                if used_w is not None and len(used_w) > 0 and pd.notna(used_w.iloc[0]):
-                    try:
-                        remaining_width = int(max(0, int(total_layer_width) - int(used_w.iloc[0])))
-                    except Exception:
-                        remaining_width = 0
-                else:
-                    remaining_width = 0
-                print(f"⚠️ remaining_width 缺失，回退为 {remaining_width} mm")
-
-            print(f"该层实际宽度 module_width = {total_layer_width} mm，剩余宽度 = {remaining_width} mm")
+                log.warning("⚠️ total_width 缺失，回退到 baseline = {total_layer_width} mm", total_layer_width=total_layer_width)
+            if pd.notna(total_layer_width_val) and pd.notna(used_width_val):
+                remaining_width = int(total_layer_width_val - used_width_val)
+            else:
+                remaining_width = int(max(0, total_layer_width - used_width_val)) if pd.notna(used_width_val) else 0
+                log.warning("⚠️ remaining_width 缺失，回退为 {remaining_width} mm", remaining_width=remaining_width)
+
+            log.debug("该层实际宽度 module_width = {total_layer_width} mm，剩余宽度 = {remaining_width} mm", total_layer_width=total_layer_width, remaining_width=remaining_width)
 
             # candidates：排除 tray
             candidates_df = layer_df.copy()
             if 'item_type' in candidates_df.columns:
                 candidates_df = candidates_df[candidates_df['item_type'] != 'tray'].copy()
 
-            # 如果没有候选项，直接等距重排整层（spacing 向下取整）
+            # 如果没有候选项，直接等距重排整层（spacing 向下取整，位置在最后统一计算）
             if candidates_df.empty:
-                new_items = [r.to_dict() for _, r in layer_df.iterrows()]
-                total_width_calc = sum(int(i.get('item_width', 0)) for i in new_items)
-                num = len(new_items)
-                spacing = math.floor((total_layer_width - total_width_calc) / (num + 1)) if num > 0 else 0
-                pos = spacing
-                for item in new_items:
-                    item['position'] = int(pos)
-                    pos += int(item.get('item_width', 0)) + spacing
-                updated_layers.append(pd.DataFrame(new_items))
+                plans.append((layer_df, None, None, total_layer_width))
                 continue
 
             # 计算 revenue 并准备 weights/values
             cand = candidates_df.copy()
             cand['item_code'] = cand['item_code'].astype(str)
-            if self.sales_df is not None:
-                cand = cand.merge(self.sales_df[['item_code', 'revenue']], on='item_code', how='left')
-                cand['revenue'] = cand['revenue'].fillna(0.0)
+            if self.sales_index is not None:
+                cand['revenue'] = self.sales_index.revenues(cand['item_code'])
             else:
                 cand['revenue'] = 0.0
 
             weights = cand['item_width'].astype(int).tolist()
             values = cand['revenue'].astype(float).tolist()
 
+            # 每层展示单元数（facing 之和）不超过 max_items_per_layer，新增 facing 总数不超过剩余的单元数
+            layer_facing = layer_df['facing'].fillna(1).astype(int).sum() if 'facing' in layer_df.columns else len(layer_df)
+            units_left = self.max_items_per_layer - int(layer_facing)
+
             feasible_idx = [i for i, w in enumerate(weights) if w <= remaining_width and w > 0]
-            if not feasible_idx:
+            if not feasible_idx or units_left <= 0:
                 # 等距重排（无法新增 facing）
-                new_items = [r.to_dict() for _, r in layer_df.iterrows()]
-                total_width_calc = sum(int(i.get('item_width', 0)) for i in new_items)
-                num = len(new_items)
-                spacing = math.floor((total_layer_width - total_width_calc) / (num + 1)) if num > 0 else 0
-                pos = spacing
-                for item in new_items:
-                    item['position'] = int(pos)
-                    pos += int(item.get('item_width', 0)) + spacing
-                updated_layers.append(pd.DataFrame(new_items))
+                plans.append((layer_df, None, None, total_layer_width))
                 continue
 
-            cand_weights = [weights[i] for i in feasible_idx]
-            cand_values = [values[i] for i in feasible_idx]
+            tasks.append((len(all_weights), len(all_weights) + len(feasible_idx), remaining_width, options))
+            all_weights.extend(weights[i] for i in feasible_idx)
+            all_values.extend(values[i] for i in feasible_idx)
+            all_max_counts.extend([min(self.max_extra_facings, units_left)] * len(feasible_idx))
+            plans.append((layer_df, cand, feasible_idx, total_layer_width))
 
-            # === 使用分支定界（HiGHS via linprog）求解子问题 ===
-            chosen_bin = solve_integer_knapsack_bnb(cand_values, cand_weights, remaining_width)
-            if chosen_bin is None:
-                # 不回退 DP：记录日志并认为没有被选中（即不新增 facing）
-                print("⚠️ B&B 求解失败或无可行解，跳过新增 facing（不回退至 DP）。")
-                chosen_local = set()
-            else:
-                chosen_local = {i for i, v in enumerate(chosen_bin) if int(v) == 1}
-
-            chosen_global_idx = [feasible_idx[i] for i in chosen_local]
+        # === 求解各层的有界背包（每个 SKU 最多 max_extra_facings 个新增 facing），结果按层的顺序返回 ===
+        arrays = {'weights': np.array(all_weights, dtype='int64'), 'values': np.array(all_values, dtype=float),
+                  'max_counts': np.array(all_max_counts, dtype='int64')}
+        with log.timed('delete_ip.knapsack', rows=len(all_weights), layers=len(tasks), workers=self.workers):
+            layer_results = iter(run_layer_tasks(bounded_knapsack_layer, arrays, tasks, workers=self.workers))
 
-            picked_codes = {str(cand.iloc[idx]['item_code']) for idx in chosen_global_idx}
+        updated_layers = []
+        for layer_df, cand, feasible_idx, total_layer_width in plans:
+            if feasible_idx is None:
+                updated_layers.append(layer_df.assign(_layer_width=total_layer_width))
+                continue
+            knapsack_result = next(layer_results)
+            log.debug("背包求解方法 {method}，展开节点 {nodes}", method=knapsack_result['method'], nodes=knapsack_result['nodes'])
+            if not knapsack_result['optimal']:
+                log.warning("⚠️ 背包求解达到预算，使用当前最优解（未证明最优）。")
+
+            # 新增 facing 数按层内行号记录
+            extra_facings = pd.Series(0, index=layer_df.index)
+            for i, count in enumerate(knapsack_result['counts']):
+                if count > 0:
+                    extra_facings[cand.index[feasible_idx[i]]] = int(count)
+
+            if extra_facings.any():
+                picked = {str(code): int(count) for code, count in zip(layer_df['item_code'], extra_facings) if count > 0}
+                log.debug("背包求解新增的 facing: {picked}，预计额外 revenue: {total_gain:.3f}", picked=picked, total_gain=knapsack_result['value'])
+            else:
+                log.debug("背包求解未选择任何额外 facing（或收益为0），将等距重排。")
 
-            if picked_codes:
-                total_gain = sum(float(cand.iloc[idx]['revenue']) for idx in chosen_global_idx)
-                print(f"B&B 选择的 SKU 集合: {picked_codes}，预计额外 revenue: {total_gain:.3f}")
+            # 新层行：每个 SKU 仍为一行，新增的 facing 直接累加到 facing 上
+            df_new = layer_df.copy()
+            df_new['item_width'] = df_new['item_width'].fillna(0).astype(int)
+            if self.sales_index is not None:
+                df_new['revenue'] = self.sales_index.revenues(df_new['item_code'].astype(str))
             else:
-                print("B&B 未选择任何额外 facing（或收益为0），将等距重排。")
-
-            # 生成新层行（带 double 标记的 item_code）
-            new_items = []
-            for _, row_item in layer_df.iterrows():
-                base_item = row_item.to_dict()
-                code = str(base_item['item_code'])
-                base_item['item_width'] = int(base_item.get('item_width', 0))
-                revenue_val = 0.0
-                if self.sales_df is not None:
-                    r = self.sales_df.loc[self.sales_df['item_code'] == code]
-                    if not r.empty:
-                        revenue_val = float(r['revenue'].iloc[0])
-                base_item['revenue'] = revenue_val
-
-                if code in picked_codes:
-                    i1 = base_item.copy()
-                    i2 = base_item.copy()
-                    i1['item_code'] = f"{code}(1)"
-                    i2['item_code'] = f"{code}(2)"
-                    new_items.extend([i1, i2])
-                else:
-                    new_items.append(base_item)
-
-            df_new = pd.DataFrame(new_items)
-            df_new = self._enforce_max_items(df_new)
-
-            # 等距重排（使用真实 total_layer_width），spacing/position 向下取整为 int
-            total_width_calc = int(df_new['item_width'].astype(int).sum()) if not df_new.empty else 0
-            num_items = len(df_new)
-            spacing = math.floor((total_layer_width - total_width_calc) / (num_items + 1)) if num_items > 0 else 0
-            pos = spacing
-            positions = []
-            for idx in range(num_items):
-                positions.append(int(pos))
-                pos += int(df_new.iloc[idx]['item_width']) + spacing
-            df_new = df_new.reset_index(drop=True)
-            df_new['position'] = positions
-
-            updated_layers.append(df_new)
-
-        # 合并并计算 facing
+                df_new['revenue'] = 0.0
+            base_facing = df_new['facing'].fillna(1).astype(int) if 'facing' in df_new.columns else 1
+            df_new['facing'] = base_facing + extra_facings
+            df_new = self._enforce_max_items(df_new, base_facing)
+            updated_layers.append(df_new.assign(_layer_width=total_layer_width))
+
         if not updated_layers:
             return pog_data, {'status': 'success', 'msg': '无可更新层'}
 
+        new_pog = self._merge_updated_layers(pog_data, updated_layers)
+
+        log.info("✅ 基于背包求解的填充与重新定位完成（基于 module_width）。")
+        return new_pog, {'status': 'success', 'msg': '填充与重新定位成功'}
+
+    def _merge_updated_layers(self, pog_data: pd.DataFrame, updated_layers: List[pd.DataFrame]) -> pd.DataFrame:
+        """所有更新层一次性等距重排（使用各层真实宽度 _layer_width），spacing/position 向下取整为 int，再与未受影响层合并"""
         new_layers = pd.concat(updated_layers, ignore_index=True)
+        new_layers = respace_layers(new_layers, 'edge_margin_floor', total_width=None, use_facing=True, sort_by_position=False,
+                                    width_col='_layer_width')
+        new_layers['position'] = new_layers['position'].astype(int)
+        new_layers = new_layers.drop(columns=['_layer_width'])
         unaffected = pog_data.set_index(['module_id', 'layer_id']).drop(
             index=pd.MultiIndex.from_tuples(self.affected_layers_by_removal, names=['module_id', 'layer_id']),
             errors='ignore'
         ).reset_index()
 
-        new_pog = pd.concat([unaffected, new_layers], ignore_index=True)
+        return pd.concat([unaffected, new_layers], ignore_index=True)
 
-        def base_code(ic: str) -> str:
-            if isinstance(ic, str) and '(' in ic and ic.endswith(')'):
-                return ic.split('(')[0]
-            return ic
+    def fill_and_reposition_layers_global(self, pog_data: pd.DataFrame):
+        """
+        全局补位：把所有受影响层的补位合并为一个多重背包一次求解。
+        每层为一个背包（容量为剩余宽度）；候选为同一模块上已有的 SKU（含其他层的），
+        每个 SKU 在整个模块上最多新增 max_extra_facings 个 facing，第 j 个的收益按 facing_decay^(j-1) 折减；
+        放到该层已有的 SKU 上时累加 facing，放到该层没有的 SKU 时新增一行；
+        每个新增 facing 占一个展示单元，每层展示单元数（facing 之和）不超过 max_items_per_layer。
+        求解见 knapsack.solve_multiple_knapsack（逐层精确求解 + 两两改进的启发式，线性松弛上界给出最优性差距）。
+        """
+        log.info("\n--- 开始执行全局多重背包补位（所有受影响层一起求解） ---")
+        layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=True)
+        layer_keys = [layer_key for layer_key in self.sorted_items_by_position if layer_key in layer_occupancy]
+        if not layer_keys:
+            return pog_data, {'status': 'success', 'msg': '无可更新层'}
 
-        new_pog = new_pog.reset_index(drop=True)
-        new_pog['base_item_code'] = new_pog['item_code'].astype(str).apply(base_code)
-        facing_counts = new_pog['base_item_code'].value_counts().to_dict()
-        new_pog['facing'] = new_pog['base_item_code'].map(lambda x: int(facing_counts.get(x, 0)))
-        new_pog.drop(columns=['base_item_code'], inplace=True)
+        capacities = [max(0, int(layer_occupancy.module_width(layer_key) - layer_occupancy.used_width(layer_key))) for layer_key in layer_keys]
+        layer_codes = [set(self.sorted_items_by_position[layer_key]['item_code'].astype(str)) for layer_key in layer_keys]
+        base_units = [int(self.sorted_items_by_position[layer_key]['facing'].fillna(1).sum()) for layer_key in layer_keys]
+
+        # 候选 SKU：受影响层所在模块上的非托盘商品，每个模块内每个 SKU 一条（取按层、位置的第一行作为新增行的模板）
+        modules = sorted({layer_key[0] for layer_key in layer_keys})
+        source = pog_data[pog_data['module_id'].isin(modules)]
+        if 'item_type' in source.columns:
+            source = source[source['item_type'] != 'tray']
+        source = source.sort_values(['module_id', 'layer_id', 'position'] if 'position' in source.columns else ['module_id', 'layer_id'])
+        source = source.assign(item_code=source['item_code'].astype(str)).drop_duplicates(['module_id', 'item_code'])
+        source = source[source['item_width'].fillna(0).astype(int) > 0].reset_index(drop=True)
+        revenues = self.sales_index.revenues(source['item_code']) if self.sales_index is not None else np.zeros(len(source))
+
+        # 每个 SKU 展开为 max_extra_facings 件（同一 SKU 的各件可放到不同层）
+        copies = max(0, int(self.max_extra_facings))
+        owner = np.repeat(np.arange(len(source)), copies)
+        rank = np.tile(np.arange(copies), len(source))
+        values = np.asarray(revenues, dtype=float)[owner] * self.facing_decay ** rank
+        weights = source['item_width'].astype(int).to_numpy()[owner]
+        item_modules = source['module_id'].to_numpy()[owner]
+        item_codes = source['item_code'].to_numpy()[owner]
+        same_module = item_modules[:, None] == np.array([layer_key[0] for layer_key in layer_keys])[None, :]
+
+        # 每层展示单元数上限：每层放入的件数不超过剩余单元数，超出时保留收益最高的件，其余撤回后在剩余容量上重新求解
+        assignment = np.full(len(owner), -1, dtype=int)
+        remaining = np.array(capacities, dtype=float)
+        units_left = np.maximum(self.max_items_per_layer - np.array(base_units), 0)
+        with log.timed('delete_ip.global_knapsack', rows=len(owner), layers=len(layer_keys)) as step:
+            upper_bound = None
+            for _ in range(len(layer_keys) + 1):
+                eligible = same_module & (units_left > 0)[None, :] & (assignment < 0)[:, None]
+                result = solve_multiple_knapsack(values, weights, remaining, eligible, method=self.knapsack_method,
+                                                 time_limit=self.knapsack_time_limit, node_limit=self.knapsack_node_limit)
+                if upper_bound is None:
+                    upper_bound = result['upper_bound']
+                new_assignment = result['assignment']
+                violated = False
+                for b in range(len(layer_keys)):
+                    placed = np.flatnonzero(new_assignment == b)
+                    if len(placed) > units_left[b]:
+                        violated = True
+                        new_assignment[placed[np.argsort(-values[placed], kind='stable')[units_left[b]:]]] = -1
+                    units_left[b] -= np.count_nonzero(new_assignment == b)
+                    remaining[b] -= weights[new_assignment == b].sum()
+                assignment[new_assignment >= 0] = new_assignment[new_assignment >= 0]
+                if not violated:
+                    break
+            value = float(values[assignment >= 0].sum())
+            gap = (upper_bound - value) / upper_bound if upper_bound > 0 else 0.0
+            step.set(value=round(value, 3), upper_bound=round(upper_bound, 3), gap=round(gap, 6))
+        log.info("全局补位收益 {value:.3f}，上界 {upper_bound:.3f}，最优性差距 {gap:.2%}", value=value, upper_bound=upper_bound, gap=gap)
 
-        print("✅ B&B-based 填充与重新定位完成（基于 module_width）。")
-        return new_pog, {'status': 'success', 'msg': '填充与重新定位成功'}
+        updated_layers = []
+        for b, layer_key in enumerate(layer_keys):
+            layer_df = self.sorted_items_by_position[layer_key]
+            added = {}
+            for i in np.flatnonzero(assignment == b):
+                added[item_codes[i]] = added.get(item_codes[i], 0) + 1
+
+            df_new = layer_df.copy()
+            df_new['item_code'] = df_new['item_code'].astype(str)
+            df_new['facing'] = df_new['facing'].fillna(1).astype(int) if 'facing' in df_new.columns else 1
+            base_facing = df_new['facing'].tolist()
+            first_rows = ~df_new['item_code'].duplicated()
+            df_new.loc[first_rows, 'facing'] += df_new.loc[first_rows, 'item_code'].map(added).fillna(0).astype(int)
+            # 该层没有的 SKU：复制同模块上的模板行，放到本层末尾
+            new_codes = [code for code in added if code not in layer_codes[b]]
+            if new_codes:
+                templates = source[(source['module_id'] == layer_key[0]) & source['item_code'].isin(new_codes)]
+                new_rows = templates.assign(layer_id=layer_key[1], position=-1, facing=templates['item_code'].map(added).astype(int))
+                df_new = pd.concat([df_new, new_rows[[column for column in df_new.columns if column in new_rows.columns]]], ignore_index=True)
+            df_new['item_width'] = df_new['item_width'].fillna(0).astype(int)
+            if self.sales_index is not None:
+                df_new['revenue'] = self.sales_index.revenues(df_new['item_code'])
+            else:
+                df_new['revenue'] = 0.0
+            # 求解时已按剩余单元数限制放入件数，这里只作兜底；撤回到 0 个 facing 的新增行一并去掉
+            df_new = self._enforce_max_items(df_new, base_facing + [0] * (len(df_new) - len(base_facing)))
+            df_new = df_new[df_new['facing'] > 0]
+            updated_layers.append(df_new.assign(_layer_width=int(layer_occupancy.module_width(layer_key))))
+
+        # 校验：补位后每层展示单元数不超过上限（原有单元数已超限的层不再增加）
+        over_limit = [layer_key for layer_key, units, df_new in zip(layer_keys, base_units, updated_layers)
+                      if df_new['facing'].sum() > max(self.max_items_per_layer, units)]
+        if over_limit:
+            log.error("❌ 全局补位后展示单元数超过上限 {max_items} 的层：{layers}", max_items=self.max_items_per_layer, layers=over_limit)
+            return pog_data, {'status': 'fail', 'msg': f'全局补位后展示单元数超过上限的层：{over_limit}'}
+
+        new_pog = self._merge_updated_layers(pog_data, updated_layers)
+        log.info("✅ 全局多重背包补位与重新定位完成。")
+        return new_pog, {'status': 'success', 'msg': '填充与重新定位成功',
+                         'refill': {'mode': 'global', 'value': value, 'upper_bound': upper_bound, 'gap': gap}}
 
     def run_delete_fill_pipeline(self, var_dict: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
         pog_data = var_dict['bases_data']['pog_data']
         pog_data = pog_data.copy()
         pog_data['item_code'] = pog_data['item_code'].astype(str)
+        if 'facing' not in pog_data.columns:
+            pog_data['facing'] = 1
         var_dict['bases_data']['pog_data'] = pog_data
 
+        # 每个 SKU 最多新增的 facing 数取自配置 item.max_vert_facing
+        config = var_dict['bases_data'].get('config')
+        if config is not None:
+            config = PogConfig.ensure(config)
+            self.max_extra_facings = config.max_vert_facing
+            if config.max_item_cnt_layer is not None:
+                self.max_items_per_layer = config.max_item_cnt_layer
+
+        refill_mode = var_dict['func'].get('del_item_func', {}).get('refill_mode', self.refill_mode)
+        self.workers = var_dict['func'].get('del_item_func', {}).get('workers', self.workers)
+        if refill_mode not in ('layer', 'global'):
+            return pog_data, {'status': 'fail', 'msg': f"非法的 refill_mode {refill_mode}，可选值为 ['layer', 'global']"}
+
         sales_df = var_dict['bases_data'].get('sales_item_sum', None)
         if sales_df is not None and not sales_df.empty:
-            sales_df = sales_df.copy()
             if 'item_code' in sales_df.columns and 'sales' in sales_df.columns and 'qty' in sales_df.columns:
-                sales_df['item_code'] = sales_df['item_code'].astype(str)
-                sales_df['revenue'] = sales_df['sales'].astype(float) * sales_df['qty'].astype(float)
-                self.sales_df = sales_df[['item_code', 'revenue']].copy()
-                print("✅ 已载入 sales_item_sum，并计算 revenue = sales * qty。")
+                self.sales_index = SalesIndex(sales_df)
+                log.info("✅ 已载入 sales_item_sum，并计算 revenue = sales * qty。")
             else:
-                print("⚠️ sales_item_sum 文件缺少必要列 (item_code, sales, qty)。将默认 revenue=0。")
-                self.sales_df = None
+                log.warning("⚠️ sales_item_sum 文件缺少必要列 (item_code, sales, qty)。将默认 revenue=0。")
+                self.sales_index = None
         else:
-            print("ℹ️ 未提供 sales_item_sum，double 选择默认 revenue=0。")
-            self.sales_df = None
+            log.info("ℹ️ 未提供 sales_item_sum，double 选择默认 revenue=0。")
+            self.sales_index = None
 
         new_pog, status = self.remove_sku_items(var_dict)
         if status.get('status') == 'fail':
@@ -496,7 +525,11 @@ class FillLayerSKU(RemoveSKU):
         self.calculate_space_for_affected_layers(new_pog)
         self.sort_items_by_position(new_pog)
 
-        final_pog, status2 = self.fill_and_reposition_layers(new_pog)
+        with log.timed('delete_ip.fill', rows=len(new_pog), layers=len(self.sorted_items_by_position), mode=refill_mode):
+            if refill_mode == 'global':
+                final_pog, status2 = self.fill_and_reposition_layers_global(new_pog)
+            else:
+                final_pog, status2 = self.fill_and_reposition_layers(new_pog)
         return final_pog, status2
 
 
@@ -510,9 +543,9 @@ if __name__ == "__main__":
 
     var_dict = {
         'bases_data': {
-            'pog_data': pd.read_csv(pog_file),
-            'tray_item': pd.read_csv(tray_item_file),
-            'sales_item_sum': pd.read_csv(sales_file)
+            'pog_data': read_csv_cached(pog_file),
+            'tray_item': read_csv_cached(tray_item_file),
+            'sales_item_sum': read_csv_cached(sales_file)
         },
         'func': {
             'del_item_func': {
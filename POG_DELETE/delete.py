@@ -1,6 +1,19 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 from typing import Dict, Optional, List, Tuple
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # 仓库根目录下的公共模块
+from layer_occupancy import LayerOccupancy
+from layer_spacing import respace_layers
+from layer_pool import run_layer_tasks, first_fit_layer
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from pog_log import get_logger
+
+log = get_logger('delete')
+
 
 class RemoveSKU:
     """
@@ -12,14 +25,14 @@ class RemoveSKU:
     def __init__(self):
         self.dataframes: Dict[str, pd.DataFrame] = {}
         self.affected_layers_by_removal: List[Tuple[int, int]] = []
-        print("✅ RemoveSKU 初始化完成。")
+        log.info("✅ RemoveSKU 初始化完成。")
 
     def remove_sku_items(self, var_dict: Dict):
         pog_data = var_dict['bases_data']['pog_data']
         params = var_dict['func'].get('del_item_func', {})
         delete_skus = params.get('del_item_list', [])
 
-        print(f"\n--- 开始执行 'remove_sku_items' 删除SKU: {delete_skus} ---")
+        log.info("\n--- 开始执行 'remove_sku_items' 删除SKU: {delete_skus} ---", delete_skus=delete_skus)
 
         if pog_data is None or pog_data.empty:
             return pog_data, {'status': 'fail', 'msg': 'POG数据为空'}
@@ -65,7 +78,7 @@ class RemoveSKU:
         # ==== 执行删除 ====
         new_pog = pog_data[~pog_data['item_code'].isin(delete_skus)].copy()
         removed_num = len(pog_data) - len(new_pog)
-        print(f"🗑️ 已删除 {removed_num} 条SKU记录。")
+        log.info("🗑️ 已删除 {removed_num} 条SKU记录。", removed_num=removed_num)
 
         return new_pog, {'status': 'success', 'msg': f'成功删除 {removed_num} 个SKU'}
 
@@ -84,7 +97,10 @@ class FillLayerSKU(RemoveSKU):
         super().__init__()
         self.affected_layer_space: Optional[pd.DataFrame] = None
         self.sorted_items_by_position: Dict[Tuple[int, int], pd.DataFrame] = {}
-        print("✅ FillLayerSKU 初始化完成。")
+        self.sales_index: Optional[SalesIndex] = None
+        # 各层选品的进程数（1 为当前进程内顺序执行，None/0 为CPU核数），可由 del_item_func.workers 覆盖
+        self.workers = 1
+        log.info("✅ FillLayerSKU 初始化完成。")
 
     def analyze_layer_space(self, pog_data: pd.DataFrame, total_layer_width: int = 1000) -> pd.DataFrame:
         """
@@ -93,40 +109,34 @@ class FillLayerSKU(RemoveSKU):
         if pog_data.empty:
             return pd.DataFrame(columns=['module_id', 'layer_id', 'item_count', 'used_width', 'remaining_width'])
 
-        layer_summary = pog_data.groupby(['module_id', 'layer_id']).agg(
-            used_width=('item_width', 'sum'),
-            item_count=('item_code', 'count')
-        ).reset_index()
-        layer_summary['total_width'] = total_layer_width
-        layer_summary['remaining_width'] = layer_summary['total_width'] - layer_summary['used_width']
-        return layer_summary
+        return LayerOccupancy.from_frame(pog_data, use_facing=False, total_width=total_layer_width).summary()
 
     def calculate_space_for_affected_layers(self, pog_data: pd.DataFrame, total_layer_width: int = 1000):
         """
         仅计算受影响层的剩余空间
         """
-        print("\n--- 计算受影响层剩余空间 ---")
+        log.info("\n--- 计算受影响层剩余空间 ---")
         if not self.affected_layers_by_removal:
-            print("ℹ️ 无受影响层。")
+            log.info("ℹ️ 无受影响层。")
             return
 
         all_layers = self.analyze_layer_space(pog_data, total_layer_width)
         affected = all_layers.set_index(['module_id', 'layer_id']).reindex(self.affected_layers_by_removal)
         self.affected_layer_space = affected.reset_index()
-        print("✅ 受影响层空间计算完成。")
+        log.info("✅ 受影响层空间计算完成。")
 
     def sort_items_by_position(self, pog_data: pd.DataFrame):
         """
         为受影响层内商品按position排序
         """
-        print("\n--- 排序受影响层内商品 ---")
+        log.info("\n--- 排序受影响层内商品 ---")
         for mod_id, lay_id in self.affected_layers_by_removal:
             df = pog_data[(pog_data['module_id'] == mod_id) & (pog_data['layer_id'] == lay_id)].copy()
             if df.empty:
                 continue
             sorted_df = df.sort_values(by='position')
             self.sorted_items_by_position[(mod_id, lay_id)] = sorted_df
-        print("✅ 排序完成。")
+        log.info("✅ 排序完成。")
 
     def fill_and_reposition_layers(self, pog_data: pd.DataFrame, total_layer_width: int = 1000):
         """
@@ -134,38 +144,43 @@ class FillLayerSKU(RemoveSKU):
         1. 仅选一个销售最高的商品进行双陈列（若能放下）
         2. 否则直接重排
         3. 重排采用“两端留空”的等距分布
+        各层选品互不相关，按 self.workers 分发到进程池（见 layer_pool.run_layer_tasks）
         """
-        print("\n--- 开始执行填充与重新定位 ---")
-        updated_layers = []
-
+        log.info("\n--- 开始执行填充与重新定位 ---")
+        # 层空间只汇总一次，循环内按层直接查询
+        layer_occupancy = LayerOccupancy.from_frame(pog_data, use_facing=False, total_width=1000)
+
+        # step1: 各层按销量降序排列，宽度拼接为一个数组，每层一个任务：找第一个放得下的商品
+        layers_by_sales = []
+        tasks = []
+        offset = 0
         for layer_key, layer_df in self.sorted_items_by_position.items():
-            mod_id, lay_id = layer_key
-
-            layer_space = self.analyze_layer_space(pog_data)
-            remain = layer_space[
-                (layer_space['module_id'] == mod_id) &
-                (layer_space['layer_id'] == lay_id)
-            ]['remaining_width'].iloc[0]
-
-            current_remain = remain
-            copies_to_add = {}
-
-            # ✅ step1: 仅尝试一个sales最高且能放下的商品进行双陈列
-            if 'sales' in layer_df.columns:
+            if self.sales_index is not None:
+                sorted_by_sales = self.sales_index.sort_frame(layer_df, by='sales', ascending=False)
+            elif 'sales' in layer_df.columns:
                 sorted_by_sales = layer_df.sort_values(by='sales', ascending=False)
             else:
                 sorted_by_sales = layer_df  # 若无sales字段，则不排序
+            layers_by_sales.append(sorted_by_sales)
+            tasks.append((offset, offset + len(sorted_by_sales), layer_occupancy.remaining_width(layer_key)))
+            offset += len(sorted_by_sales)
+
+        widths = pd.concat([frame['item_width'] for frame in layers_by_sales], ignore_index=True).to_numpy(dtype=float) if layers_by_sales else np.zeros(0)
+        with log.timed('delete.first_fit', rows=len(widths), layers=len(tasks), workers=self.workers):
+            picks = run_layer_tasks(first_fit_layer, {'widths': widths}, tasks, workers=self.workers)
 
-            for _, row in sorted_by_sales.iterrows():
-                width = row['item_width']
-                code = row['item_code']
-                if current_remain >= width:
-                    copies_to_add[code] = 1
-                    current_remain -= width
-                    print(f"➕ 本层 {mod_id}-{lay_id} 增加双陈列商品: {code}")
-                    break  # 仅一个商品
+        updated_layers = []
+        for (layer_key, layer_df), sorted_by_sales, pick in zip(self.sorted_items_by_position.items(), layers_by_sales, picks):
+            mod_id, lay_id = layer_key
+
+            # ✅ 仅一个sales最高且能放下的商品进行双陈列
+            copies_to_add = {}
+            if pick >= 0:
+                code = sorted_by_sales.iloc[pick]['item_code']
+                copies_to_add[code] = 1
+                log.debug("➕ 本层 {mod_id}-{lay_id} 增加双陈列商品: {code}", mod_id=mod_id, lay_id=lay_id, code=code)
             else:
-                print(f"ℹ️ 本层 {mod_id}-{lay_id} 未增加任何商品。")
+                log.debug("ℹ️ 本层 {mod_id}-{lay_id} 未增加任何商品。", mod_id=mod_id, lay_id=lay_id)
 
             # ✅ step2: 构建新层数据
             new_items = []
@@ -176,41 +191,42 @@ class FillLayerSKU(RemoveSKU):
                     copy['position'] = -1
                     new_items.append(copy)
 
-            # ✅ step3: 等距重排（含两端空隙）
-            total_width = sum(i['item_width'] for i in new_items)
-            spacing = (total_layer_width - total_width) / (len(new_items) + 1)
-            pos = spacing
-            for item in new_items:
-                item['position'] = pos
-                pos += item['item_width'] + spacing
-
             updated_layers.append(pd.DataFrame(new_items))
 
         if not updated_layers:
             return pog_data, {'status': 'success', 'msg': '无可更新层'}
 
-        # ✅ 合并结果
+        # ✅ step3: 所有更新层一次性等距重排（含两端空隙），层内保持复制品紧跟原件的顺序
         new_layers = pd.concat(updated_layers, ignore_index=True)
+        new_layers = respace_layers(new_layers, 'edge_margin', total_width=total_layer_width, use_facing=False, sort_by_position=False)
+
+        # ✅ 合并结果
         unaffected = pog_data.set_index(['module_id', 'layer_id']).drop(
             index=pd.MultiIndex.from_tuples(self.affected_layers_by_removal, names=['module_id', 'layer_id']),
             errors='ignore'
         ).reset_index()
         new_pog = pd.concat([unaffected, new_layers], ignore_index=True)
 
-        print("✅ 填充与重新定位完成。")
+        log.info("✅ 填充与重新定位完成。")
         return new_pog, {'status': 'success', 'msg': '填充与重新定位成功'}
 
     def run_delete_fill_pipeline(self, var_dict: Dict) -> Tuple[pd.DataFrame, Dict]:
         """
         一键执行完整删除+重排流程
         """
+        # 提供了 sales_item_sum 时按销售额挑选双陈列商品
+        self.sales_index = SalesIndex.from_bases_data(var_dict['bases_data'], key='sales_item_sum')
+
+        self.workers = var_dict['func'].get('del_item_func', {}).get('workers', self.workers)
+
         pog_data, status = self.remove_sku_items(var_dict)
         if status['status'] == 'fail':
             return pog_data, status
 
         self.calculate_space_for_affected_layers(pog_data)
         self.sort_items_by_position(pog_data)
-        new_pog, status2 = self.fill_and_reposition_layers(pog_data)
+        with log.timed('delete.fill', rows=len(pog_data), layers=len(self.sorted_items_by_position)):
+            new_pog, status2 = self.fill_and_reposition_layers(pog_data)
 
         return new_pog, status2
 
@@ -221,7 +237,7 @@ class FillLayerSKU(RemoveSKU):
 if __name__ == "__main__":
     var_dict = {
         'bases_data': {
-            'pog_data': pd.read_csv("pog_result.csv")
+            'pog_data': read_csv_cached("pog_result.csv")
         },
         'func': {
             'del_item_func': {
@@ -10,9 +10,40 @@ import os
 import sys
 import itertools
 import math
-import ast
+import time
 from typing import Tuple, Dict, List, Optional, Any
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))   # 仓库根目录下的公共模块
+from layer_occupancy import LayerOccupancy
+from layer_spacing import respace_layers
+from layer_gaps import compute_layer_gaps, layer_gap_arrays
+from fixed_position_index import FixedPositionIndex
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from pog_config import PogConfig
+from pog_log import get_logger
+
+log = get_logger('sku_switcher')
+
+# 互换过程中会被修改的sku_data列，事务快照只复制这些列
+SWAP_MUTABLE_COLUMNS = ['module_id', 'layer_id', 'position', 'module', 'item_width', 'facing']
+
+# 互换可行性矩阵的原因代码，按校验顺序排列，取第一个不满足的原因
+SWAP_REASON_CODES = {
+    'ok': 0,                    # 当前空间即可互换
+    'needs_adjustment': 1,      # 需要缩减目标层的double facing才能放下
+    'same_item': 2,             # 同一个商品
+    'specified_position': 3,    # 指定位置商品
+    'series_item': 4,           # 指定连带商品
+    'fixed_position': 5,        # 固定位置商品（托盘商品等）
+    'height': 6,                # 商品高度超过层高
+    'space': 7                  # 目标层空间不足
+}
+SWAP_REASON_NAMES = {code: name for name, code in SWAP_REASON_CODES.items()}
+
+# 互换推荐中视线高度（毫米，离地），未指定 eye_level_layer 时按 layer_height 换算出视线层
+EYE_LEVEL_HEIGHT = 1100
+
 def safe_int_conversion(value, default=0):
     """
     安全地将值转换为整数
@@ -47,6 +78,56 @@ def safe_int_conversion(value, default=0):
     
     return default
 
+def safe_int_column(series, default=0):
+    """
+    safe_int_conversion 的向量化版本：对整列做同样的转换，返回 int64 的 Series
+    
+    - 已经是整数类型的列直接返回，不做任何处理
+    - 数值：缺失值为 default，其余向零取整
+    - 字符串：纯数字的整列直接转换；其余（如 '例: 101...'）按 safe_int_conversion 的规则逐个转换
+    - 其他类型的值为 default
+    
+    Args:
+        series: 要转换的列
+        default: 转换失败时的默认值
+        
+    Returns:
+        pd.Series: 转换后的整数列（索引与输入一致）
+    """
+    if pd.api.types.is_integer_dtype(series) and not series.hasnans:
+        return series
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('int64')
+    if pd.api.types.is_float_dtype(series) or pd.api.types.is_integer_dtype(series):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return pd.Series(np.where(np.isfinite(values), np.trunc(values), default).astype('int64'), index=series.index)
+    
+    series = series.astype(object)
+    result = pd.Series(default, index=series.index, dtype='int64')
+    
+    # 字符串元素：纯字符串列（缺失值除外）直接整列处理，混合类型的列才逐个判断类型
+    if pd.api.types.infer_dtype(series, skipna=True) == 'string':
+        is_str = series.notna().to_numpy()
+    else:
+        is_str = series.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    if is_str.any():
+        # 绝大多数是纯数字编号，整列去空白后直接转整数；带前缀等其他写法的个别字符串逐个转换
+        str_values = series[is_str]
+        text = np.char.strip(str_values.to_numpy(dtype=str))
+        clean = np.char.isdecimal(text) & (np.char.str_len(text) <= 18)
+        parsed = np.full(len(text), default, dtype='int64')
+        parsed[clean] = text[clean].astype('int64')
+        if not clean.all():
+            parsed[~clean] = str_values[~clean].map(lambda value: safe_int_conversion(value, default)).to_numpy(dtype='int64')
+        result[is_str] = parsed
+    
+    # 数值元素
+    others = series[~is_str]
+    if len(others) > 0:
+        numeric = pd.to_numeric(others, errors='coerce').to_numpy(dtype=float)
+        result[~is_str] = np.where(np.isfinite(numeric), np.trunc(numeric), default).astype('int64')
+    return result
+
 def initialize_var_dict(base_path=None):
     """
     初始化var_dict，加载所有基础数据
@@ -62,7 +143,13 @@ def initialize_var_dict(base_path=None):
         'func': {
             'switch_item_func': {
                 'description': '互换两个现有商品的位置',
-                'required_params': ['item1', 'item2']
+                'required_params': ['item1', 'item2'],
+                'optional_params': {'relayout_scope': "互换后重新排列的范围：'dirty'（默认，只排列变动过的层）或 'all'（整张POG）"}
+            },
+            'switch_items_batch': {
+                'description': '批量互换现有商品的位置（整批校验，任一失败则全部回滚）',
+                'required_params': ['pairs'],
+                'optional_params': {'relayout_scope': "同 switch_item_func"}
             }
         }
     }
@@ -71,108 +158,94 @@ def initialize_var_dict(base_path=None):
         base_path = os.getcwd()
     
     try:
-        print("开始加载数据文件...")
+        log.info("开始加载数据文件...")
         
         # 加载配置
         config_path = os.path.join(base_path, 'config.txt')
-        print(f"配置文件路径: {config_path}")
+        log.debug("配置文件路径: {config_path}", config_path=config_path)
         
         if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-            if '=' in content:
-                dict_str = content.split('=', 1)[1].strip()
-            else:
-                dict_str = content
-            config = ast.literal_eval(dict_str)
-            var_dict['bases_data']['config'] = config
-            print("✓ 配置文件加载完成")
+            var_dict['bases_data']['config'] = PogConfig.load(config_path)
+            log.info("✓ 配置文件加载完成")
         else:
-            print("⚠ 配置文件不存在，使用空配置")
-            var_dict['bases_data']['config'] = {}
+            log.warning("⚠ 配置文件不存在，使用空配置")
+            var_dict['bases_data']['config'] = PogConfig({})
         
         # 加载商品主数据
         item_master_path = os.path.join(base_path, 'ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv')
-        print(f"商品主数据路径: {item_master_path}")
+        log.debug("商品主数据路径: {item_master_path}", item_master_path=item_master_path)
         if os.path.exists(item_master_path):
-            item_master = pd.read_csv(item_master_path)
+            item_master = read_csv_cached(item_master_path)
             # 安全转换item_idnt列
             if 'item_idnt' in item_master.columns:
-                item_master['item_idnt'] = item_master['item_idnt'].apply(safe_int_conversion)
+                item_master['item_idnt'] = safe_int_column(item_master['item_idnt'])
             var_dict['bases_data']['item_master'] = item_master
-            print("✓ 商品主数据加载完成")
+            log.info("✓ 商品主数据加载完成")
         else:
-            print("⚠ 商品主数据文件不存在，创建空数据框")
+            log.warning("⚠ 商品主数据文件不存在，创建空数据框")
             var_dict['bases_data']['item_master'] = pd.DataFrame()
         
         # 加载销售数据
         sales_path = os.path.join(base_path, 'sales_item_sum.csv')
-        print(f"销售数据路径: {sales_path}")
+        log.debug("销售数据路径: {sales_path}", sales_path=sales_path)
         if os.path.exists(sales_path):
-            sales_data = pd.read_csv(sales_path)
+            sales_data = read_csv_cached(sales_path)
             # 安全转换item_code列
             if 'item_code' in sales_data.columns:
-                sales_data['item_code'] = sales_data['item_code'].apply(safe_int_conversion)
+                sales_data['item_code'] = safe_int_column(sales_data['item_code'])
             var_dict['bases_data']['sales_data'] = sales_data
-            print("✓ 销售数据加载完成")
+            log.info("✓ 销售数据加载完成")
         else:
-            print("⚠ 销售数据文件不存在，创建空数据框")
+            log.warning("⚠ 销售数据文件不存在，创建空数据框")
             var_dict['bases_data']['sales_data'] = pd.DataFrame()
         
         # 加载当前POG结果
         pog_path = os.path.join(base_path, 'pog_result.csv')
-        print(f"POG数据路径: {pog_path}")
+        log.debug("POG数据路径: {pog_path}", pog_path=pog_path)
         if os.path.exists(pog_path):
-            pog_data = pd.read_csv(pog_path)
+            pog_data = read_csv_cached(pog_path)
             # 安全转换item_code列
             if 'item_code' in pog_data.columns:
-                pog_data['item_code'] = pog_data['item_code'].apply(safe_int_conversion)
+                pog_data['item_code'] = safe_int_column(pog_data['item_code'])
             var_dict['bases_data']['pog_data'] = pog_data
-            print("✓ POG结果数据加载完成")
+            log.info("✓ POG结果数据加载完成")
         else:
-            print("⚠ POG数据文件不存在，创建空数据框")
+            log.warning("⚠ POG数据文件不存在，创建空数据框")
             var_dict['bases_data']['pog_data'] = pd.DataFrame()
         
         # 加载tray数据
         tray_path = os.path.join(base_path, 'pog_test_haircare_tray.csv')
         tray_item_path = os.path.join(base_path, 'pog_test_haircare_tray_item.csv')
-        print(f"Tray数据路径: {tray_path}")
-        print(f"Tray商品数据路径: {tray_item_path}")
+        log.debug("Tray数据路径: {tray_path}", tray_path=tray_path)
+        log.debug("Tray商品数据路径: {tray_item_path}", tray_item_path=tray_item_path)
         
         if os.path.exists(tray_path):
-            tray_data = pd.read_csv(tray_path)
+            tray_data = read_csv_cached(tray_path)
             var_dict['bases_data']['tray_data'] = tray_data
-            print("✓ Tray数据加载完成")
+            log.info("✓ Tray数据加载完成")
         else:
-            print("⚠ Tray数据文件不存在，创建空数据框")
+            log.warning("⚠ Tray数据文件不存在，创建空数据框")
             var_dict['bases_data']['tray_data'] = pd.DataFrame()
             
         if os.path.exists(tray_item_path):
-            tray_item_data = pd.read_csv(tray_item_path)
+            tray_item_data = read_csv_cached(tray_item_path)
             # 安全转换item_code列
             if 'item_code' in tray_item_data.columns:
-                tray_item_data['item_code'] = tray_item_data['item_code'].apply(safe_int_conversion)
+                tray_item_data['item_code'] = safe_int_column(tray_item_data['item_code'])
             var_dict['bases_data']['tray_item_data'] = tray_item_data
-            print("✓ Tray商品数据加载完成")
+            log.info("✓ Tray商品数据加载完成")
         else:
-            print("⚠ Tray商品数据文件不存在，创建空数据框")
+            log.warning("⚠ Tray商品数据文件不存在，创建空数据框")
             var_dict['bases_data']['tray_item_data'] = pd.DataFrame()
         
-        # 准备SKU数据
-        sku_data = _prepare_sku_data(var_dict)
-        var_dict['bases_data']['sku_data'] = sku_data
-        print("✓ SKU数据准备完成")
-        
-        # 识别固定位置托盘
-        fixed_trays = _identify_fixed_position_trays(var_dict)
-        var_dict['bases_data']['fixed_trays'] = fixed_trays
-        print(f"✓ 识别固定位置托盘: {len(fixed_trays)}个")
-        
-        print("所有数据加载完成!")
+        # 准备SKU数据、层占用与固定位置索引
+        prepare_switch_state(var_dict)
+
+        log.info("所有数据加载完成!")
         return var_dict
         
     except FileNotFoundError as e:
-        print(f"文件未找到: {e}")
+        log.error("文件未找到: {error}", error=e)
         files_to_check = [
             'config.txt', 'ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv',
             'sales_item_sum.csv', 'pog_result.csv',
@@ -181,27 +254,48 @@ def initialize_var_dict(base_path=None):
         for file in files_to_check:
             file_path = os.path.join(base_path, file)
             exists = os.path.exists(file_path)
-            print(f"  {file}: {'✓ 存在' if exists else '✗ 不存在'}")
+            log.error("  {file}: {state}", file=file, state='✓ 存在' if exists else '✗ 不存在')
         raise
     except Exception as e:
-        print(f"数据加载失败: {e}")
+        log.error("数据加载失败: {error}", error=e)
         raise
 
+def prepare_switch_state(var_dict):
+    """
+    由 bases_data 中已加载的基础数据（config、item_master、sales_data、pog_data、tray_item_data）
+    准备互换所需的 sku_data、层占用索引、固定位置索引与固定位置托盘；
+    pog_data 更新后（例如常驻服务中其他操作提交了新的POG）调用本函数即可重建，无需重新读取文件
+    """
+    bases_data = var_dict['bases_data']
+    with log.timed('switch.prepare_sku_data') as step:
+        sku_data = _prepare_sku_data(var_dict)
+        step.set(rows=len(sku_data))
+    bases_data['sku_data'] = sku_data
+    bases_data['layer_occupancy'] = LayerOccupancy.from_frame(sku_data)
+    bases_data['fixed_position_index'] = FixedPositionIndex.from_frame(sku_data, bases_data['config'], bases_data['tray_item_data'])
+    bases_data['layer_gaps'] = None
+    bases_data['dirty_layers'] = set()
+    log.info("✓ SKU数据准备完成")
+
+    # 识别固定位置托盘
+    fixed_trays = _identify_fixed_position_trays(var_dict)
+    bases_data['fixed_trays'] = fixed_trays
+    log.info("✓ 识别固定位置托盘: {fixed_trays_count}个", fixed_trays_count=len(fixed_trays))
+    return var_dict
+
+def _get_config(var_dict):
+    """取出配置；手工构造的 var_dict 中若为配置字典，则包装为 PogConfig 并写回"""
+    config = PogConfig.ensure(var_dict['bases_data'].get('config', {}))
+    var_dict['bases_data']['config'] = config
+    return config
+
 def _identify_fixed_position_trays(var_dict):
-    """识别固定位置的托盘"""
-    config = var_dict['bases_data']['config']
-    tray_config = config.get('tray', {})
-    fixed_trays = {}
-    
-    for tray_id, tray_info in tray_config.items():
-        # 如果layer_type为'module'，则是固定位置托盘
-        if tray_info.get('layer_type') == 'module':
-            fixed_trays[int(tray_id)] = tray_info
-            print(f"  - 托盘 {tray_id}: 固定位置")
-        else:
-            print(f"  - 托盘 {tray_id}: 可移动位置")
+    """识别固定位置的托盘（layer_type为'module'），直接取 PogConfig 中预先整理好的托盘表"""
+    config = _get_config(var_dict)
+    for tray_id in config.trays:
+        log.debug("  - 托盘 {tray_id}: {tray_type}", tray_id=tray_id, tray_type='固定位置' if tray_id in config.fixed_trays else '可移动位置')
     
-    return fixed_trays
+    return dict(config.fixed_trays)
 
 def _prepare_sku_data(var_dict):
     """准备SKU数据"""
@@ -212,21 +306,21 @@ def _prepare_sku_data(var_dict):
     
     # 检查数据是否为空
     if pog_data.empty:
-        print("⚠ POG数据为空，创建空的SKU数据")
+        log.warning("⚠ POG数据为空，创建空的SKU数据")
         return pd.DataFrame()
     
     # 统一数据类型：将item_code转换为整数
     if 'item_code' in pog_data.columns:
-        pog_data['item_code'] = pog_data['item_code'].apply(safe_int_conversion)
+        pog_data['item_code'] = safe_int_column(pog_data['item_code'])
     
     if not item_master.empty and 'item_idnt' in item_master.columns:
-        item_master['item_idnt'] = item_master['item_idnt'].apply(safe_int_conversion)
+        item_master['item_idnt'] = safe_int_column(item_master['item_idnt'])
     
     if not sales_data.empty and 'item_code' in sales_data.columns:
-        sales_data['item_code'] = sales_data['item_code'].apply(safe_int_conversion)
+        sales_data['item_code'] = safe_int_column(sales_data['item_code'])
     
     if not tray_item_data.empty and 'item_code' in tray_item_data.columns:
-        tray_item_data['item_code'] = tray_item_data['item_code'].apply(safe_int_conversion)
+        tray_item_data['item_code'] = safe_int_column(tray_item_data['item_code'])
     
     # 合并POG结果和商品主数据
     if not item_master.empty and 'item_idnt' in item_master.columns:
@@ -239,18 +333,15 @@ def _prepare_sku_data(var_dict):
         )
     else:
         sku_merged = pog_data.copy()
-        print("⚠ 商品主数据为空或缺少item_idnt列，跳过合并")
+        log.warning("⚠ 商品主数据为空或缺少item_idnt列，跳过合并")
     
-    # 合并销售数据
-    if not sales_data.empty and 'item_code' in sales_data.columns:
-        sku_merged = pd.merge(
-            sku_merged,
-            sales_data,
-            on='item_code',
-            how='left'
-        )
+    # 合并销售数据：通过共享的 SalesIndex 按商品编号映射 sales / qty（缺失为NaN）
+    sales_index = SalesIndex.from_bases_data(var_dict['bases_data'])
+    if sales_index is not None:
+        for column in ('sales', 'qty'):
+            sku_merged[column] = sales_index.lookup(sku_merged['item_code'], column)
     else:
-        print("⚠ 销售数据为空或缺少item_code列，跳过合并")
+        log.warning("⚠ 销售数据为空或缺少item_code列，跳过合并")
     
     # 添加固定位置标识（从tray数据中获取）
     if not tray_item_data.empty and 'is_place_item' in tray_item_data.columns:
@@ -259,10 +350,10 @@ def _prepare_sku_data(var_dict):
         ]['item_code'].unique()
         
         sku_merged['is_fixed_position'] = sku_merged['item_code'].isin(fixed_position_items)
-        print(f"✓ 识别固定位置商品: {len(fixed_position_items)}个")
+        log.info("✓ 识别固定位置商品: {fixed_position_items_count}个", fixed_position_items_count=len(fixed_position_items))
     else:
         sku_merged['is_fixed_position'] = False
-        print("⚠ Tray商品数据为空或缺少必要列，所有商品标记为非固定位置")
+        log.warning("⚠ Tray商品数据为空或缺少必要列，所有商品标记为非固定位置")
     
     return sku_merged
 
@@ -297,34 +388,19 @@ def _get_sku_info(var_dict, item_code):
 
 def _get_specified_position_items(var_dict):
     """获取指定位置商品列表"""
-    config = var_dict['bases_data']['config']
-    specified_items = config.get('item_position', {}).get('item_list', [])
-    # 安全转换指定位置商品
-    specified_items = [safe_int_conversion(item) for item in specified_items]
-    print(f"✓ 识别指定位置商品: {len(specified_items)}个")
+    specified_items = _get_config(var_dict).specified_items
+    log.debug("✓ 识别指定位置商品: {specified_items_count}个", specified_items_count=len(specified_items))
     return specified_items
 
 def _get_specified_series_items(var_dict):
     """获取指定连带商品列表"""
-    config = var_dict['bases_data']['config']
-    series_items = []
-    tray_config = config.get('tray', {})
-    
-    for tray_id, tray_info in tray_config.items():
-        series_item_config = tray_info.get('series_item', {})
-        tray_series_items = list(series_item_config.keys())
-        if tray_series_items:
-            tray_series_items = [safe_int_conversion(item) for item in tray_series_items]
-            series_items.extend(tray_series_items)
-    
-    # 去重
-    series_items = list(set(series_items))
-    print(f"✓ 识别指定连带商品: {len(series_items)}个")
+    series_items = _get_config(var_dict).series_items
+    log.debug("✓ 识别指定连带商品: {series_items_count}个", series_items_count=len(series_items))
     return series_items
 
 def _validate_special_rules(var_dict, sku1, sku2):
     """校验特殊规则"""
-    print(f"\n步骤1: 检查特殊规则")
+    log.info("\n步骤1: 检查特殊规则")
     
     # 1.1 检查指定位置商品
     specified_position_items = _get_specified_position_items(var_dict)
@@ -332,7 +408,7 @@ def _validate_special_rules(var_dict, sku1, sku2):
         return False, f'商品 {sku1} 为指定位置商品，不能移动'
     if sku2 in specified_position_items:
         return False, f'商品 {sku2} 为指定位置商品，不能移动'
-    print("✓ 指定位置检查通过")
+    log.debug("✓ 指定位置检查通过")
     
     # 1.2 检查指定连带商品
     specified_series_items = _get_specified_series_items(var_dict)
@@ -340,7 +416,7 @@ def _validate_special_rules(var_dict, sku1, sku2):
         return False, f'商品 {sku1} 为指定连带商品，不能单独移动'
     if sku2 in specified_series_items:
         return False, f'商品 {sku2} 为指定连带商品，不能单独移动'
-    print("✓ 指定连带检查通过")
+    log.debug("✓ 指定连带检查通过")
     
     # 1.3 检查固定位置商品
     sku1_info = _get_sku_info(var_dict, sku1)
@@ -350,24 +426,24 @@ def _validate_special_rules(var_dict, sku1, sku2):
         return False, f'商品 {sku1} 为固定位置商品，不能移动'
     if sku2_info['is_fixed_position']:
         return False, f'商品 {sku2} 为固定位置商品，不能移动'
-    print("✓ 固定位置检查通过")
+    log.debug("✓ 固定位置检查通过")
     
     return True, "所有特殊规则检查通过"
 
 def _get_layer_height(var_dict):
     """获取货架高度"""
-    config = var_dict['bases_data']['config']
+    config = _get_config(var_dict)
     try:
         layer_height = config['global']['layer_height']
-        print(f"✓ 货架高度: {layer_height}mm")
+        log.debug("✓ 货架高度: {layer_height}mm", layer_height=layer_height)
         return layer_height
     except KeyError:
-        print("⚠ 警告: 配置文件中未找到货架高度(layer_height)配置，使用默认值1500mm")
+        log.warning("⚠ 警告: 配置文件中未找到货架高度(layer_height)配置，使用默认值1500mm")
         return 1500
 
 def _validate_height_feasibility(var_dict, sku1, sku2, sku1_info, sku2_info):
     """高度可行性校验"""
-    print(f"\n步骤2: 高度可行性校验")
+    log.info("\n步骤2: 高度可行性校验")
     
     # 获取货架高度
     layer_height = _get_layer_height(var_dict)
@@ -377,194 +453,162 @@ def _validate_height_feasibility(var_dict, sku1, sku2, sku1_info, sku2_info):
     target_layer1 = sku2_info['layer_id']
     if sku1_height > layer_height:
         return False, f'商品 {sku1} 高度 {sku1_height}mm > 目标层高 {layer_height}mm，无法放入模块{sku2_info["module_id"]}层{target_layer1}'
-    print(f"✓ SKU {sku1} 高度 {sku1_height}mm <= 目标层高 {layer_height}mm")
+    log.debug("✓ SKU {sku1} 高度 {sku1_height}mm <= 目标层高 {layer_height}mm", sku1=sku1, sku1_height=sku1_height, layer_height=layer_height)
     
     # 检查SKU2在目标层的高度可行性
     sku2_height = sku2_info['height']
     target_layer2 = sku1_info['layer_id']
     if sku2_height > layer_height:
         return False, f'商品 {sku2} 高度 {sku2_height}mm > 目标层高 {layer_height}mm，无法放入模块{sku1_info["module_id"]}层{target_layer2}'
-    print(f"✓ SKU {sku2} 高度 {sku2_height}mm <= 目标层高 {layer_height}mm")
+    log.debug("✓ SKU {sku2} 高度 {sku2_height}mm <= 目标层高 {layer_height}mm", sku2=sku2, sku2_height=sku2_height, layer_height=layer_height)
     
-    print("✓ 高度可行性校验通过")
+    log.info("✓ 高度可行性校验通过")
     return True, "高度可行性校验通过"
 
-def _calculate_layer_remaining_space(var_dict, module_id, layer_id, exclude_sku=None):
-    """计算指定层的剩余空间"""
+def _get_layer_occupancy(var_dict):
+    """获取层占用索引（不存在时由sku_data构建）"""
+    bases_data = var_dict['bases_data']
+    if bases_data.get('layer_occupancy') is None:
+        bases_data['layer_occupancy'] = LayerOccupancy.from_frame(bases_data['sku_data'])
+    return bases_data['layer_occupancy']
+
+def _sync_layer_occupancy(var_dict, row_indices):
+    """
+    将sku_data中指定行的层、位置、宽度与facing同步到层占用索引，
+    使涉及层（移出层与移入层）的空隙汇总与固定位置信息失效，并把这些层记为待重新排列的脏层
+    """
+    occupancy = _get_layer_occupancy(var_dict)
+    fixed_index = _get_fixed_position_index(var_dict)
+    layer_gaps = var_dict['bases_data'].get('layer_gaps')
+    dirty_layers = _get_dirty_layers(var_dict)
     sku_data = var_dict['bases_data']['sku_data']
-    
-    if sku_data.empty:
-        return {'total_space': 1000, 'item_count': 0}
-    
-    # 获取该层的所有商品
-    layer_items = sku_data[
-        (sku_data['module_id'] == module_id) & 
-        (sku_data['layer_id'] == layer_id)
+    for idx in row_indices:
+        row = sku_data.loc[idx]
+        layer_key = (row['module_id'], row['layer_id'])
+        old_layer_key = occupancy.layer_of(idx)
+        if layer_gaps is not None:
+            layer_gaps.pop(old_layer_key, None)
+            layer_gaps.pop(layer_key, None)
+        fixed_index.invalidate([old_layer_key, layer_key])
+        if old_layer_key is not None:
+            dirty_layers.add(old_layer_key)
+        dirty_layers.add(layer_key)
+        occupancy.move_item(idx, layer_key, row['position'])
+        occupancy.update_item(idx, item_width=row['item_width'], facing=row['facing'])
+
+def _get_fixed_position_index(var_dict):
+    """获取固定位置商品索引（不存在时由sku_data构建）"""
+    bases_data = var_dict['bases_data']
+    if bases_data.get('fixed_position_index') is None:
+        bases_data['fixed_position_index'] = FixedPositionIndex.from_frame(
+            bases_data['sku_data'], _get_config(var_dict), bases_data.get('tray_item_data')
+        )
+    return bases_data['fixed_position_index']
+
+def _refresh_fixed_positions(var_dict, layer_keys):
+    """用层占用索引中的最新行重新计算过期层的固定位置信息"""
+    fixed_index = _get_fixed_position_index(var_dict)
+    stale_layers = [layer_key for layer_key in layer_keys if fixed_index.is_stale(layer_key)]
+    if stale_layers:
+        occupancy = _get_layer_occupancy(var_dict)
+        row_indices = [row_key for layer_key in stale_layers for row_key, _ in occupancy.layer_rows(layer_key, sort_by_position=False)]
+        fixed_index.update(var_dict['bases_data']['sku_data'].loc[row_indices], stale_layers)
+    return fixed_index
+
+def _get_dirty_layers(var_dict):
+    """自上次重新排列以来发生过变动的层 {(module_id, layer_id), ...}"""
+    bases_data = var_dict['bases_data']
+    if bases_data.get('dirty_layers') is None:
+        bases_data['dirty_layers'] = set()
+    return bases_data['dirty_layers']
+
+def _get_layer_gaps(var_dict):
+    """
+    各层空隙汇总 {(module_id, layer_id): {...}}，首次使用时对整张sku_data一次性向量化计算；
+    之后某层发生变动时只失效该层，下次查询时按层占用索引重新计算
+    """
+    bases_data = var_dict['bases_data']
+    if bases_data.get('layer_gaps') is None:
+        gap_table = compute_layer_gaps(bases_data['sku_data'])
+        bases_data['layer_gaps'] = gap_table.to_dict('index')
+    return bases_data['layer_gaps']
+
+def _layer_gap_summary(occupancy, layer_key, exclude_sku=None):
+    """由层占用索引计算单层空隙汇总（可排除指定SKU）"""
+    rows = [
+        row for _, row in occupancy.layer_rows(layer_key, sort_by_position=False)
+        if not (exclude_sku and row['item_code'] == exclude_sku) and row['position'] is not None
     ]
+    module_width = occupancy.module_width(layer_key)
+    if not rows:
+        return {'item_count': 0, 'module_width': module_width, 'used_width': 0, 'head_gap': 0, 'inner_gap': 0,
+                'tail_gap': module_width, 'total_space': module_width, 'largest_gap': module_width, 'largest_gap_start': 0}
+    gaps = layer_gap_arrays(
+        np.zeros(len(rows), dtype=int),
+        [row['position'] for row in rows],
+        [row['item_width'] * row['facing'] for row in rows],
+        np.full(len(rows), module_width, dtype=float)
+    )
+    summary = {name: values[0] for name, values in gaps.items()}
+    summary['module_width'] = module_width
+    return summary
+
+def _calculate_layer_remaining_space(var_dict, module_id, layer_id, exclude_sku=None):
+    """
+    计算指定层的剩余空间（开头、商品间与结尾空隙之和），商品占用宽度按 item_width × facing、层宽取该层的 module_width
     
-    # 如果指定了排除的SKU，则排除
-    if exclude_sku:
-        layer_items = layer_items[layer_items['item_code'] != exclude_sku]
-    
-    layer_items = layer_items.sort_values('position')
-    
-    if layer_items.empty:
-        return {'total_space': 1000, 'item_count': 0}
-    
-    module_width = 1000  # 每个模块1000mm
-    total_gaps = 0
+    Returns:
+        dict: total_space（总空隙）、largest_gap（最大连续空隙）及其起点 largest_gap_start、item_count、module_width
+    """
+    sku_data = var_dict['bases_data']['sku_data']
     
-    # 开头间隙
-    if layer_items.iloc[0]['position'] > 0:
-        total_gaps += layer_items.iloc[0]['position']
+    if sku_data.empty:
+        return {'total_space': 1000, 'largest_gap': 1000, 'largest_gap_start': 0, 'item_count': 0, 'module_width': 1000}
     
-    # 商品间间隙
-    for i in range(len(layer_items) - 1):
-        current_end = layer_items.iloc[i]['position'] + layer_items.iloc[i]['item_width']
-        next_start = layer_items.iloc[i + 1]['position']
-        gap = next_start - current_end
-        if gap > 0:
-            total_gaps += gap
+    layer_key = (module_id, layer_id)
+    occupancy = _get_layer_occupancy(var_dict)
+    layer_gaps = _get_layer_gaps(var_dict)
+    excluded_in_layer = exclude_sku and any(row['item_code'] == exclude_sku for _, row in occupancy.layer_rows(layer_key, sort_by_position=False))
     
-    # 结尾间隙
-    last_item_end = layer_items.iloc[-1]['position'] + layer_items.iloc[-1]['item_width']
-    if last_item_end < module_width:
-        total_gaps += module_width - last_item_end
+    if excluded_in_layer:
+        summary = _layer_gap_summary(occupancy, layer_key, exclude_sku)
+    else:
+        if layer_key not in layer_gaps:
+            layer_gaps[layer_key] = _layer_gap_summary(occupancy, layer_key)
+        summary = layer_gaps[layer_key]
     
     return {
-        'total_space': total_gaps,
-        'item_count': len(layer_items),
-        'module_width': module_width
+        'total_space': summary['total_space'],
+        'largest_gap': summary['largest_gap'],
+        'largest_gap_start': summary['largest_gap_start'],
+        'item_count': int(summary['item_count']),
+        'module_width': summary['module_width']
     }
 
 def _identify_fixed_position_items_in_layer(var_dict, module_id, layer_id):
-    """识别指定层中的固定位置商品（托盘及其前方商品）"""
-    sku_data = var_dict['bases_data']['sku_data']
-    fixed_trays = var_dict['bases_data']['fixed_trays']
-    
-    if sku_data.empty:
+    """识别指定层中的固定位置商品（托盘及其前方商品、指定陈列商品），返回商品编号列表"""
+    if var_dict['bases_data']['sku_data'].empty:
         return []
-    
-    # 获取该层的所有商品
-    layer_items = sku_data[
-        (sku_data['module_id'] == module_id) & 
-        (sku_data['layer_id'] == layer_id)
-    ].sort_values('position')
-    
-    # 确保item_code为整数类型
-    if 'item_code' in layer_items.columns:
-        layer_items['item_code'] = layer_items['item_code'].apply(safe_int_conversion)
-    
-    fixed_items = set()
-    
-    # 识别托盘商品（固定位置）
-    for tray_id, tray_info in fixed_trays.items():
-        # 检查托盘是否在该层
-        tray_layer = tray_info.get('layer')
-        if tray_layer == layer_id:
-            # 获取该托盘的所有商品
-            tray_items = var_dict['bases_data']['tray_item_data']
-            if not tray_items.empty and 'item_code' in tray_items.columns:
-                tray_item_codes = tray_items[tray_items['tray_id'] == tray_id]['item_code'].apply(safe_int_conversion).values
-                
-                for item_code in tray_item_codes:
-                    if item_code in layer_items['item_code'].values:
-                        fixed_items.add(item_code)
-                        
-                        # 找到托盘商品的位置
-                        tray_item_info = layer_items[layer_items['item_code'] == item_code].iloc[0]
-                        tray_position = tray_item_info['position']
-                        tray_width = tray_item_info['item_width']
-                        
-                        # 识别托盘前方的商品（位置小于托盘位置的）
-                        front_items = layer_items[layer_items['position'] < tray_position]
-                        for _, front_item in front_items.iterrows():
-                            fixed_items.add(front_item['item_code'])
-    
-    # 添加其他固定位置商品
-    if 'is_fixed_position' in layer_items.columns:
-        fixed_position_items = layer_items[layer_items['is_fixed_position']]['item_code'].values
-        for item_code in fixed_position_items:
-            fixed_items.add(item_code)
-    
-    return list(fixed_items)
+    layer_key = (module_id, layer_id)
+    fixed_index = _refresh_fixed_positions(var_dict, [layer_key])
+    return fixed_index.pinned_item_codes(layer_key).tolist()
+
+def _fixed_position_mask(var_dict, sku_df):
+    """标记sku_df中的固定位置商品行（按层内商品编号匹配），各层的固定商品取自固定位置索引"""
+    if var_dict['bases_data']['sku_data'].empty or sku_df.empty:
+        return np.zeros(len(sku_df), dtype=bool)
+
+    layer_keys = set(zip(sku_df['module_id'], sku_df['layer_id']))
+    fixed_index = _refresh_fixed_positions(var_dict, layer_keys)
+    return fixed_index.mask(sku_df)
 
 def _gap_expand_adjusted_with_fixed_positions(var_dict, sku_df, max_interval=5):
-    """调整商品间隔（考虑固定位置商品）"""
+    """调整商品间隔（考虑固定位置商品）：固定位置商品不动，其余商品在相邻固定商品之间按max_interval紧排，所有层一次性向量化计算"""
     if sku_df.empty:
         return sku_df
-        
-    sku_df_cp = sku_df.copy()
-    
-    for (module_id, layer_id), group in sku_df_cp.groupby(['module_id', 'layer_id']):
-        # 识别该层的固定位置商品
-        fixed_items = _identify_fixed_position_items_in_layer(var_dict, module_id, layer_id)
-        
-        if not fixed_items:
-            # 如果没有固定位置商品，正常调整
-            sorted_group = group.sort_values('position')
-            
-            current_pos = 0
-            new_positions = []
-            
-            for ind, row in sorted_group.iterrows():
-                new_positions.append(current_pos)
-                current_pos += row['item_width'] + max_interval
-            
-            sku_df_cp.loc[sorted_group.index, 'position'] = new_positions
-        else:
-            # 有固定位置商品，分段处理
-            sorted_group = group.sort_values('position')
-            fixed_items_positions = []
-            
-            # 获取固定位置商品的位置信息
-            for item_code in fixed_items:
-                item_info = sorted_group[sorted_group['item_code'] == item_code]
-                if not item_info.empty:
-                    fixed_items_positions.append({
-                        'item_code': item_code,
-                        'position': item_info['position'].iloc[0],
-                        'width': item_info['item_width'].iloc[0],
-                        'index': item_info.index[0]
-                    })
-            
-            # 按位置排序固定商品
-            fixed_items_positions.sort(key=lambda x: x['position'])
-            
-            # 分段处理非固定位置商品
-            current_pos = 0
-            
-            for i, fixed_item in enumerate(fixed_items_positions):
-                # 处理固定商品之前的非固定商品
-                items_before = sorted_group[
-                    (sorted_group['position'] < fixed_item['position']) & 
-                    (~sorted_group['item_code'].isin(fixed_items))
-                ]
-                
-                for _, row in items_before.iterrows():
-                    if row['position'] >= current_pos:  # 避免重复处理
-                        sku_df_cp.loc[row.name, 'position'] = current_pos
-                        current_pos += row['item_width'] + max_interval
-                
-                # 设置固定商品位置（保持不变）
-                sku_df_cp.loc[fixed_item['index'], 'position'] = fixed_item['position']
-                current_pos = fixed_item['position'] + fixed_item['width'] + max_interval
-            
-            # 处理最后一个固定商品之后的非固定商品
-            last_fixed_pos = fixed_items_positions[-1]['position'] if fixed_items_positions else 0
-            last_fixed_width = fixed_items_positions[-1]['width'] if fixed_items_positions else 0
-            current_pos = last_fixed_pos + last_fixed_width + max_interval
-            
-            items_after = sorted_group[
-                (sorted_group['position'] > last_fixed_pos) & 
-                (~sorted_group['item_code'].isin(fixed_items))
-            ]
-            
-            for _, row in items_after.iterrows():
-                sku_df_cp.loc[row.name, 'position'] = current_pos
-                current_pos += row['item_width'] + max_interval
-    
-    return sku_df_cp
+
+    fixed_mask = _fixed_position_mask(var_dict, sku_df)
+    return respace_layers(sku_df, 'fixed_interval', fixed_mask=fixed_mask, interval=max_interval)
 
 def _reduce_intervals(var_dict, module_id, layer_id, exclude_sku=None):
     """缩减商品间隔（考虑固定位置）"""
@@ -588,12 +632,13 @@ def _reduce_intervals(var_dict, module_id, layer_id, exclude_sku=None):
         # 重新排列商品，最小化间隔（考虑固定位置）
         adjusted_items = _gap_expand_adjusted_with_fixed_positions(var_dict, layer_items, max_interval=1)
         sku_data.loc[adjusted_items.index] = adjusted_items
+        _sync_layer_occupancy(var_dict, adjusted_items.index)
         
-        print("  - 已缩减商品间隔（考虑固定位置）")
+        log.debug("  - 已缩减商品间隔（考虑固定位置）")
         return True
         
     except Exception as e:
-        print(f"缩减间隔异常: {e}")
+        log.error("缩减间隔异常: {error}", error=e)
         return False
 
 def _remove_double_facing_by_sales(var_dict, module_id, layer_id, required_width, exclude_sku=None):
@@ -615,19 +660,22 @@ def _remove_double_facing_by_sales(var_dict, module_id, layer_id, required_width
         double_facing_items = layer_items[layer_items['facing'] > 1]
         
         if double_facing_items.empty:
-            print("  - 该层没有double facing商品")
+            log.debug("  - 该层没有double facing商品")
             return False
         
-        # 按销售从低到高排序
-        double_facing_sorted = double_facing_items.sort_values('sales', ascending=True)
+        # 按销售从低到高排序（没有销售记录的商品按0处理）
+        sales_index = var_dict['bases_data'].get('sales_index')
+        if sales_index is not None:
+            double_facing_sorted = sales_index.sort_frame(double_facing_items, by='sales', ascending=True)
+        else:
+            double_facing_sorted = double_facing_items.sort_values('sales', ascending=True)
         
         for _, worst_selling in double_facing_sorted.iterrows():
-            # 缩减面位
+            # 缩减面位（item_width 为单个面位的宽度，占用宽度随 facing 一起减少）
             sku_data.loc[worst_selling.name, 'facing'] = 1
-            original_single_width = worst_selling['item_width'] / worst_selling['facing']
-            sku_data.loc[worst_selling.name, 'item_width'] = original_single_width
+            _sync_layer_occupancy(var_dict, [worst_selling.name])
             
-            print(f"  - 已缩减商品 {worst_selling['item_code']} 的面位（销售: {worst_selling['sales']:.2f}）")
+            log.debug("  - 已缩减商品 {item_code} 的面位（销售: {sales:.2f}）", item_code=worst_selling['item_code'], sales=worst_selling['sales'])
             
             # 检查当前空间是否足够
             current_space = _calculate_layer_remaining_space(var_dict, module_id, layer_id, exclude_sku)['total_space']
@@ -637,82 +685,86 @@ def _remove_double_facing_by_sales(var_dict, module_id, layer_id, required_width
         return False
         
     except Exception as e:
-        print(f"移除double facing异常: {e}")
+        log.error("移除double facing异常: {error}", error=e)
         return False
 
 def _adjust_space_for_sku(var_dict, target_module, target_layer, required_width, exclude_sku=None):
     """为目标位置调整空间"""
-    print(f"为模块{target_module}层{target_layer}调整空间，需要{required_width}mm")
+    log.debug("为模块{target_module}层{target_layer}调整空间，需要{required_width}mm", target_module=target_module, target_layer=target_layer, required_width=required_width)
     
     # 获取当前空间
     current_space = _calculate_layer_remaining_space(var_dict, target_module, target_layer, exclude_sku)['total_space']
     
     if current_space >= required_width:
-        print("✓ 当前空间充足")
+        log.debug("✓ 当前空间充足")
         return True
     
-    print(f"当前空间不足 ({current_space}mm < {required_width}mm)，尝试调整...")
+    log.debug("当前空间不足 ({current_space}mm < {required_width}mm)，尝试调整...", current_space=current_space, required_width=required_width)
     
     # 调整策略1: 缩减商品间隔（考虑固定位置）
-    print("调整策略1: 缩减商品间隔")
+    log.debug("调整策略1: 缩减商品间隔")
     if _reduce_intervals(var_dict, target_module, target_layer, exclude_sku):
         current_space = _calculate_layer_remaining_space(var_dict, target_module, target_layer, exclude_sku)['total_space']
         if current_space >= required_width:
-            print("✓ 缩减间隔后空间充足")
+            log.debug("✓ 缩减间隔后空间充足")
             return True
     
     # 调整策略2: 移除double facing（按销售从低到高）
-    print("调整策略2: 移除double facing商品（按销售从低到高）")
+    log.debug("调整策略2: 移除double facing商品（按销售从低到高）")
     if _remove_double_facing_by_sales(var_dict, target_module, target_layer, required_width, exclude_sku):
         current_space = _calculate_layer_remaining_space(var_dict, target_module, target_layer, exclude_sku)['total_space']
         if current_space >= required_width:
-            print("✓ 移除double facing后空间充足")
+            log.debug("✓ 移除double facing后空间充足")
             return True
     
-    print("✗ 空间调整失败")
+    log.info("✗ 空间调整失败")
     return False
 
 def _validate_space_sufficiency(var_dict, sku1_info, sku2_info):
     """空间充足性校验"""
-    print(f"\n步骤3: 空间充足性校验")
+    log.info("\n步骤3: 空间充足性校验")
+    
+    # 需要的宽度为商品的占用宽度 item_width × facing
+    sku1_width = sku1_info['item_width'] * sku1_info['facing']
+    sku2_width = sku2_info['item_width'] * sku2_info['facing']
     
     # 3.1 检查SKU1是否能放入SKU2的位置
-    print(f"检查 SKU {sku1_info['item_code']} 是否能放入模块{sku2_info['module_id']}层{sku2_info['layer_id']}")
+    log.debug("检查 SKU {sku1_item_code} 是否能放入模块{sku2_module_id}层{sku2_layer_id}", sku1_item_code=sku1_info['item_code'], sku2_module_id=sku2_info['module_id'], sku2_layer_id=sku2_info['layer_id'])
     space_info1 = _calculate_layer_remaining_space(
         var_dict, sku2_info['module_id'], sku2_info['layer_id'], sku2_info['item_code']
     )
     
-    if space_info1['total_space'] < sku1_info['item_width']:
-        print(f"空间不足 ({space_info1['total_space']}mm < {sku1_info['item_width']}mm)，尝试调整...")
+    if space_info1['total_space'] < sku1_width:
+        log.debug("空间不足 ({total_space}mm < {sku1_width}mm)，尝试调整...", total_space=space_info1['total_space'], sku1_width=sku1_width)
         if not _adjust_space_for_sku(
             var_dict, sku2_info['module_id'], sku2_info['layer_id'], 
-            sku1_info['item_width'], sku2_info['item_code']
+            sku1_width, sku2_info['item_code']
         ):
             return False, f'无法为商品 {sku1_info["item_code"]} 在目标位置创造足够空间'
     
     # 3.2 检查SKU2是否能放入SKU1的位置
-    print(f"检查 SKU {sku2_info['item_code']} 是否能放入模块{sku1_info['module_id']}层{sku1_info['layer_id']}")
+    log.debug("检查 SKU {sku2_item_code} 是否能放入模块{sku1_module_id}层{sku1_layer_id}", sku2_item_code=sku2_info['item_code'], sku1_module_id=sku1_info['module_id'], sku1_layer_id=sku1_info['layer_id'])
     space_info2 = _calculate_layer_remaining_space(
         var_dict, sku1_info['module_id'], sku1_info['layer_id'], sku1_info['item_code']
     )
     
-    if space_info2['total_space'] < sku2_info['item_width']:
-        print(f"空间不足 ({space_info2['total_space']}mm < {sku2_info['item_width']}mm)，尝试调整...")
+    if space_info2['total_space'] < sku2_width:
+        log.debug("空间不足 ({total_space}mm < {sku2_width}mm)，尝试调整...", total_space=space_info2['total_space'], sku2_width=sku2_width)
         if not _adjust_space_for_sku(
             var_dict, sku1_info['module_id'], sku1_info['layer_id'], 
-            sku2_info['item_width'], sku1_info['item_code']
+            sku2_width, sku1_info['item_code']
         ):
             return False, f'无法为商品 {sku2_info["item_code"]} 在目标位置创造足够空间'
     
-    print("✓ 空间充足性校验通过")
+    log.info("✓ 空间充足性校验通过")
     return True, "空间充足性校验通过"
 
 def _perform_swap(var_dict, sku1, sku2, sku1_info, sku2_info):
     """执行商品互换"""
-    print(f"\n步骤4: 执行商品互换")
-    print(f"  SKU {sku1} (模块{sku1_info['module_id']}层{sku1_info['layer_id']})")
-    print(f"  ↔")
-    print(f"  SKU {sku2} (模块{sku2_info['module_id']}层{sku2_info['layer_id']})")
+    log.info("\n步骤4: 执行商品互换")
+    log.debug("  SKU {sku1} (模块{sku1_module_id}层{sku1_layer_id})", sku1=sku1, sku1_module_id=sku1_info['module_id'], sku1_layer_id=sku1_info['layer_id'])
+    log.debug("  ↔")
+    log.debug("  SKU {sku2} (模块{sku2_module_id}层{sku2_layer_id})", sku2=sku2, sku2_module_id=sku2_info['module_id'], sku2_layer_id=sku2_info['layer_id'])
     
     sku_data = var_dict['bases_data']['sku_data']
     
@@ -733,19 +785,50 @@ def _perform_swap(var_dict, sku1, sku2, sku1_info, sku2_info):
     sku_data.loc[sku2_mask, 'layer_id'] = sku1_info['layer_id']
     sku_data.loc[sku2_mask, 'position'] = sku1_original_pos
     sku_data.loc[sku2_mask, 'module'] = sku1_info['module']
+    _sync_layer_occupancy(var_dict, sku_data.index[sku1_mask | sku2_mask])
     
-    print("✓ 商品位置互换完成")
+    log.info("✓ 商品位置互换完成")
 
 def _readjust_all_positions(var_dict):
     """重新调整所有商品位置（考虑固定位置）"""
     try:
         sku_data = var_dict['bases_data']['sku_data']
         if not sku_data.empty:
-            adjusted_data = _gap_expand_adjusted_with_fixed_positions(var_dict, sku_data, max_interval=5)
+            with log.timed('switch.relayout_all', rows=len(sku_data)):
+                adjusted_data = _gap_expand_adjusted_with_fixed_positions(var_dict, sku_data, max_interval=5)
             var_dict['bases_data']['sku_data'] = adjusted_data
-            print("✓ 所有商品位置重新调整完成（考虑固定位置）")
+            var_dict['bases_data']['layer_occupancy'] = LayerOccupancy.from_frame(adjusted_data)
+            var_dict['bases_data']['layer_gaps'] = None
+            var_dict['bases_data']['fixed_position_index'] = None
+            var_dict['bases_data']['dirty_layers'] = set()
+            log.info("✓ 所有商品位置重新调整完成（考虑固定位置）")
     except Exception as e:
-        print(f"位置调整异常: {e}")
+        log.error("位置调整异常: {error}", error=e)
+
+def _readjust_dirty_positions(var_dict):
+    """
+    只重新调整脏层的商品位置（考虑固定位置），其余层保持不变；
+    脏层的行由层占用索引直接取出，耗时只与变动层的商品数有关，与整店规模无关
+    """
+    try:
+        sku_data = var_dict['bases_data']['sku_data']
+        dirty_layers = _get_dirty_layers(var_dict)
+        if sku_data.empty or not dirty_layers:
+            return
+
+        occupancy = _get_layer_occupancy(var_dict)
+        row_indices = [row_key for layer_key in sorted(dirty_layers) for row_key, _ in occupancy.layer_rows(layer_key, sort_by_position=False)]
+        if row_indices:
+            with log.timed('switch.relayout_dirty', rows=len(row_indices), layers=len(dirty_layers)):
+                # 按原行顺序取出，层内位置相同时的先后与整店重排一致
+                layer_items = sku_data.loc[sku_data.index[np.sort(sku_data.index.get_indexer(row_indices))]]
+                adjusted_items = _gap_expand_adjusted_with_fixed_positions(var_dict, layer_items, max_interval=5)
+                sku_data.loc[adjusted_items.index, 'position'] = adjusted_items['position']
+                _sync_layer_occupancy(var_dict, adjusted_items.index)
+        log.info("✓ 已重新调整 {dirty_layers_count} 个变动层的商品位置（考虑固定位置）", dirty_layers_count=len(dirty_layers))
+        dirty_layers.clear()
+    except Exception as e:
+        log.error("位置调整异常: {error}", error=e)
 
 def _get_output_data(var_dict):
     """生成输出数据"""
@@ -755,7 +838,7 @@ def _get_output_data(var_dict):
         original_pog = var_dict['bases_data']['pog_data']
         
         if sku_data.empty:
-            print("⚠ SKU数据为空，返回原始POG数据")
+            log.warning("⚠ SKU数据为空，返回原始POG数据")
             return original_pog
         
         output_columns = [
@@ -783,19 +866,19 @@ def _get_output_data(var_dict):
         
         # 数据类型转换和排序
         if 'module_id' in output_df.columns:
-            output_df['module_id'] = output_df['module_id'].apply(safe_int_conversion)
+            output_df['module_id'] = safe_int_column(output_df['module_id'])
         if 'layer_id' in output_df.columns:
-            output_df['layer_id'] = output_df['layer_id'].apply(safe_int_conversion)
+            output_df['layer_id'] = safe_int_column(output_df['layer_id'])
         if 'position' in output_df.columns:
-            output_df['position'] = output_df['position'].apply(safe_int_conversion)
+            output_df['position'] = safe_int_column(output_df['position'])
         if 'item_width' in output_df.columns:
-            output_df['item_width'] = output_df['item_width'].apply(safe_int_conversion)
+            output_df['item_width'] = safe_int_column(output_df['item_width'])
         if 'facing' in output_df.columns:
-            output_df['facing'] = output_df['facing'].apply(safe_int_conversion)
+            output_df['facing'] = safe_int_column(output_df['facing'])
         if 'vert_facing' in output_df.columns:
-            output_df['vert_facing'] = output_df['vert_facing'].apply(safe_int_conversion)
+            output_df['vert_facing'] = safe_int_column(output_df['vert_facing'])
         if 'module_width' in output_df.columns:
-            output_df['module_width'] = output_df['module_width'].apply(safe_int_conversion)
+            output_df['module_width'] = safe_int_column(output_df['module_width'])
         
         if 'module_id' in output_df.columns and 'layer_id' in output_df.columns and 'position' in output_df.columns:
             output_df = output_df.sort_values(['module_id', 'layer_id', 'position'])
@@ -804,9 +887,78 @@ def _get_output_data(var_dict):
         return output_df
         
     except Exception as e:
-        print(f"生成输出数据异常: {e}")
+        log.error("生成输出数据异常: {error}", error=e)
         return var_dict['bases_data']['pog_data']
 
+def _snapshot_state(var_dict):
+    """
+    互换事务的快照：只复制sku_data中会被修改的列与脏层集合（数组拷贝，开销远小于复制整张表）；
+    层占用索引、空隙汇总、固定位置索引等派生数据在回滚时由恢复后的sku_data重建
+    """
+    bases_data = var_dict['bases_data']
+    sku_data = bases_data['sku_data']
+    return {
+        'sku_data': sku_data,
+        'columns': {column: sku_data[column].copy() for column in SWAP_MUTABLE_COLUMNS if column in sku_data.columns},
+        'dirty_layers': set(_get_dirty_layers(var_dict))
+    }
+
+def _restore_state(var_dict, snapshot):
+    """回滚到快照时的状态"""
+    bases_data = var_dict['bases_data']
+    sku_data = snapshot['sku_data']
+    for column, values in snapshot['columns'].items():
+        sku_data[column] = values
+    bases_data['sku_data'] = sku_data
+    bases_data['layer_occupancy'] = LayerOccupancy.from_frame(sku_data)
+    bases_data['layer_gaps'] = None
+    bases_data['fixed_position_index'] = None
+    bases_data['dirty_layers'] = set(snapshot['dirty_layers'])
+    log.info("↺ 已回滚到互换前的状态")
+
+def _validate_swap_rules(var_dict, sku1, sku2):
+    """
+    互换的前置校验（特殊规则、高度），不修改任何数据
+    
+    Returns:
+        tuple: (是否通过, 信息, sku1_info, sku2_info)
+    """
+    log.info("\n步骤1: 定位物品位置")
+    sku1_info = _get_sku_info(var_dict, sku1)
+    sku2_info = _get_sku_info(var_dict, sku2)
+    
+    log.debug("✓ SKU {sku1}: 模块{sku1_module_id}层{sku1_layer_id} 位置{sku1_position}mm 宽度{sku1_item_width}mm 高度{sku1_height}mm", sku1=sku1, sku1_module_id=sku1_info['module_id'], sku1_layer_id=sku1_info['layer_id'], sku1_position=sku1_info['position'], sku1_item_width=sku1_info['item_width'], sku1_height=sku1_info['height'])
+    log.debug("✓ SKU {sku2}: 模块{sku2_module_id}层{sku2_layer_id} 位置{sku2_position}mm 宽度{sku2_item_width}mm 高度{sku2_height}mm", sku2=sku2, sku2_module_id=sku2_info['module_id'], sku2_layer_id=sku2_info['layer_id'], sku2_position=sku2_info['position'], sku2_item_width=sku2_info['item_width'], sku2_height=sku2_info['height'])
+    
+    # 检查特殊规则
+    rule_valid, rule_message = _validate_special_rules(var_dict, sku1, sku2)
+    if not rule_valid:
+        return False, rule_message, sku1_info, sku2_info
+    
+    # 高度可行性校验
+    height_valid, height_message = _validate_height_feasibility(var_dict, sku1, sku2, sku1_info, sku2_info)
+    if not height_valid:
+        return False, height_message, sku1_info, sku2_info
+    
+    return True, "互换前置校验通过", sku1_info, sku2_info
+
+def _apply_swap(var_dict, sku1, sku2, sku1_info, sku2_info):
+    """空间充足性校验（必要时缩减间隔、面位）并执行互换；失败时sku_data可能已被部分修改，由调用方回滚"""
+    space_valid, space_message = _validate_space_sufficiency(var_dict, sku1_info, sku2_info)
+    if not space_valid:
+        return False, space_message
+    
+    _perform_swap(var_dict, sku1, sku2, sku1_info, sku2_info)
+    return True, "互换完成"
+
+def _relayout_after_swap(var_dict):
+    """按 relayout_scope 重新调整位置（默认只调整变动过的层）"""
+    log.info("\n步骤5: 重新调整陈列位置")
+    if var_dict.get('relayout_scope', 'dirty') == 'all':
+        _readjust_all_positions(var_dict)
+    else:
+        _readjust_dirty_positions(var_dict)
+
 def switch_item_func(var_dict):
     """
     SKU互换主函数
@@ -816,17 +968,21 @@ def switch_item_func(var_dict):
             - bases_data: 基础数据
             - item1: 第一个要互换的商品
             - item2: 第二个要互换的商品
+            - relayout_scope: 可选，'dirty'（默认）只重新排列本次变动过的层，'all' 重新排列整张POG
             
     Returns:
         dict: 包含新POG数据和状态的字典
             - pog_data: 新的POG数据
             - status: 成功或失败状态
             - msg: 状态信息
+    
+    互换失败时（包括空间调整已部分完成的情况）sku_data 回滚到调用前的状态
     """
+    snapshot = None
     try:
-        print("=" * 50)
-        print("开始执行SKU互换功能")
-        print("=" * 50)
+        log.info("=" * 50)
+        log.info("开始执行SKU互换功能")
+        log.info("=" * 50)
         
         # 获取互换参数
         if 'item1' not in var_dict or 'item2' not in var_dict:
@@ -839,7 +995,7 @@ def switch_item_func(var_dict):
         sku1 = var_dict['item1']
         sku2 = var_dict['item2']
         
-        print(f"互换商品: {sku1} ↔ {sku2}")
+        log.info("互换商品: {sku1} ↔ {sku2}", sku1=sku1, sku2=sku2)
         
         # 检查SKU数据是否为空
         if var_dict['bases_data']['sku_data'].empty:
@@ -849,16 +1005,9 @@ def switch_item_func(var_dict):
                 'msg': 'SKU数据为空，无法执行互换'
             }
         
-        # 步骤1: 定位物品位置
-        print(f"\n步骤1: 定位物品位置")
-        sku1_info = _get_sku_info(var_dict, sku1)
-        sku2_info = _get_sku_info(var_dict, sku2)
-        
-        print(f"✓ SKU {sku1}: 模块{sku1_info['module_id']}层{sku1_info['layer_id']} 位置{sku1_info['position']}mm 宽度{sku1_info['item_width']}mm 高度{sku1_info['height']}mm")
-        print(f"✓ SKU {sku2}: 模块{sku2_info['module_id']}层{sku2_info['layer_id']} 位置{sku2_info['position']}mm 宽度{sku2_info['item_width']}mm 高度{sku2_info['height']}mm")
-        
-        # 步骤2: 检查特殊规则
-        rule_valid, rule_message = _validate_special_rules(var_dict, sku1, sku2)
+        # 步骤1-3: 定位物品、检查特殊规则、高度可行性校验
+        with log.timed('switch.validate_rules'):
+            rule_valid, rule_message, sku1_info, sku2_info = _validate_swap_rules(var_dict, sku1, sku2)
         if not rule_valid:
             return {
                 'pog_data': var_dict['bases_data']['pog_data'],
@@ -866,52 +1015,526 @@ def switch_item_func(var_dict):
                 'msg': rule_message
             }
         
-        # 步骤3: 高度可行性校验
-        height_valid, height_message = _validate_height_feasibility(var_dict, sku1, sku2, sku1_info, sku2_info)
-        if not height_valid:
+        # 步骤4-5: 空间充足性校验并执行互换（失败时回滚空间调整）
+        snapshot = _snapshot_state(var_dict)
+        with log.timed('switch.apply_swap'):
+            swap_valid, swap_message = _apply_swap(var_dict, sku1, sku2, sku1_info, sku2_info)
+        if not swap_valid:
+            _restore_state(var_dict, snapshot)
+            return {
+                'pog_data': var_dict['bases_data']['pog_data'],
+                'status': 'fail',
+                'msg': swap_message
+            }
+        
+        # 步骤6: 重新调整位置
+        _relayout_after_swap(var_dict)
+        
+        # 生成输出数据
+        with log.timed('switch.output', rows=len(var_dict['bases_data']['sku_data'])):
+            output_df = _get_output_data(var_dict)
+        
+        log.info("\n" + "=" * 50)
+        log.info("✓ SKU互换完成!")
+        log.info("=" * 50)
+        
+        return {
+            'pog_data': output_df,
+            'status': 'success',
+            'msg': 'SKU互换成功'
+        }
+        
+    except Exception as e:
+        log.error("SKU互换异常: {error}", error=e)
+        if snapshot is not None:
+            _restore_state(var_dict, snapshot)
+        return {
+            'pog_data': var_dict['bases_data']['pog_data'],
+            'status': 'fail',
+            'msg': f'互换异常: {str(e)}'
+        }
+
+def _parse_swap_pairs(pairs):
+    """把 [(item1, item2), ...] 或 [{'item1': .., 'item2': ..}, ...] 统一为 [(item1, item2), ...]"""
+    parsed = []
+    for pair in pairs:
+        if isinstance(pair, dict):
+            parsed.append((pair['item1'], pair['item2']))
+        else:
+            item1, item2 = pair
+            parsed.append((item1, item2))
+    return parsed
+
+def switch_items_batch(var_dict):
+    """
+    批量SKU互换（事务）
+    
+    Args:
+        var_dict: 包含基础数据和互换参数的字典
+            - bases_data: 基础数据
+            - pairs: 互换列表，[(item1, item2), ...] 或 [{'item1': .., 'item2': ..}, ...]
+            - relayout_scope: 可选，'dirty'（默认）或 'all'
+    
+    流程:
+        1. 对所有互换做特殊规则、高度校验（不修改数据），任一不通过则整批不执行；
+        2. 记录快照后按顺序逐个做空间校验并互换（空间校验依赖前面互换后的层状态，因此在事务内进行），
+           任一失败则回滚整批；
+        3. 全部成功后，所有变动过的层只重新排列一次。
+    
+    Returns:
+        dict: pog_data、status、msg，以及 results（与 pairs 一一对应，
+              每项含 item1、item2、status（success / fail / rolled_back / skipped）、msg）
+    """
+    snapshot = None
+    results = []
+    try:
+        log.info("=" * 50)
+        log.info("开始执行批量SKU互换功能")
+        log.info("=" * 50)
+        
+        if not var_dict.get('pairs'):
             return {
                 'pog_data': var_dict['bases_data']['pog_data'],
                 'status': 'fail',
-                'msg': height_message
+                'msg': '缺少互换参数: pairs',
+                'results': results
             }
         
-        # 步骤4: 空间充足性校验
-        space_valid, space_message = _validate_space_sufficiency(var_dict, sku1_info, sku2_info)
-        if not space_valid:
+        pairs = _parse_swap_pairs(var_dict['pairs'])
+        results = [{'item1': item1, 'item2': item2, 'status': 'skipped', 'msg': '未执行'} for item1, item2 in pairs]
+        
+        if var_dict['bases_data']['sku_data'].empty:
+            for result in results:
+                result.update(status='fail', msg='SKU数据为空，无法执行互换')
             return {
                 'pog_data': var_dict['bases_data']['pog_data'],
                 'status': 'fail',
-                'msg': space_message
+                'msg': 'SKU数据为空，无法执行互换',
+                'results': results
             }
         
-        # 步骤5: 执行互换
-        _perform_swap(var_dict, sku1, sku2, sku1_info, sku2_info)
+        # 阶段1: 前置校验（不修改数据）
+        log.info("\n阶段1: 校验全部 {pairs_count} 组互换", pairs_count=len(pairs))
+        failed_count = 0
+        with log.timed('switch_batch.validate', rows=len(results)):
+            for result in results:
+                try:
+                    rule_valid, rule_message, _, _ = _validate_swap_rules(var_dict, result['item1'], result['item2'])
+                except Exception as e:
+                    rule_valid, rule_message = False, f'校验异常: {str(e)}'
+                if not rule_valid:
+                    failed_count += 1
+                    result.update(status='fail', msg=rule_message)
+                else:
+                    result.update(msg='校验通过，因其他互换未通过校验而未执行')
         
-        # 步骤6: 重新调整所有位置
-        print(f"\n步骤5: 重新调整陈列位置")
-        _readjust_all_positions(var_dict)
+        if failed_count > 0:
+            return {
+                'pog_data': var_dict['bases_data']['pog_data'],
+                'status': 'fail',
+                'msg': f'{failed_count} 组互换未通过校验，整批未执行',
+                'results': results
+            }
         
-        # 生成输出数据
+        # 阶段2: 在快照上依次执行互换，任一失败则整批回滚
+        log.info("\n阶段2: 依次执行互换")
+        snapshot = _snapshot_state(var_dict)
+        for i, result in enumerate(results):
+            log.info("\n互换 {no}/{total}: {item1} ↔ {item2}", no=i + 1, total=len(results), item1=result['item1'], item2=result['item2'])
+            try:
+                with log.timed('switch_batch.apply_swap'):
+                    sku1_info = _get_sku_info(var_dict, result['item1'])
+                    sku2_info = _get_sku_info(var_dict, result['item2'])
+                    swap_valid, swap_message = _apply_swap(var_dict, result['item1'], result['item2'], sku1_info, sku2_info)
+            except Exception as e:
+                swap_valid, swap_message = False, f'互换异常: {str(e)}'
+            
+            if not swap_valid:
+                _restore_state(var_dict, snapshot)
+                result.update(status='fail', msg=swap_message)
+                for done in results[:i]:
+                    done.update(status='rolled_back', msg='已执行，因后续互换失败被回滚')
+                for pending in results[i + 1:]:
+                    pending.update(msg='因前面的互换失败而未执行')
+                return {
+                    'pog_data': var_dict['bases_data']['pog_data'],
+                    'status': 'fail',
+                    'msg': f'第 {i + 1} 组互换失败，整批已回滚: {swap_message}',
+                    'results': results
+                }
+            result.update(status='success', msg='SKU互换成功')
+        
+        # 阶段3: 变动过的层统一重新排列一次
+        _relayout_after_swap(var_dict)
         output_df = _get_output_data(var_dict)
         
-        print("\n" + "=" * 50)
-        print("✓ SKU互换完成!")
-        print("=" * 50)
+        log.info("\n" + "=" * 50)
+        log.info("✓ 批量SKU互换完成，共 {results_count} 组!", results_count=len(results))
+        log.info("=" * 50)
         
         return {
             'pog_data': output_df,
             'status': 'success',
-            'msg': 'SKU互换成功'
+            'msg': f'批量SKU互换成功，共 {len(results)} 组',
+            'results': results
         }
         
     except Exception as e:
-        print(f"SKU互换异常: {e}")
+        log.error("批量SKU互换异常: {error}", error=e)
+        if snapshot is not None:
+            _restore_state(var_dict, snapshot)
+            for result in results:
+                if result['status'] == 'success':
+                    result.update(status='rolled_back', msg='已执行，因批量互换异常被回滚')
         return {
             'pog_data': var_dict['bases_data']['pog_data'],
             'status': 'fail',
-            'msg': f'互换异常: {str(e)}'
+            'msg': f'批量互换异常: {str(e)}',
+            'results': results
         }
 
+def _item_swap_profile(var_dict):
+    """
+    各商品（取首行，与 _get_sku_info 一致）的互换属性数组：所在层、占用宽度、高度、各项限制，
+    以及所在层排除该商品后的剩余空间与可通过缩减double facing释放的宽度
+    """
+    sku_data = var_dict['bases_data']['sku_data']
+    config = _get_config(var_dict)
+    first_rows = sku_data.drop_duplicates('item_code', keep='first')
+    item_codes = first_rows['item_code'].to_numpy()
+    facing = first_rows['facing'].to_numpy(dtype=float) if 'facing' in first_rows.columns else np.ones(len(first_rows))
+    
+    profile = pd.DataFrame({
+        'item_code': item_codes,
+        'module_id': first_rows['module_id'].to_numpy(),
+        'layer_id': first_rows['layer_id'].to_numpy(),
+        'width': first_rows['item_width'].to_numpy(dtype=float) * facing,
+        'height': first_rows['item_height'].to_numpy(dtype=float) if 'item_height' in first_rows.columns else np.zeros(len(first_rows)),
+        'is_specified': np.isin(item_codes, config.specified_items),
+        'is_series': np.isin(item_codes, config.series_items),
+        'is_fixed': first_rows['is_fixed_position'].to_numpy(dtype=bool) if 'is_fixed_position' in first_rows.columns else np.zeros(len(first_rows), dtype=bool)
+    })
+    
+    # 每个商品所在层排除该商品（同层同编号的所有行）后的总空隙：把 (层, 排除商品) 组合展开后一次性计算
+    layer_index = pd.MultiIndex.from_arrays([sku_data['module_id'].to_numpy(), sku_data['layer_id'].to_numpy()])
+    layer_codes, layer_keys = pd.factorize(layer_index)
+    rows = pd.DataFrame({
+        'layer_code': layer_codes,
+        'item_code': sku_data['item_code'].to_numpy(),
+        'position': sku_data['position'].to_numpy(dtype=float),
+        'width': sku_data['item_width'].to_numpy(dtype=float) * (sku_data['facing'].to_numpy(dtype=float) if 'facing' in sku_data.columns else 1),
+        'facing_gain': sku_data['item_width'].to_numpy(dtype=float) * np.maximum((sku_data['facing'].to_numpy(dtype=float) if 'facing' in sku_data.columns else 1) - 1, 0)
+    })
+    rows['facing_gain'] = np.where(sku_data['is_fixed_position'].to_numpy(dtype=bool), 0, rows['facing_gain']) if 'is_fixed_position' in sku_data.columns else rows['facing_gain']
+    if 'module_width' in sku_data.columns:
+        module_widths = pd.to_numeric(sku_data['module_width'], errors='coerce').to_numpy(dtype=float)
+        _, first_layer_rows = np.unique(layer_codes, return_index=True)
+        layer_widths = np.nan_to_num(module_widths[first_layer_rows], nan=1000)
+    else:
+        layer_widths = np.full(len(layer_keys), 1000.0)
+    
+    profile['layer_code'] = layer_keys.get_indexer(pd.MultiIndex.from_arrays([profile['module_id'].to_numpy(), profile['layer_id'].to_numpy()]))
+    expanded = rows.merge(profile[['layer_code', 'item_code']].reset_index().rename(columns={'index': 'profile_row', 'item_code': 'excluded_code'}), on='layer_code')
+    expanded = expanded[expanded['item_code'] != expanded['excluded_code']]
+    
+    module_width = layer_widths[profile['layer_code'].to_numpy()]
+    space = module_width.copy()             # 排除后层内没有其他商品时，整层都是空隙
+    facing_gain = np.zeros(len(profile))
+    if not expanded.empty:
+        groups = expanded['profile_row'].to_numpy()
+        gaps = layer_gap_arrays(groups, expanded['position'].to_numpy(), expanded['width'].to_numpy(), module_width[groups])
+        has_rows = np.flatnonzero(np.bincount(groups, minlength=len(profile)) > 0)
+        space[has_rows] = gaps['total_space'][has_rows]
+        facing_gain = np.bincount(groups, weights=expanded['facing_gain'].to_numpy(), minlength=len(profile))
+    profile['space_excluding'] = space
+    profile['facing_gain'] = facing_gain
+    return profile.set_index('item_code')
+
+def swap_feasibility_matrix(var_dict, item_codes=None, partner_codes=None):
+    """
+    互换可行性矩阵（只读，不打印、不修改任何数据）
+    
+    对每一对 (item, partner) 按 switch_item_func 的校验顺序向量化判断：
+    同一商品 → 指定位置商品 → 指定连带商品 → 固定位置商品 → 高度（与 layer_height 比较）→
+    空间（商品占用宽度与目标层排除对方后的剩余空间比较，两个方向都要满足）。
+    剩余空间不足、但加上目标层可缩减的double facing宽度后足够时记为 needs_adjustment（实际互换时会缩减面位）。
+    
+    Args:
+        item_codes: 行方向的商品（单个编号或列表），None 表示全部商品
+        partner_codes: 列方向的候选互换商品，None 表示全部商品
+    
+    Returns:
+        dict: status、msg、item_codes、partner_codes、reason（int8 矩阵，取值见 SWAP_REASON_CODES）、
+              feasible（bool 矩阵，ok 与 needs_adjustment 为True）、profile（各商品的互换属性，见 _item_swap_profile）；
+              不在POG中的商品会在 msg 中列出并被忽略
+    """
+    sku_data = var_dict['bases_data']['sku_data']
+    if sku_data.empty:
+        return {'status': 'fail', 'msg': 'SKU数据为空', 'item_codes': np.array([]), 'partner_codes': np.array([]),
+                'reason': np.zeros((0, 0), dtype=np.int8), 'feasible': np.zeros((0, 0), dtype=bool)}
+    
+    with log.timed('switch.swap_profile', rows=len(sku_data)):
+        profile = _item_swap_profile(var_dict)
+    missing = []
+    def _select(codes):
+        if codes is None:
+            return profile.index.to_numpy()
+        codes = np.atleast_1d(np.asarray(codes))
+        found = np.isin(codes, profile.index)
+        missing.extend(codes[~found].tolist())
+        return codes[found]
+    rows, cols = _select(item_codes), _select(partner_codes)
+    a, b = profile.loc[rows], profile.loc[cols]
+    
+    layer_height = _get_config(var_dict).global_config.get('layer_height', 1500)
+    
+    def _outer(values_a, values_b):
+        return np.asarray(values_a)[:, None] | np.asarray(values_b)[None, :]
+    
+    same_item = rows[:, None] == cols[None, :]
+    specified = _outer(a['is_specified'], b['is_specified'])
+    series = _outer(a['is_series'], b['is_series'])
+    fixed = _outer(a['is_fixed'], b['is_fixed'])
+    too_tall = _outer(a['height'].to_numpy() > layer_height, b['height'].to_numpy() > layer_height)
+    
+    # 空间：a 放入 b 所在层（排除 b），b 放入 a 所在层（排除 a）
+    a_width, b_width = a['width'].to_numpy()[:, None], b['width'].to_numpy()[None, :]
+    fits_now = (b['space_excluding'].to_numpy()[None, :] >= a_width) & (a['space_excluding'].to_numpy()[:, None] >= b_width)
+    fits_adjusted = ((b['space_excluding'] + b['facing_gain']).to_numpy()[None, :] >= a_width) & \
+                    ((a['space_excluding'] + a['facing_gain']).to_numpy()[:, None] >= b_width)
+    
+    reason = np.select(
+        [same_item, specified, series, fixed, too_tall, fits_now, fits_adjusted],
+        [SWAP_REASON_CODES['same_item'], SWAP_REASON_CODES['specified_position'], SWAP_REASON_CODES['series_item'],
+         SWAP_REASON_CODES['fixed_position'], SWAP_REASON_CODES['height'], SWAP_REASON_CODES['ok'], SWAP_REASON_CODES['needs_adjustment']],
+        default=SWAP_REASON_CODES['space']
+    ).astype(np.int8)
+    
+    return {
+        'status': 'success',
+        'msg': f'未找到商品: {missing}' if missing else '互换可行性计算完成',
+        'item_codes': rows,
+        'partner_codes': cols,
+        'reason': reason,
+        'feasible': reason <= SWAP_REASON_CODES['needs_adjustment'],
+        'profile': profile
+    }
+
+def get_swap_partners(var_dict, item_code, feasible_only=True):
+    """
+    某个商品的候选互换对象，返回DataFrame：partner_code、reason_code、reason、feasible
+    feasible_only 为True时只返回可以互换的商品
+    """
+    matrix = swap_feasibility_matrix(var_dict, [item_code])
+    if len(matrix['item_codes']) == 0:
+        return pd.DataFrame(columns=['partner_code', 'reason_code', 'reason', 'feasible'])
+    partners = pd.DataFrame({
+        'partner_code': matrix['partner_codes'],
+        'reason_code': matrix['reason'][0],
+        'reason': [SWAP_REASON_NAMES[code] for code in matrix['reason'][0]],
+        'feasible': matrix['feasible'][0]
+    })
+    return partners[partners['feasible']].reset_index(drop=True) if feasible_only else partners
+
+def _slot_weights(var_dict, profile, layer_weights=None, eye_level_layer=None, position_decay=0.1, eye_level_height=EYE_LEVEL_HEIGHT):
+    """
+    各商品当前陈列位置的位置权重 = 层权重 × 左右位置权重
+    
+    layer_weights: {layer_id: 权重}；None 时以视线层为1.0，每远离一层减0.15（最低0.4）。
+                   eye_level_layer 为 None 时取离地 eye_level_height 毫米所在的层，按 layer_height 换算
+    position_decay: 层内从最左（position=0）到最右权重线性下降的比例
+    """
+    global_config = _get_config(var_dict).global_config
+    layer_ids = profile['layer_id'].to_numpy()
+    if layer_weights is None:
+        if eye_level_layer is None:
+            layer_height = global_config.get('layer_height', 250) or 250
+            eye_level_layer = int(eye_level_height // layer_height) + 1
+            eye_level_layer = min(max(eye_level_layer, 1), int(global_config.get('layer_cnt', eye_level_layer)))
+        layer_weight = np.maximum(1.0 - 0.15 * np.abs(layer_ids - eye_level_layer), 0.4)
+    else:
+        layer_weight = np.array([layer_weights.get(layer_id, 1.0) for layer_id in layer_ids], dtype=float)
+    
+    sku_data = var_dict['bases_data']['sku_data'].drop_duplicates('item_code', keep='first').set_index('item_code')
+    positions = sku_data.loc[profile.index, 'position'].to_numpy(dtype=float)
+    module_widths = pd.to_numeric(sku_data.loc[profile.index, 'module_width'], errors='coerce').fillna(1000).to_numpy(dtype=float) \
+        if 'module_width' in sku_data.columns else np.full(len(profile), 1000.0)
+    position_weight = 1.0 - position_decay * np.clip(positions / module_widths, 0, 1)
+    return layer_weight * position_weight
+
+def _select_swaps(candidates, profile_layers, widths, slack, max_swaps, order, deadline=None):
+    """
+    按给定顺序贪心挑选互不冲突的互换：每个商品只参与一次，且各层累计的宽度变化不超过该层剩余空间
+    deadline（time.perf_counter 时刻）到达时停止，返回已挑选的部分
+    """
+    used_items = set()
+    layer_slack = dict(slack)
+    selected = []
+    for step, k in enumerate(order):
+        if deadline is not None and step % 256 == 0 and time.perf_counter() > deadline:
+            break
+        i, j = candidates[0][k], candidates[1][k]
+        if i in used_items or j in used_items:
+            continue
+        layer_i, layer_j = profile_layers[i], profile_layers[j]
+        if layer_i != layer_j:
+            # i 移入 j 的层、j 移入 i 的层后的剩余空间
+            slack_j = layer_slack[layer_j] - (widths[i] - widths[j])
+            slack_i = layer_slack[layer_i] - (widths[j] - widths[i])
+            if slack_i < 0 or slack_j < 0:
+                continue
+            layer_slack[layer_i], layer_slack[layer_j] = slack_i, slack_j
+        used_items.update((i, j))
+        selected.append(k)
+        if max_swaps is not None and len(selected) >= max_swaps:
+            break
+    return selected
+
+def _top_candidates(cand_i, cand_j, cand_gain, limit):
+    """合并分块得到的候选，按收益保留最高的 limit 组（保持 (i, j) 的原有顺序，收益相同时结果确定）"""
+    cand_i, cand_j, cand_gain = np.concatenate(cand_i), np.concatenate(cand_j), np.concatenate(cand_gain)
+    if len(cand_gain) > limit:
+        top = np.sort(np.argpartition(-cand_gain, limit - 1)[:limit])
+        cand_i, cand_j, cand_gain = cand_i[top], cand_j[top], cand_gain[top]
+    return [cand_i], [cand_j], [cand_gain]
+
+def recommend_swaps(var_dict, max_swaps=20, time_budget=3.0, layer_weights=None, eye_level_layer=None,
+                    position_decay=0.1, value_by='revenue', seed=0, max_candidates=None, block_size=None,
+                    eye_level_height=EYE_LEVEL_HEIGHT):
+    """
+    基于销售的互换推荐（只读，不修改任何数据）
+    
+    位置价值 = 商品销售额（value_by，默认 revenue）× 当前位置的位置权重（见 _slot_weights），
+    互换 (i, j) 的收益 = (价值_i - 价值_j) × (权重_j - 权重_i)，即把卖得更好的商品换到更好的位置。
+    候选互换只取 swap_feasibility_matrix 中 reason 为 ok 的组合（已满足固定托盘、指定位置、连带商品、高度与宽度规则；
+    不考虑需要缩减面位的组合），再挑选互不冲突的一组：每个商品只参与一次，同层多次互换的宽度变化累计不超过该层剩余空间。
+    候选按行分块计算，不构建 n×n 矩阵：每个商品只保留收益最高的 2 × max_swaps 个互换对象，全部候选再取收益最高的 max_candidates 组；
+    先按收益贪心得到初始解，剩余时间内以随机扰动的顺序重复贪心，保留总收益最高的一组。
+    
+    Args:
+        max_swaps: 最多推荐的互换数量
+        time_budget: 搜索时间上限（秒）
+        layer_weights / eye_level_layer / position_decay / eye_level_height: 位置权重参数，见 _slot_weights
+        value_by: 'revenue' 或 'sales'
+        seed: 随机种子，保证结果可复现
+        max_candidates: 参与贪心的候选互换数上限，None 时为 1000 × max_swaps
+        block_size: 每块计算的商品数，None 时按每块约 400 万个组合自动确定
+    
+    Returns:
+        dict: status、msg、proposals（按收益降序，含 rank、item1、item2、gain 及两商品原所在模块/层）、
+              pairs（可直接作为 switch_items_batch 的 var_dict['pairs']）、total_gain、iterations
+    """
+    start_time = time.perf_counter()
+    empty_result = {'status': 'fail', 'proposals': [], 'pairs': [], 'total_gain': 0.0, 'iterations': 0}
+    
+    sku_data = var_dict['bases_data']['sku_data']
+    if sku_data.empty:
+        return dict(empty_result, msg='SKU数据为空')
+    sales_index = SalesIndex.from_bases_data(var_dict['bases_data'])
+    if sales_index is None:
+        return dict(empty_result, msg='缺少销售数据，无法计算位置价值')
+    
+    deadline = start_time + time_budget
+    with log.timed('recommend.candidates', rows=len(sku_data)) as step:
+        profile = _item_swap_profile(var_dict)
+        item_codes = profile.index.to_numpy()
+        value = sales_index.values(item_codes, by=value_by)
+        weight = _slot_weights(var_dict, profile, layer_weights, eye_level_layer, position_decay, eye_level_height)
+        
+        # reason 为 ok：双方都不是指定位置/连带/固定位置商品、不超层高，且当前空间即可互换（同 swap_feasibility_matrix）
+        layer_height = _get_config(var_dict).global_config.get('layer_height', 1500)
+        movable = np.flatnonzero(~(profile['is_specified'] | profile['is_series'] | profile['is_fixed']).to_numpy()
+                                 & ~(profile['height'].to_numpy() > layer_height))
+        widths = profile['width'].to_numpy()
+        space = profile['space_excluding'].to_numpy()
+        
+        # 按行分块，只看上三角（j > i，避免 (i, j) 与 (j, i) 重复）；每行保留收益最高的 per_item 个，累计超过 max_candidates 时截取
+        n = len(movable)
+        per_item = max(1, 2 * (max_swaps or n))
+        if max_candidates is None:
+            max_candidates = 1000 * (max_swaps or n)
+        if block_size is None:
+            block_size = max(1, 4000000 // max(n, 1))
+        cand_i, cand_j, cand_gain = [], [], []
+        kept, scanned = 0, 0
+        for start in range(0, n, block_size):
+            if start > 0 and time.perf_counter() > deadline:
+                break
+            end = min(start + block_size, n)
+            rows, cols = movable[start:end], movable[start:]
+            gain = (value[rows, None] - value[None, cols]) * (weight[None, cols] - weight[rows, None])
+            ok = (space[None, cols] >= widths[rows, None]) & (space[rows, None] >= widths[None, cols]) & \
+                 (np.arange(start, n)[None, :] > np.arange(start, end)[:, None]) & (gain > 1e-9)
+            gain[~ok] = 0.0
+            if gain.shape[1] > per_item:
+                top = np.sort(np.argpartition(-gain, per_item - 1, axis=1)[:, :per_item], axis=1)
+                block_i, block_j = np.repeat(np.arange(end - start), per_item), top.ravel()
+                nonzero = gain[block_i, block_j] > 0
+                block_i, block_j = block_i[nonzero], block_j[nonzero]
+            else:
+                block_i, block_j = np.nonzero(gain)
+            cand_i.append(rows[block_i])
+            cand_j.append(cols[block_j])
+            cand_gain.append(gain[block_i, block_j])
+            kept += len(block_i)
+            scanned = end
+            if kept > 2 * max_candidates:
+                cand_i, cand_j, cand_gain = _top_candidates(cand_i, cand_j, cand_gain, max_candidates)
+                kept = len(cand_gain[0])
+        cand_i, cand_j, cand_gain = _top_candidates(cand_i, cand_j, cand_gain, max_candidates)
+        candidates, candidate_gain = (cand_i[0], cand_j[0]), cand_gain[0]
+        step.set(items=n, candidates=len(candidate_gain), scanned=scanned)
+    if scanned < n:
+        log.warning("⚠️ 时间预算内只扫描了 {scanned}/{n} 个商品的候选互换", scanned=scanned, n=n)
+    if len(candidate_gain) == 0:
+        return dict(empty_result, status='success', msg='没有可提升位置价值的互换')
+    
+    # 各层当前剩余空间
+    layer_gaps = _get_layer_gaps(var_dict)
+    profile_layers = list(zip(profile['module_id'].to_numpy(), profile['layer_id'].to_numpy()))
+    slack = {layer_key: layer_gaps[layer_key]['total_space'] if layer_key in layer_gaps else
+             _calculate_layer_remaining_space(var_dict, *layer_key)['total_space'] for layer_key in set(profile_layers)}
+    
+    # 初始解：按收益降序贪心（候选数有上限，不受时间预算截断，保证总有结果）
+    greedy_order = np.argsort(-candidate_gain, kind='stable')
+    best = _select_swaps(candidates, profile_layers, widths, slack, max_swaps, greedy_order)
+    best_gain = candidate_gain[best].sum()
+    
+    # 在时间预算内随机扰动收益后重复贪心
+    rng = np.random.default_rng(seed)
+    iterations = 1
+    while time.perf_counter() < deadline:
+        noisy_order = np.argsort(-candidate_gain * rng.uniform(0.5, 1.5, len(candidate_gain)), kind='stable')
+        selected = _select_swaps(candidates, profile_layers, widths, slack, max_swaps, noisy_order, deadline)
+        iterations += 1
+        selected_gain = candidate_gain[selected].sum()
+        if selected_gain > best_gain + 1e-9:
+            best, best_gain = selected, selected_gain
+    
+    log.debug("互换推荐: 候选 {candidates} 组，搜索 {iterations} 轮，最佳收益 {gain:.2f}",
+              candidates=len(candidate_gain), iterations=iterations, gain=best_gain)
+    best = sorted(best, key=lambda k: -candidate_gain[k])
+    proposals = []
+    for rank, k in enumerate(best, start=1):
+        i, j = candidates[0][k], candidates[1][k]
+        proposals.append({
+            'rank': rank,
+            'item1': int(item_codes[i]),
+            'item2': int(item_codes[j]),
+            'gain': float(candidate_gain[k]),
+            'item1_layer': tuple(int(x) for x in profile_layers[i]),
+            'item2_layer': tuple(int(x) for x in profile_layers[j])
+        })
+    
+    return {
+        'status': 'success',
+        'msg': f'推荐 {len(proposals)} 组互换，预计提升位置价值 {best_gain:.2f}',
+        'proposals': proposals,
+        'pairs': [(proposal['item1'], proposal['item2']) for proposal in proposals],
+        'total_gain': float(best_gain),
+        'iterations': iterations
+    }
+
 # 使用示例
 def main():
     """主函数 - 演示如何使用SKU互换功能"""
@@ -0,0 +1,221 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from pog_log import get_logger
+
+log = get_logger('csv_cache')
+
+
+# 各输入CSV的列类型：商品编号统一为整数，品牌 / 系列 / 品类等低基数文本列为 category。
+# 按文件名匹配，未列出的文件、列沿用 pandas 自动推断的类型。
+# pog_result 会在各场景中被逐行修改、新增行，因此不设 category 列。
+CSV_DTYPES = {
+    'pog_result.csv': {'item_code': 'int', 'module_id': 'int', 'layer_id': 'int'},
+    'sales_item_sum.csv': {'item_code': 'int', 'sales': 'float', 'qty': 'float'},
+    'pog_test_haircare_test.csv': {'ITEM_NBR': 'int', 'SERIES': 'category'},
+    'ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv': {'item_idnt': 'int', 'brandname_cn': 'category', 'category_name': 'category'},
+    'brand_2_brand_label.csv': {'brand': 'category', 'brand_label': 'category'},
+    'pog_test_haircare_tray.csv': {'tray_id': 'int', 'brand': 'category', 'series': 'category'},
+    'pog_test_haircare_tray_item.csv': {'tray_id': 'int', 'item_code': 'int'},
+}
+
+CACHE_DIR_NAME = '.pog_cache'
+CACHE_FORMAT_VERSION = 2
+
+
+def read_csv_cached(file_path, dtypes = None, cache_dir = None, **read_csv_kwargs):
+    """
+    带缓存的 read_csv：第一次读取时把CSV按列转换为类型化的 .npy 缓存，之后直接内存映射加载
+
+    缓存失效规则：源文件的 mtime 与大小都未变时直接使用缓存；任一变化时计算文件内容哈希，
+    哈希一致（例如文件只是被重新拷贝）则沿用缓存，否则重新解析CSV并重建缓存。
+
+    参数:
+    file_path: CSV文件路径
+    dtypes: {列名: 'int' | 'float' | 'category' | 'str'}，None 时按 CSV_DTYPES 中的文件名取默认值
+    cache_dir: 缓存目录，None 时取环境变量 POG_CACHE_DIR，仍为空则为源文件同目录下的 .pog_cache
+    read_csv_kwargs: 透传给 pd.read_csv 的参数（参与缓存键）
+
+    缓存目录不可写、或文本列含 JSON 无法表示的值时退化为普通的 read_csv。
+    缓存只含 .npy（不允许 pickle）与 JSON 文件，读取缓存不会执行任意代码。
+    """
+    file_path = os.path.abspath(file_path)
+    if dtypes is None:
+        dtypes = CSV_DTYPES.get(os.path.basename(file_path), {})
+    cache_dir = resolve_cache_dir(file_path, cache_dir)
+
+    stat = os.stat(file_path)
+    options_key = _options_key(dtypes, read_csv_kwargs)
+    cache_name = f"{os.path.basename(file_path)}.{hashlib.blake2b(f'{file_path}|{options_key}'.encode('utf-8'), digest_size=6).hexdigest()}"
+    meta_path = os.path.join(cache_dir, cache_name + '.meta')
+
+    meta = _read_meta(meta_path)
+    if meta is not None:
+        if (meta['mtime_ns'], meta['size']) == (stat.st_mtime_ns, stat.st_size):
+            frame = _load_columns(cache_dir, meta)
+            if frame is not None:
+                return frame
+        elif meta['size'] == stat.st_size and meta['content_hash'] == file_hash(file_path):
+            # 内容未变，只是 mtime 变化：刷新记录后沿用缓存
+            frame = _load_columns(cache_dir, meta)
+            if frame is not None:
+                meta.update(mtime_ns = stat.st_mtime_ns)
+                _write_meta(meta_path, meta)
+                return frame
+
+    frame = apply_dtypes(pd.read_csv(file_path, **read_csv_kwargs), dtypes)
+    try:
+        _build_cache(cache_dir, cache_name, meta_path, frame, file_path, stat, meta)
+    except (OSError, TypeError, ValueError) as e:
+        log.warning("[警告] CSV缓存写入失败，直接使用解析结果: {error}", error=e)
+        return frame
+    return _load_columns(cache_dir, _read_meta(meta_path)) if os.path.exists(meta_path) else frame
+
+
+def apply_dtypes(frame, dtypes):
+    """按 dtypes 转换列类型；整数列含缺失或无法转换时保持原类型"""
+    for column, kind in dtypes.items():
+        if column not in frame.columns:
+            continue
+        if kind == 'int':
+            values = pd.to_numeric(frame[column], errors = 'coerce')
+            if values.notna().all() and np.all(np.mod(values.to_numpy(dtype = float), 1) == 0):
+                frame[column] = values.astype('int64')
+        elif kind == 'float':
+            frame[column] = pd.to_numeric(frame[column], errors = 'coerce').astype(float)
+        elif kind == 'category':
+            frame[column] = frame[column].astype('category')
+        elif kind == 'str':
+            frame[column] = frame[column].astype(str)
+    return frame
+
+
+def clear_cache(file_path, cache_dir = None):
+    """删除某个CSV的全部缓存"""
+    file_path = os.path.abspath(file_path)
+    cache_dir = resolve_cache_dir(file_path, cache_dir)
+    if not os.path.isdir(cache_dir):
+        return
+    prefix = os.path.basename(file_path) + '.'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix):
+            target = os.path.join(cache_dir, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors = True)
+            else:
+                os.remove(target)
+
+
+def resolve_cache_dir(file_path, cache_dir = None):
+    """缓存目录：显式指定 > 环境变量 POG_CACHE_DIR > 源文件同目录下的 .pog_cache"""
+    if cache_dir is not None:
+        return cache_dir
+    return os.environ.get('POG_CACHE_DIR') or os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+
+
+def file_hash(file_path):
+    """文件内容哈希（分块读取）"""
+    digest = hashlib.blake2b(digest_size = 16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---------------- 内部实现 ----------------
+def _options_key(dtypes, read_csv_kwargs):
+    return repr((CACHE_FORMAT_VERSION, sorted(dtypes.items()), sorted((k, repr(v)) for k, v in read_csv_kwargs.items())))
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding = 'utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if isinstance(meta, dict) and meta.get('version') == CACHE_FORMAT_VERSION else None
+
+
+def _write_meta(meta_path, meta):
+    text = json.dumps(meta, ensure_ascii = False)      # 含 JSON 无法表示的值时在写文件前抛出 TypeError
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding = 'utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, meta_path)       # 原子替换，并发读取时不会读到写了一半的记录
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _build_cache(cache_dir, cache_name, meta_path, frame, file_path, stat, old_meta):
+    """
+    每次重建写入一个新的数据目录（数值列、category 编码各一个 .npy，文本列放在 objects.json），
+    写完后再原子替换 meta 指向新目录，最后清理旧目录。
+    文本列、category 取值含 JSON 无法表示的值时抛出 TypeError（不留下半成品目录），由调用方退化为不缓存
+    """
+    content_hash = file_hash(file_path)
+    data_dir = f"{cache_name}.{content_hash[:12]}.{os.getpid()}"
+    data_path = os.path.join(cache_dir, data_dir)
+    os.makedirs(data_path, exist_ok = True)
+
+    try:
+        columns, objects = [], {}
+        for i, column in enumerate(frame.columns):
+            series = frame[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(data_path, f'{i}.npy'), series.cat.codes.to_numpy(), allow_pickle = False)
+                columns.append((column, 'category', series.cat.categories.tolist()))
+            elif series.dtype.kind in 'biufcmM':
+                np.save(os.path.join(data_path, f'{i}.npy'), series.to_numpy(), allow_pickle = False)
+                columns.append((column, 'numeric', None))
+            else:
+                objects[str(i)] = series.to_numpy(dtype = object).tolist()
+                columns.append((column, 'object', str(series.dtype)))
+        with open(os.path.join(data_path, 'objects.json'), 'w', encoding = 'utf-8') as f:
+            json.dump(objects, f, ensure_ascii = False)
+
+        _write_meta(meta_path, {
+            'version': CACHE_FORMAT_VERSION,
+            'source': file_path,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'content_hash': content_hash,
+            'data_dir': data_dir,
+            'columns': columns,
+            'n_rows': len(frame),
+        })
+    except (OSError, TypeError, ValueError):
+        shutil.rmtree(data_path, ignore_errors = True)
+        raise
+    # 只清理本缓存自己命名的旧目录，meta 被篡改时也不会删到缓存目录之外
+    old_dir = old_meta.get('data_dir') if old_meta is not None else None
+    if isinstance(old_dir, str) and old_dir != data_dir and old_dir.startswith(cache_name + '.') and os.path.basename(old_dir) == old_dir:
+        shutil.rmtree(os.path.join(cache_dir, old_dir), ignore_errors = True)
+
+
+def _load_columns(cache_dir, meta):
+    """按 meta 重建DataFrame：数值列以写时复制方式内存映射（可修改，修改不会写回缓存）"""
+    data_path = os.path.join(cache_dir, meta['data_dir'])
+    try:
+        with open(os.path.join(data_path, 'objects.json'), 'r', encoding = 'utf-8') as f:
+            objects = json.load(f)
+        data = {}
+        for i, (column, kind, extra) in enumerate(meta['columns']):
+            if kind == 'object':
+                values = objects[str(i)]
+                data[column] = pd.Series(values, dtype = extra if extra != 'object' else object)
+            else:
+                values = np.load(os.path.join(data_path, f'{i}.npy'), mmap_mode = 'c', allow_pickle = False)
+                if kind == 'category':
+                    data[column] = pd.Categorical.from_codes(values, categories = extra)
+                else:
+                    data[column] = pd.Series(values, copy = False)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return pd.DataFrame(data, columns = [column for column, _, _ in meta['columns']])
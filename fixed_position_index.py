@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+
+class FixedPositionIndex:
+    """
+    固定位置商品索引
+
+    以 (module_id, layer_id) 为键，记录每层被固定（重排时不能移动）的商品：
+    - 配置在该层的固定位置托盘（config['tray'] 中 layer_type 为 module）所含商品；
+    - 位于这些托盘商品左侧（position 小于托盘商品最左位置）的前方商品；
+    - tray_item_data 中 is_place_item 为1的指定陈列商品。
+
+    托盘与指定陈列商品的编号表只在构建时整理一次；各层的固定商品由当前POG一次性向量化算出，
+    之后某层发生变动时只需 invalidate 该层，下次查询前用该层的最新行调用 update 重新计算。
+    """
+
+    def __init__(self, config, tray_item_data=None):
+        trays = config.get('tray', {}) if config is not None else {}
+        fixed_tray_layers = {int(tray_id): tray_info.get('layer') for tray_id, tray_info in trays.items() if tray_info.get('layer_type') == 'module'}
+
+        # (layer_id, 托盘商品编号)：固定托盘所在层号与其商品的对应关系；is_place_item 为1的商品编号
+        tray_pairs = []
+        place_codes = np.array([], dtype='int64')
+        if tray_item_data is not None and not tray_item_data.empty and 'item_code' in tray_item_data.columns:
+            tray_items = tray_item_data.assign(item_code=pd.to_numeric(tray_item_data['item_code'], errors='coerce'))
+            tray_items = tray_items[tray_items['item_code'].notna()]
+            if 'tray_id' in tray_items.columns:
+                for tray_id, layer_id in fixed_tray_layers.items():
+                    codes = tray_items.loc[tray_items['tray_id'] == tray_id, 'item_code'].astype('int64').unique()
+                    tray_pairs.extend((layer_id, code) for code in codes)
+            if 'is_place_item' in tray_items.columns:
+                place_codes = tray_items.loc[tray_items['is_place_item'] == 1, 'item_code'].astype('int64').unique()
+
+        self.tray_pairs = pd.MultiIndex.from_tuples(sorted(set(tray_pairs)), names=['layer_id', 'item_code']) if tray_pairs \
+            else pd.MultiIndex.from_arrays([[], []], names=['layer_id', 'item_code'])
+        self.place_codes = np.sort(place_codes)
+        self._layers = {}       # layer_key -> {'item_codes', 'row_keys', 'positions'}
+        self._stale = set()
+
+    @classmethod
+    def from_frame(cls, pog_data, config, tray_item_data=None):
+        """由配置、托盘商品表与当前POG一次性构建所有层的索引"""
+        index = cls(config, tray_item_data)
+        index.update(pog_data)
+        return index
+
+    # ---------------- 更新 ----------------
+    def update(self, pog_data, layer_keys=None):
+        """
+        按pog_data重新计算其中出现的各层（pog_data必须包含这些层的全部行），重新计算的层不再标记为过期
+        layer_keys: 额外指定要刷新的层，其中不在pog_data里的层视为已清空
+        """
+        for layer_key in layer_keys or []:
+            self._layers.pop(layer_key, None)
+            self._stale.discard(layer_key)
+        if pog_data is None or pog_data.empty:
+            return
+
+        module_ids = pog_data['module_id'].to_numpy()
+        layer_ids = pog_data['layer_id'].to_numpy()
+        item_codes = pd.to_numeric(pog_data['item_code'], errors='coerce').fillna(-1).to_numpy(dtype='int64')
+        positions = pog_data['position'].to_numpy(dtype=float)
+        layer_codes, layer_keys = pd.factorize(pd.MultiIndex.from_arrays([module_ids, layer_ids]))
+
+        # 托盘商品：该行商品属于配置在该层号的固定托盘
+        is_tray = pd.MultiIndex.from_arrays([layer_ids, item_codes]).isin(self.tray_pairs) if len(self.tray_pairs) > 0 \
+            else np.zeros(len(pog_data), dtype=bool)
+
+        # 前方商品：position 小于该层各托盘商品最左位置中的最大值
+        threshold = np.full(len(layer_keys), -np.inf)
+        if is_tray.any():
+            tray_min = pd.Series(positions[is_tray]).groupby([layer_codes[is_tray], item_codes[is_tray]]).min()
+            layer_max = tray_min.groupby(level=0).max()
+            threshold[layer_max.index.to_numpy()] = layer_max.to_numpy()
+        is_front = positions < threshold[layer_codes]
+
+        is_place = np.isin(item_codes, self.place_codes)
+
+        # 固定商品按商品编号生效：同层中编号相同的行都视为固定
+        pinned_pairs = pd.MultiIndex.from_arrays([layer_codes, item_codes])
+        pinned_mask = pinned_pairs.isin(pinned_pairs[is_tray | is_front | is_place])
+
+        row_keys = pog_data.index.to_numpy()
+        pinned_rows = np.flatnonzero(pinned_mask)
+        rows_by_layer = pd.Series(pinned_rows).groupby(layer_codes[pinned_rows]).indices if len(pinned_rows) > 0 else {}
+        for code, layer_key in enumerate(layer_keys):
+            rows = pinned_rows[rows_by_layer[code]] if code in rows_by_layer else np.array([], dtype=int)
+            rows = rows[np.lexsort((rows, positions[rows]))]
+            self._stale.discard(layer_key)
+            self._layers[layer_key] = {
+                'item_codes': np.unique(item_codes[rows]),
+                'row_keys': row_keys[rows],
+                'positions': positions[rows]
+            }
+
+    def invalidate(self, layer_keys):
+        """标记若干层过期（该层商品发生了移入、移出或位置变化）"""
+        for layer_key in layer_keys:
+            if layer_key is not None:
+                self._stale.add(layer_key)
+
+    # ---------------- 查询 ----------------
+    def is_stale(self, layer_key):
+        return layer_key in self._stale
+
+    def stale_layers(self):
+        return set(self._stale)
+
+    def layer(self, layer_key):
+        """
+        某层的固定商品：item_codes（去重后的商品编号）、row_keys 与 positions（按position升序的各固定行）
+        过期的层需先调用 update
+        """
+        if layer_key in self._stale:
+            raise KeyError(f'层 {layer_key} 的固定位置信息已过期，请先用该层的最新数据调用 update')
+        empty = {'item_codes': np.array([], dtype='int64'), 'row_keys': np.array([]), 'positions': np.array([], dtype=float)}
+        return self._layers.get(layer_key, empty)
+
+    def pinned_item_codes(self, layer_key):
+        return self.layer(layer_key)['item_codes']
+
+    def mask(self, pog_data):
+        """与pog_data等长的布尔数组，标记其中的固定行（同层同编号即视为固定）"""
+        if pog_data is None or pog_data.empty:
+            return np.zeros(0 if pog_data is None else len(pog_data), dtype=bool)
+        item_codes = pd.to_numeric(pog_data['item_code'], errors='coerce').fillna(-1).to_numpy(dtype='int64')
+        fixed_mask = np.zeros(len(pog_data), dtype=bool)
+        layer_rows = pd.Series(np.arange(len(pog_data))).groupby([pog_data['module_id'].to_numpy(), pog_data['layer_id'].to_numpy()]).indices
+        for layer_key, rows in layer_rows.items():
+            codes = self.pinned_item_codes(layer_key)
+            if len(codes) > 0:
+                fixed_mask[rows] = np.isin(item_codes[rows], codes)
+        return fixed_mask
@@ -1,8 +1,15 @@
 import pandas as pd
 import numpy as np
-import visualizing
-import matplotlib.pyplot as plt
-plt.rcParams['font.family'] = 'SimHei'
+import visualizing    # visualizing 内部按需导入matplotlib，只有真正绘图时才会加载
+from item_catalog import ItemCatalog
+from layer_occupancy import LayerOccupancy
+from layer_spacing import respace_layers
+from pog_changeset import PogChangeSet
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from pog_config import PogConfig
+
+RENDER_MODES = ('none', 'deferred', 'immediate')
 
 def add_item_func(var_dict, pog_config_org):
     """
@@ -10,6 +17,11 @@ def add_item_func(var_dict, pog_config_org):
     
     参数:
     var_dict: 包含基础数据和函数参数的字典
+        var_dict['render_mode']（可选，默认'immediate'）控制目标层插入前后的可视化：
+        - 'none': 不绘图
+        - 'deferred': 不绘图，返回结果中的 layer_snapshots 为插入前后目标层的轻量快照，
+          可稍后（或在其他进程中）用 visualizing.render_layer_snapshot 绘制
+        - 'immediate': 立即绘图，返回结果中的 figures 为插入前后的两张图
     
     返回:
     dict: 包含新pog_data和状态信息的字典
@@ -17,40 +29,38 @@ def add_item_func(var_dict, pog_config_org):
     # try:
         # 从var_dict中获取基础数据
     bases_data = var_dict['bases_data']
-    pog_data = bases_data['pog_data'].copy()
+    pog_config_org = PogConfig.ensure(pog_config_org)      # 配置字典在入口处编译一次
+    pog_data = bases_data['pog_data']     # 只读，编辑通过变更集进行，不再复制
     tray_item = bases_data['tray_item']
     item_attributes = bases_data['item_attributes']
     item_attributes_detail = bases_data['item_attributes_detail']
-    sales_data = bases_data['sales_data']
+    sales_index = SalesIndex.from_bases_data(bases_data)       # revenue = sales × qty 只计算一次
     brand_2_brand_label = bases_data['brand_2_brand_label']
-    segment_rank_rule = pog_config_org['segment']['assign_brand_rank']
+    item_catalog = ItemCatalog.from_bases_data(bases_data)     # 商品属性目录只构建一次，后续定位、插入、可视化共用
+    layer_occupancy = LayerOccupancy.from_frame(pog_data)      # 层占用索引只构建一次，插入过程中增量更新
+    render_mode = var_dict.get('render_mode', 'immediate')
+    if render_mode not in RENDER_MODES:
+        return {
+            'pog_data': pog_data,
+            'status': 'fail',
+            'error_msg': f'非法的render_mode {render_mode}，可选值为 {RENDER_MODES}'
+        }
     
     # 从var_dict中获取即将添加的商品编号
     adding_item_code = var_dict['add_item']
     
     # Step1：检查是否为托盘商品
-    adding_item_info = get_item_info(adding_item_code, item_attributes, item_attributes_detail, brand_2_brand_label)
-    if adding_item_info == None:
-        return {
-            'pog_data': pog_data,
-            'status': 'fail',
-            'error_msg': f'未找到商品标号 {adding_item_code}相应的商品信息 '
-        }
-    if is_tray(adding_item_code):
-        return {
-            'pog_data': pog_data,
-            'status': 'fail',
-            'error_msg': f'非法操作：新增的商品 {adding_item_code} 是托盘'
-        }
-    if is_tray_item(adding_item_code, tray_item):
+    adding_item_info = get_item_info(adding_item_code, item_attributes, item_attributes_detail, brand_2_brand_label, item_catalog)
+    error_msg = check_adding_item(adding_item_code, adding_item_info, tray_item)
+    if error_msg is not None:
         return {
             'pog_data': pog_data,
             'status': 'fail',
-            'error_msg': f'非法操作：新增的商品 {adding_item_code} 是托盘商品'
+            'error_msg': error_msg
         }
     
     # Step2：定位商品位置
-    position_result = locate_item_position(adding_item_code, pog_data, item_attributes, item_attributes_detail, brand_2_brand_label)
+    position_result = locate_item_position(adding_item_code, pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, item_catalog = item_catalog, layer_occupancy = layer_occupancy)
     if not position_result['success']:
         return {
             'pog_data': pog_data,
@@ -63,16 +73,9 @@ def add_item_func(var_dict, pog_config_org):
     matching_level = position_result['matching_level']
     add_item_width = adding_item_info['width']
 
-    # 对原始状态的目标层进行可视化
-    layer_mask = (pog_data['module_id'] == target_module) & (pog_data['layer_id'] == target_layer)
-    layer_items = pog_data[layer_mask]
-    for idx in layer_items.index:       # 为layer_items这个dataframe添加字段segment_rank
-        item_code = layer_items.loc[idx]['item_code']
-        item_row_detail = item_attributes_detail[item_attributes_detail['item_idnt'] == int(item_code)]
-        segment = item_row_detail.iloc[0]['category_name']
-        segment_rank = int(segment_rank_rule[segment])
-        layer_items.loc[idx, 'segment_rank'] = segment_rank
-    fig1 = visualizing.pog_layer_visualize(pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, target_module, target_layer, pog_config_org)
+    # 记录原始状态的目标层快照
+    if render_mode != 'none':
+        snapshot_before = visualizing.build_layer_snapshot(pog_data, target_module, target_layer, pog_config_org, item_catalog)
 
     
     # Step3：尝试在目标层插入商品
@@ -80,32 +83,35 @@ def add_item_func(var_dict, pog_config_org):
         'item_attributes' : item_attributes, 
         'item_attributes_detail' : item_attributes_detail, 
         'brand_2_brand_label' : brand_2_brand_label,
-        'sales_data' : sales_data
+        'sales_index' : sales_index,
+        'item_catalog' : item_catalog,
+        'layer_occupancy' : layer_occupancy
     }   
     insert_result = insert_item_to_target_layer(
         pog_data, adding_item_code, add_item_width, target_module, target_layer, matching_level, item_info_dict, pog_config_org
     )
     
     if insert_result['success']:
-        # 对修改后的目标层进行可视化
-        new_pog_data = insert_result['new_pog_data']
-        layer_mask = (new_pog_data['module_id'] == target_module) & (new_pog_data['layer_id'] == target_layer)
-        layer_items = new_pog_data[layer_mask]
-        for idx in layer_items.index:       # 为layer_items这个dataframe添加字段segment_rank
-            item_code = layer_items.loc[idx]['item_code']
-            item_row_detail = item_attributes_detail[item_attributes_detail['item_idnt'] == int(item_code)]
-            segment = item_row_detail.iloc[0]['category_name']
-            segment_rank = int(segment_rank_rule[segment])
-            layer_items.loc[idx, 'segment_rank'] = segment_rank
-        fig2 = visualizing.pog_layer_visualize(new_pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, target_module, target_layer, pog_config_org)
-
-        return {
+        result = {
             'pog_data': insert_result['new_pog_data'],
             'status': 'success',
             'adjust_msg': insert_result['adjust_msg'],
             'target_module': target_module,
             'target_layer': target_layer
         }
+        if render_mode == 'none':
+            return result
+
+        # 记录修改后的目标层快照，immediate模式下立即绘图
+        snapshot_after = visualizing.build_layer_snapshot(insert_result['new_pog_data'], target_module, target_layer, pog_config_org, item_catalog)
+        if render_mode == 'deferred':
+            result['layer_snapshots'] = {'before': snapshot_before, 'after': snapshot_after}
+        else:
+            result['figures'] = {
+                'before': None if snapshot_before is None else visualizing.render_layer_snapshot(snapshot_before),
+                'after': None if snapshot_after is None else visualizing.render_layer_snapshot(snapshot_after)
+            }
+        return result
     else:
         return {
             'pog_data': pog_data,
@@ -120,6 +126,146 @@ def add_item_func(var_dict, pog_config_org):
     #         'error_msg': f'函数执行出错: {str(e)}'
     #     }
 
+def add_items_func(var_dict, pog_config_org):
+    """
+    批量新增商品，旧品不动 - 场景函数
+
+    参数:
+    var_dict: 包含基础数据和函数参数的字典，待新增商品编号列表放在 var_dict['add_item_list']
+
+    返回:
+    dict: 包含新pog_data、整体状态（success / partial / fail）、逐个商品结果 item_results 以及被改动的层 touched_layers
+
+    与逐个调用add_item_func相比：
+    - 商品目录与层占用索引只构建一次，不做可视化
+    - 所有商品的目标层基于原始pog_data一次性定位，再按层分组（层按首次出现的顺序，层内按输入顺序）依次插入
+    - 所有改动记录进变更集，最后一次性生成新的pog_data；被改动的层按rearrange_layer_item_gap的规则重新分配间距
+    - 同一批次内重复的商品编号只处理第一次出现的那个
+    """
+    bases_data = var_dict['bases_data']
+    pog_config_org = PogConfig.ensure(pog_config_org)      # 配置字典在入口处编译一次
+    pog_data = bases_data['pog_data']     # 只读，编辑通过变更集进行，不再复制
+    tray_item = bases_data['tray_item']
+    item_attributes = bases_data['item_attributes']
+    item_attributes_detail = bases_data['item_attributes_detail']
+    sales_index = SalesIndex.from_bases_data(bases_data)       # revenue = sales × qty 只计算一次
+    brand_2_brand_label = bases_data['brand_2_brand_label']
+    item_catalog = ItemCatalog.from_bases_data(bases_data)
+    layer_occupancy = LayerOccupancy.from_frame(pog_data)
+
+    adding_item_list = list(var_dict['add_item_list'])
+    item_results = [{'item_code': item_code} for item_code in adding_item_list]
+
+    # Step1：逐个检查商品合法性，并基于原始pog_data一次性定位目标层
+    layer_groups = {}   # (module, layer) -> [(结果序号, 商品编号, 商品宽度, 匹配等级)]，dict保持层首次出现的顺序
+    seen_item_codes = set()
+    for result_idx, adding_item_code in enumerate(adding_item_list):
+        item_result = item_results[result_idx]
+        if adding_item_code in seen_item_codes:
+            item_result.update({'status': 'fail', 'error_msg': f'商品 {adding_item_code} 在本次新增列表中重复出现'})
+            continue
+        seen_item_codes.add(adding_item_code)
+
+        adding_item_info = get_item_info(adding_item_code, item_attributes, item_attributes_detail, brand_2_brand_label, item_catalog)
+        error_msg = check_adding_item(adding_item_code, adding_item_info, tray_item)
+        if error_msg is not None:
+            item_result.update({'status': 'fail', 'error_msg': error_msg})
+            continue
+
+        position_result = locate_item_position(adding_item_code, pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, item_catalog = item_catalog, layer_occupancy = layer_occupancy)
+        if not position_result['success']:
+            item_result.update({'status': 'fail', 'error_msg': position_result['error_msg']})
+            continue
+
+        layer_key = (position_result['module'], position_result['layer'])
+        item_result.update({
+            'target_module': layer_key[0],
+            'target_layer': layer_key[1],
+            'matching_level': position_result['matching_level']
+        })
+        layer_groups.setdefault(layer_key, []).append(
+            (result_idx, adding_item_code, adding_item_info['width'], position_result['matching_level'])
+        )
+
+    # Step2：按层依次插入，层内顺序用行标签列表维护，所有改动记录进变更集
+    change_set = PogChangeSet(pog_data)
+    next_req_id = pog_data['req_id'].max() + 1 if not pog_data.empty else 1
+    touched_layers = []
+    for layer_key, layer_items_to_add in layer_groups.items():
+        target_module, target_layer = layer_key
+        layer_frame = change_set.rows([row_key for row_key, _ in layer_occupancy.layer_rows(layer_key)])
+        layer_touched = False
+
+        for result_idx, adding_item_code, add_item_width, matching_level in layer_items_to_add:
+            item_result = item_results[result_idx]
+
+            # 空间不足时尝试减少double facing商品的facing
+            adjust_msg = None
+            if calculate_layer_space(target_module, target_layer, pog_data, layer_occupancy) < add_item_width:
+                delete_item_code = reduce_facing_for_space(change_set, layer_key, add_item_width, sales_index, layer_occupancy)
+                if delete_item_code is None:
+                    item_result.update({'status': 'fail', 'error_msg': f'空间不足，无法添加商品 {adding_item_code}，即使调整facing和删除商品后仍然无法容纳'})
+                    continue
+                adjust_msg = f"商品{delete_item_code}的facing减一"
+                layer_touched = True
+
+            if matching_level == 'same_item':
+                for label in change_set.find_rows('item_code', adding_item_code):
+                    facing = change_set.get_value(label, 'facing') + 1     # 直接令facing+1
+                    change_set.set_value(label, 'facing', facing)
+                    layer_occupancy.set_facing(label, facing)
+            else:
+                # 确定新商品在层内应摆的位置（与已插入的新品一起参与层内定位）
+                insert_at = 0
+                position_result = locate_item_position(adding_item_code, layer_frame, item_attributes, item_attributes_detail, brand_2_brand_label, pog_config_org, 'layer_search', item_catalog)
+                if position_result['success'] == True:
+                    insert_at = int(np.flatnonzero(layer_frame['item_code'].to_numpy() == position_result['matching_item_code'])[0])
+                    if position_result['relative_position'] == 'backward':
+                        insert_at += 1
+
+                new_row = create_new_item_row(pog_data, adding_item_code, add_item_width, target_module, target_layer, -1)
+                new_row['req_id'] = next_req_id
+                new_label = change_set.insert_row(new_row)
+                layer_occupancy.add_item(layer_key, new_label, adding_item_code, add_item_width, 1, -1)
+                layer_frame = pd.concat([layer_frame.iloc[:insert_at], pd.DataFrame([new_row], index = [new_label]), layer_frame.iloc[insert_at:]])
+                next_req_id += 1
+
+            layer_touched = True
+            item_result.update({'status': 'success', 'adjust_msg': adjust_msg})
+
+        if layer_touched:
+            touched_layers.append((layer_key, list(layer_frame.index)))
+
+    # Step3：按层内顺序重新分配被改动层的间距，最后一次性生成新的pog_data
+    for layer_key, layer_order in touched_layers:
+        stage_layer_rearrange(change_set, layer_key, layer_occupancy, layer_order)
+    touched_layer_keys = [layer_key for layer_key, _ in touched_layers]
+    pog_data = change_set.apply()
+
+    success_cnt = sum(item_result['status'] == 'success' for item_result in item_results)
+    if success_cnt == len(item_results) and success_cnt > 0:
+        status = 'success'
+    elif success_cnt > 0:
+        status = 'partial'
+    else:
+        status = 'fail'
+    return {
+        'pog_data': pog_data,
+        'status': status,
+        'item_results': item_results,
+        'touched_layers': touched_layer_keys
+    }
+
+def check_adding_item(item_code, item_info, tray_item):
+    """检查待新增商品是否合法，合法返回None，否则返回错误信息"""
+    if item_info == None:
+        return f'未找到商品标号 {item_code}相应的商品信息 '
+    if is_tray(item_code):
+        return f'非法操作：新增的商品 {item_code} 是托盘'
+    if is_tray_item(item_code, tray_item):
+        return f'非法操作：新增的商品 {item_code} 是托盘商品'
+    return None
+
 def is_tray(item_code):
     """检查商品是否为托盘"""
     if int(item_code) < 1000000:
@@ -134,13 +280,25 @@ def is_tray_item(item_code, tray_item):
     else:
         return False
 
-def locate_item_position(item_code, pog_data, item_attributes, item_attributes_detail, brand_2_brand_label , pog_config_org = None, option = None):
+def locate_item_position(item_code, pog_data, item_attributes, item_attributes_detail, brand_2_brand_label , pog_config_org = None, option = None, item_catalog = None, layer_occupancy = None):
     """
     定位商品应该放在哪个模块和层
     按照品牌层级结构从细到粗查找
+    item_catalog: 可选的ItemCatalog，不传时由三张属性表现场构建
+    layer_occupancy: 可选的LayerOccupancy，用于查询候选层剩余空间，不传时由pog_data现场构建
+
+    向量化实现：一次性把pog_data各行关联上层级属性，用数组比较算出每行的匹配等级，
+    再取最深的匹配等级，得到去重后的候选(module, layer)并从层占用索引中查询其剩余空间。
+    匹配规则与原逐行遍历的版本完全一致：
+    - 系列匹配取最后一个同系列商品（layer_search模式下取第一个segment_rank不小于新品的同系列商品）
+    - 品牌、品牌集合匹配取第一个匹配商品
+    - 候选层从匹配商品所在行开始查找，剩余空间相同时取先出现的层
     """
+    if item_catalog is None:
+        item_catalog = ItemCatalog(item_attributes, item_attributes_detail, brand_2_brand_label)
+
     # 获取商品属性
-    item_info = get_item_info(item_code, item_attributes, item_attributes_detail, brand_2_brand_label)
+    item_info = item_catalog.get(item_code)
     if item_info is None:
         return {
             'success': False,
@@ -153,129 +311,107 @@ def locate_item_position(item_code, pog_data, item_attributes, item_attributes_d
     adding_item_brand = item_info['brand']
     adding_item_brand_label = item_info['brand_label']
 
-    # 获取segment排列规则；并用is_largest_segment_rank这一变量来判断adding_item是否为同系列商品中rank最大的
-    if option == 'layer_search':
-        segment_rank_rule = pog_config_org['segment']['assign_brand_rank']
-        is_largest_segment_rank = True
-        
-    # 遍历现有pog_data中的所有商品，寻找匹配商品的位置
-    matching_result = None
-    current_level = 0  # 0:无匹配, 1:品牌集合, 2:品牌, 3:系列
-    # 第一次遍历，确定匹配层级
-    for idx in range(0, len(pog_data)):
-        matching_item_code = pog_data.iloc[idx]['item_code']
-        # 若为托盘商品，暂时直接跳过
-        if is_tray(matching_item_code):
-            continue
-        # 若当前pog布局中正好有正在添加的item，直接返回
-        if matching_item_code == item_code:
-            return {
-                'module' : pog_data.iloc[idx]['module_id'],
-                'layer' : pog_data.iloc[idx]['layer_id'],
-                'matching_item_code' : matching_item_code,
-                'matching_level' : 'same_item',
-                'success': True
-            }
+    # 为pog_data各行关联层级属性（托盘商品暂时直接跳过，不参与匹配）
+    pog_item_codes = pd.to_numeric(pog_data['item_code'], errors='coerce')
+    not_tray = (pog_item_codes >= 1000000).to_numpy()
+    matching_attrs = item_catalog.frame.reindex(pog_item_codes.to_numpy())
+    brand_label_match = not_tray & (matching_attrs['brand_label'].to_numpy() == adding_item_brand_label)
+    brand_match = brand_label_match & (matching_attrs['brand'].to_numpy() == adding_item_brand)
+    series_match = brand_match & (matching_attrs['series'].to_numpy() == adding_item_series)
 
-        matching_item_info = get_item_info(matching_item_code, item_attributes, item_attributes_detail, brand_2_brand_label)
-        matching_segment = matching_item_info['segment']
-        matching_series = matching_item_info['series']
-        matching_brand = matching_item_info['brand']
-        matching_brand_label = matching_item_info['brand_label']
-        if matching_brand_label == adding_item_brand_label:
-            if matching_brand == adding_item_brand:
-                if matching_series == adding_item_series:   # 品牌集合、品牌、系列皆匹配
-                    matching_result = {
-                            'module' : pog_data.iloc[idx]['module_id'],
-                            'layer' : pog_data.iloc[idx]['layer_id'],
-                            'matching_item_code' : matching_item_code,
-                            'matching_index' : idx,
-                            'matching_level' : 'series',
-                            'name_for_searching_layer' : matching_series
-                            }       # 不论是否为第一个匹配到的同系列item，都对matching_result进行更新
-                    if current_level < 3:
-                        current_level = 3
-                    if option == 'layer_search':
-                        # 在层内进行位置匹配时，若需要在一堆同series的商品中确定位置，则搜索第一个segment_rank不小于adding_item的segment_rank的货架item，并将adding_item插在该商品前
-                        adding_segment_rank = segment_rank_rule[adding_item_segment]
-                        matching_segment_rank = segment_rank_rule[matching_segment]
-                        if  adding_segment_rank <= matching_segment_rank:
-                            is_largest_segment_rank = False
-                            break   # 搜索到第一个segment_rank不小于adding_item的segment_rank的货架item，直接跳出循环
-                elif current_level < 2:   # 仅品牌集合、品牌匹配，且当前的匹配等级较小
-                    matching_result = {
-                    'module' : pog_data.iloc[idx]['module_id'],
-                    'layer' : pog_data.iloc[idx]['layer_id'],
-                    'matching_item_code' : matching_item_code,
-                    'matching_index' : idx,
-                    'matching_level' : 'brand',
-                    'name_for_searching_layer' : matching_brand     # 用于第二次遍历匹配的系列名
-                    }
-                    current_level = 2
-            elif current_level < 1:   # 仅品牌集合匹配，且当前无匹配
-                matching_result = {
-                    'module' : pog_data.iloc[idx]['module_id'],
-                    'layer' : pog_data.iloc[idx]['layer_id'],
-                    'matching_item_code' : matching_item_code,
-                    'matching_index' : idx,
-                    'matching_level' : 'brand_label',
-                    'name_for_searching_layer' : matching_brand_label   # 用于第二次遍历匹配的品牌集合名    
-                    }
-                current_level = 1
-    # 若option为层内位置匹配，则直接返回matching_result
-    if option == 'layer_search':
-        if current_level >= 1:
-            matching_result['success'] = True
-            if current_level >= 3 and is_largest_segment_rank:
-                matching_result['relative_position'] = 'backward'
-            else:
-                matching_result['relative_position'] = 'forward'
-            return matching_result
-        else:
-            matching_result['success'] = False
-            matching_result['error_msg'] = '由于未知错误，无法在层内匹配到相同的商品层级'
-            return matching_result
+    # layer_search模式下，遇到第一个segment_rank不小于adding_item的同系列商品即停止搜索
+    search_end = len(pog_data)
+    is_largest_segment_rank = True
+    if option == 'layer_search' and series_match.any():
+        pog_config = PogConfig.ensure(pog_config_org)
+        adding_segment_rank = pog_config.segment_rank(adding_item_segment)
+        matching_segment_rank = pog_config.segment_ranks(matching_attrs['segment'])
+        stop_rows = np.flatnonzero(series_match & (adding_segment_rank <= matching_segment_rank))
+        if len(stop_rows) > 0:
+            search_end = stop_rows[0] + 1
+            is_largest_segment_rank = False
+
+    # 若当前pog布局中正好有正在添加的item，直接返回
+    same_item_rows = np.flatnonzero(not_tray[:search_end] & (pog_data['item_code'].to_numpy()[:search_end] == item_code))
+    if len(same_item_rows) > 0:
+        idx = same_item_rows[0]
+        return {
+            'module' : pog_data['module_id'].iloc[idx],
+            'layer' : pog_data['layer_id'].iloc[idx],
+            'matching_item_code' : pog_data['item_code'].iloc[idx],
+            'matching_level' : 'same_item',
+            'success': True
+        }
+
+    # 确定匹配层级：系列取最后一个匹配行，品牌/品牌集合取第一个匹配行
+    series_rows = np.flatnonzero(series_match[:search_end])
+    brand_rows = np.flatnonzero((brand_match & ~series_match)[:search_end])
+    brand_label_rows = np.flatnonzero((brand_label_match & ~brand_match)[:search_end])
+    if len(series_rows) > 0:
+        current_level, matching_index, matching_level, name_for_searching_layer = 3, series_rows[-1], 'series', adding_item_series
+    elif len(brand_rows) > 0:
+        current_level, matching_index, matching_level, name_for_searching_layer = 2, brand_rows[0], 'brand', adding_item_brand
+    elif len(brand_label_rows) > 0:
+        current_level, matching_index, matching_level, name_for_searching_layer = 1, brand_label_rows[0], 'brand_label', adding_item_brand_label
+    else:
+        current_level = 0
 
-    # 如果所有层级都找不到匹配
     if current_level == 0:
+        # 如果所有层级都找不到匹配
+        error_msg = '由于未知错误，无法在层内匹配到相同的商品层级' if option == 'layer_search' else f'无法为商品 {item_code} 匹配到相同的商品层级'
         return {
-        'success': False,
-        'error_msg': f'无法为商品 {item_code} 匹配到相同的商品层级'
+            'success': False,
+            'error_msg': error_msg
+        }
+
+    matching_result = {
+        'module' : pog_data['module_id'].iloc[matching_index],
+        'layer' : pog_data['layer_id'].iloc[matching_index],
+        'matching_item_code' : pog_data['item_code'].iloc[matching_index],
+        'matching_index' : matching_index,
+        'matching_level' : matching_level,
+        'name_for_searching_layer' : name_for_searching_layer
     }
 
-    # 第二次遍历现有pog_data，根据匹配的层级，查找匹配层级的所有layer
-    optional_layer = [] # 用于存储所有同level的layer
-    matching_level = matching_result['matching_level']
-    matching_index = matching_result['matching_index']
-    for idx in range(matching_index , len(pog_data)):
-        matching_item_code = pog_data.iloc[idx]['item_code']
-        if is_tray(matching_item_code):
-            continue
-        matching_item_info = get_item_info(matching_item_code, item_attributes, item_attributes_detail, brand_2_brand_label)
-        matching_level_name = matching_item_info.get(matching_level)
-        if matching_level_name == matching_result['name_for_searching_layer']:
-            # 记录位置，并计算剩余空间
-            module_id = pog_data.iloc[idx]['module_id']
-            layer_id = pog_data.iloc[idx]['layer_id']
-            remaining_space = calculate_layer_space(module_id, layer_id, pog_data)
-            layer_info = {'module_id' : module_id, 
-                            'layer_id' : layer_id, 
-                            'remaining_space' : remaining_space}
-            optional_layer.append(layer_info)   # TODO:这里可能会重复添加已有layer，有空再优化
-
-    # 再从符合条件的layer里面挑选出可供插入的最大空间layer
-    max_space_layer = max(optional_layer,  key=lambda x: x['remaining_space'])
+    # 若option为层内位置匹配，则直接返回matching_result
+    if option == 'layer_search':
+        matching_result['success'] = True
+        if current_level >= 3 and is_largest_segment_rank:
+            matching_result['relative_position'] = 'backward'
+        else:
+            matching_result['relative_position'] = 'forward'
+        return matching_result
+
+    # 从匹配行开始，查找同一层级名称的所有商品，得到去重后的候选layer（按首次出现的顺序）
+    candidate_mask = not_tray & (matching_attrs[matching_level].to_numpy() == name_for_searching_layer)
+    candidate_mask[:matching_index] = False
+    candidate_layers = pog_data.loc[candidate_mask, ['module_id', 'layer_id']].drop_duplicates()
+
+    # 从层占用索引查询各候选层剩余空间，再挑选出可供插入的最大空间layer（空间相同时取先出现的层）
+    if layer_occupancy is None:
+        layer_occupancy = LayerOccupancy.from_frame(pog_data)
+    candidate_layers = candidate_layers.assign(
+        remaining_space = [
+            layer_occupancy.remaining_width(layer_key)
+            for layer_key in zip(candidate_layers['module_id'], candidate_layers['layer_id'])
+        ]
+    ).reset_index(drop=True)
+    max_space_layer = candidate_layers.loc[candidate_layers['remaining_space'].idxmax()]
     return {
         'module': max_space_layer['module_id'],
         'layer': max_space_layer['layer_id'],
         'matching_item_code' : matching_result['matching_item_code'],
         'matching_level' : matching_result['matching_level'],
+        'candidate_layers' : candidate_layers,
         'success': True
     }
 
 
-def get_item_info(item_code, item_attributes, item_attributes_detail, brand_2_brand_label):
-    """获取商品的完整属性信息"""
+def get_item_info(item_code, item_attributes, item_attributes_detail, brand_2_brand_label, item_catalog = None):
+    """获取商品的完整属性信息（传入item_catalog时直接查目录，不再筛选三张表）"""
+    if item_catalog is not None:
+        return item_catalog.get(item_code)
+
     # 从商品属性表获取基本信息
     item_row = item_attributes[item_attributes['ITEM_NBR'] == int(item_code)]
     item_row_detail = item_attributes_detail[item_attributes_detail['item_idnt'] == int(item_code)]
@@ -297,8 +433,12 @@ def get_item_info(item_code, item_attributes, item_attributes_detail, brand_2_br
 
     return item_info
 
-def calculate_layer_space(module_id, layer_id, pog_data):
-    """计算匹配商品所在各层的剩余空间"""
+def calculate_layer_space(module_id, layer_id, pog_data, layer_occupancy = None):
+    """计算匹配商品所在各层的剩余空间（传入layer_occupancy时直接查索引，不再筛选pog_data）"""
+    if layer_occupancy is not None:
+        if layer_occupancy.item_count((module_id, layer_id)) == 0:
+            return 0
+        return layer_occupancy.remaining_width((module_id, layer_id))
 
     # 获取该层的所有商品
     layer_items = pog_data[
@@ -313,91 +453,95 @@ def calculate_layer_space(module_id, layer_id, pog_data):
     layer_items['total_item_width'] = layer_items['item_width'] * layer_items['facing']
     used_space = layer_items['total_item_width'].sum()
     remaining_space = module_width - used_space
-    
+
     return remaining_space
 
 def insert_item_to_target_layer(pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org):
-    """在目标层插入商品"""
-    new_pog_data = pog_data.copy()
-    
-    # 获取目标层的所有商品
-    layer_mask = (new_pog_data['module_id'] == target_module) & (new_pog_data['layer_id'] == target_layer)
-    layer_items = new_pog_data[layer_mask]
+    """
+    在目标层插入商品
+    插入、调整facing、重排间距都只记录进变更集（PogChangeSet），不复制pog_data，最后一次性生成新的pog_data
+    """
+    layer_occupancy = pog_info_dict.get('layer_occupancy')
+    if layer_occupancy is None:
+        layer_occupancy = LayerOccupancy.from_frame(pog_data)
+        pog_info_dict = dict(pog_info_dict, layer_occupancy = layer_occupancy)
+    change_set = PogChangeSet(pog_data)
     
-    if layer_items.empty:
+    if layer_occupancy.item_count((target_module, target_layer)) == 0:
         # 如果该层没有商品，直接添加
-        result = add_item_to_empty_layer(new_pog_data, item_code, item_width, target_module, target_layer)
-        if result['success']:
-            return {'success': True, 'new_pog_data': result['new_pog_data']}
-        else:
-            return {'success': False, 'error_msg': result['error_msg']}
+        add_item_to_empty_layer(change_set, item_code, item_width, target_module, target_layer, layer_occupancy)
+        return {'success': True, 'new_pog_data': change_set.apply(), 'adjust_msg': None}
     
     # 计算当前剩余空间
-    current_remaining_space = calculate_layer_space(target_module, target_layer, pog_data)
-    
-    if current_remaining_space >= item_width:
-        # 空间足够，直接插入并重排
-        result = insert_and_rearrange(new_pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org)
-        if result['success']:
-            return {'success': True, 'new_pog_data': result['new_pog_data'], 'adjust_msg': None}
-        else:
-            return {'success': False, 'error_msg': result['error_msg']}
-    else:
+    adjust_msg = None
+    current_remaining_space = calculate_layer_space(target_module, target_layer, pog_data, layer_occupancy)
+    if current_remaining_space < item_width:
         # 空间不足，尝试调整策略
-        return adjust_space_for_insertion(new_pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org)
+        adjust_result = adjust_space_for_insertion(change_set, item_code, item_width, target_module, target_layer, pog_info_dict)
+        if not adjust_result['success']:
+            return adjust_result
+        adjust_msg = adjust_result['adjust_msg']
+    
+    # 插入并重排
+    result = insert_and_rearrange(change_set, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org)
+    if result['success']:
+        return {'success': True, 'new_pog_data': change_set.apply(), 'adjust_msg': adjust_msg}
+    else:
+        return {'success': False, 'error_msg': result['error_msg']}
 
-def add_item_to_empty_layer(pog_data, item_code, item_width, target_module, target_layer):
-    """向空层添加商品"""
-    new_pog_data = pog_data.copy()
-    
-    # 获取模块宽度
-    module_info = new_pog_data[new_pog_data['module_id'] == target_module].iloc[0]
-    module_width = module_info['module_width']
-    
-    # 创建新商品行
-    new_row = create_new_item_row(new_pog_data, item_code, item_width, target_module, target_layer, 0)
-    new_pog_data = pd.concat([new_pog_data, pd.DataFrame([new_row])], ignore_index=True)
-    
-    return {'success': True, 'new_pog_data': new_pog_data}
+def add_item_to_empty_layer(change_set, item_code, item_width, target_module, target_layer, layer_occupancy = None):
+    """向空层添加商品（记录进变更集）"""
+    new_row = create_new_item_row(change_set.base, item_code, item_width, target_module, target_layer, 0)
+    new_label = change_set.insert_row(new_row)
+    if layer_occupancy is not None:
+        layer_occupancy.add_item((target_module, target_layer), new_label, item_code, item_width, 1, 0)
+    
+    return {'success': True}
 
-def insert_and_rearrange(pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org):
-    """插入商品并重排位置"""
-    new_pog_data = pog_data.copy()
+def insert_and_rearrange(change_set, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org):
+    """插入商品并重排位置（记录进变更集）"""
+    layer_key = (target_module, target_layer)
+    layer_occupancy = pog_info_dict['layer_occupancy']
 
     if matching_level == 'same_item':
-        new_pog_data.loc[new_pog_data['item_code'] == item_code, 'facing'] += 1 # 直接令facing+1
+        for label in change_set.find_rows('item_code', item_code):
+            facing = change_set.get_value(label, 'facing') + 1     # 直接令facing+1
+            change_set.set_value(label, 'facing', facing)
+            layer_occupancy.set_facing(label, facing)
     else:
         # 在末尾添加商品
-        layer_mask = (new_pog_data['module_id'] == target_module) & (new_pog_data['layer_id'] == target_layer)
-        layer_items = new_pog_data[layer_mask]
-        
-        if layer_items.empty:
-            return add_item_to_empty_layer(new_pog_data, item_code, item_width, target_module, target_layer)
+        layer_labels = [row_key for row_key, _ in layer_occupancy.layer_rows(layer_key)]
+        if not layer_labels:
+            return add_item_to_empty_layer(change_set, item_code, item_width, target_module, target_layer, layer_occupancy)
         
         # 创建新商品行（临时位置-1）
-        new_row = create_new_item_row(new_pog_data, item_code, item_width, target_module, target_layer, -1)
-        new_pog_data = pd.concat([new_pog_data, pd.DataFrame([new_row])], ignore_index=True)
+        new_row = create_new_item_row(change_set.base, item_code, item_width, target_module, target_layer, -1)
+        new_label = change_set.insert_row(new_row)
+        layer_occupancy.add_item(layer_key, new_label, item_code, item_width, 1, -1)
         
-        # 确定新商品在层内应摆的位置
+        # 确定新商品在层内应摆的位置（只取出该层的行）
         item_attributes = pog_info_dict['item_attributes']
         item_attributes_detail = pog_info_dict['item_attributes_detail']
         brand_2_brand_label = pog_info_dict['brand_2_brand_label']
+        item_catalog = pog_info_dict.get('item_catalog')
 
-        sorted_layer_items = layer_items.sort_values(by = 'position', ascending = True)
-        position_result = locate_item_position(item_code, sorted_layer_items, item_attributes, item_attributes_detail, brand_2_brand_label, pog_config_org, 'layer_search')
+        sorted_layer_items = change_set.rows(layer_labels)
+        position_result = locate_item_position(item_code, sorted_layer_items, item_attributes, item_attributes_detail, brand_2_brand_label, pog_config_org, 'layer_search', item_catalog)
         if position_result['success'] == True:
             matching_item_code = position_result['matching_item_code']
+            matching_position = sorted_layer_items[sorted_layer_items['item_code'] == matching_item_code].iloc[0]['position']
             if position_result['relative_position'] == 'forward':
-                new_pog_data.loc[len(new_pog_data)-1, 'position'] = (sorted_layer_items[sorted_layer_items['item_code'] == matching_item_code].iloc[0]['position'] - 1)      # 直接将新加入的商品插在前面（这里修改的列索引不知道为什么必须是len(new_pog_data)-1）
-            elif position_result['relative_position'] == 'backward':
-                new_pog_data.loc[len(new_pog_data)-1, 'position'] = (sorted_layer_items[sorted_layer_items['item_code'] == matching_item_code].iloc[0]['position'] + 1)   # 插在后面
-        else:   # 层内定位失败
-            {'success': False, 'error_msg': position_result['error_msg']}
+                new_position = matching_position - 1      # 直接将新加入的商品插在前面
+            else:
+                new_position = matching_position + 1      # 插在后面
+            change_set.set_value(new_label, 'position', new_position)
+            layer_occupancy.update_item(new_label, position = new_position)
+        # 层内定位失败时新商品保持临时位置-1，即放在该层最前面
     
     # 调整该层所有商品的间距
-    new_pog_data = rearrange_layer_item_gap(new_pog_data, target_module, target_layer)
+    stage_layer_rearrange(change_set, layer_key, layer_occupancy)
     
-    return {'success': True, 'new_pog_data': new_pog_data}
+    return {'success': True}
 
 def create_new_item_row(pog_data, item_code, item_width, target_module, target_layer, position):
     """创建新商品的数据行"""
@@ -422,131 +566,102 @@ def create_new_item_row(pog_data, item_code, item_width, target_module, target_l
     
     return new_row
 
-def rearrange_layer_item_gap(pog_data, target_module, target_layer):
-    """调整指定层的平均间隔"""
-    new_pog_data = pog_data.copy()
-    layer_mask = (new_pog_data['module_id'] == target_module) & (new_pog_data['layer_id'] == target_layer)
-    layer_items = new_pog_data[layer_mask]
-    sorted_layer_items = layer_items.sort_values(by = 'position', ascending = True)
-    sorted_layer_indices = sorted_layer_items.index 
-    
-    
-    if len(sorted_layer_indices) == 0:
-        return new_pog_data
-    
-    # module_width = new_pog_data.loc[layer_indices[0], 'module_width']
-    # total_item_width = new_pog_data.loc[layer_indices, 'item_width'].sum()
-    
-    # 计算平均间隔
-    total_gap = calculate_layer_space(target_module, target_layer, pog_data)
-    gap_cnt = len(sorted_layer_indices) - 1    # 空隙数量
-    avg_gap = total_gap / gap_cnt if gap_cnt > 0 else 0
-    ceil_cnt = int(total_gap % gap_cnt)  # 向上取整的空隙数量
-    
-    # 重新分配位置
-    current_position = 0
-    for idx in sorted_layer_indices[range(0, ceil_cnt)]:
-        new_pog_data.loc[idx, 'position'] = current_position
-        current_position += new_pog_data.loc[idx, 'item_width'] * new_pog_data.loc[idx, 'facing'] + np.ceil(avg_gap)
-    for idx in sorted_layer_indices[range(ceil_cnt, len(sorted_layer_indices))]:
-        new_pog_data.loc[idx, 'position'] = current_position
-        current_position += new_pog_data.loc[idx, 'item_width'] * new_pog_data.loc[idx, 'facing'] + np.floor(avg_gap)
-    
+def rearrange_layer_item_gap(pog_data, target_module, target_layer, layer_occupancy = None):
+    """调整指定层的平均间隔（两端贴边、余数间隙向上取整，由layer_spacing向量化计算；传入layer_occupancy时同步更新其中的position）"""
+    new_pog_data = respace_layers(pog_data, 'even_split', layer_keys = [(target_module, target_layer)])
+    if layer_occupancy is not None:
+        sync_layer_positions(new_pog_data, [(target_module, target_layer)], layer_occupancy)
     return new_pog_data
 
-def adjust_space_for_insertion(pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org):
-    """调整空间策略：减少facing或删除商品"""
-    new_pog_data = pog_data.copy()
-    layer_mask = (new_pog_data['module_id'] == target_module) & (new_pog_data['layer_id'] == target_layer)
+def sync_layer_positions(pog_data, layer_keys, layer_occupancy):
+    """把指定层各行的新position写回层占用索引"""
+    layer_mask = pd.MultiIndex.from_arrays([pog_data['module_id'], pog_data['layer_id']]).isin(layer_keys)
+    for idx, position in pog_data.loc[layer_mask, 'position'].items():
+        layer_occupancy.update_item(idx, position = position)
+
+def stage_layer_rearrange(change_set, layer_key, layer_occupancy, layer_order = None):
+    """
+    按rearrange_layer_item_gap的规则重排某层间距，只取出该层的行计算，新position记录进变更集并同步层占用索引
+    layer_order: 层内行标签的顺序，不传时按层占用索引中的position排序
+    """
+    if layer_order is None:
+        layer_order = [row_key for row_key, _ in layer_occupancy.layer_rows(layer_key)]
+    if len(layer_order) == 0:
+        return
+    layer_items = change_set.rows(layer_order, ['module_id', 'layer_id', 'position', 'item_width', 'facing'])
+    layer_items['position'] = np.arange(len(layer_order))      # 先按层内顺序给出临时位置
+    layer_items = respace_layers(layer_items, 'even_split', total_width = layer_occupancy.module_width(layer_key))
+    for label, position in layer_items['position'].items():
+        change_set.set_value(label, 'position', position)
+        layer_occupancy.update_item(label, position = position)
+
+def adjust_space_for_insertion(change_set, item_code, item_width, target_module, target_layer, pog_info_dict):
+    """调整空间策略：减少facing或删除商品（调整记录进变更集）"""
+    layer_occupancy = pog_info_dict['layer_occupancy']
     
     # 策略: 尝试减少double facing商品的facing
-    double_facing_items = new_pog_data[layer_mask & (new_pog_data['facing'] > 1)]
-    # delete_items = []
-    
-    if not double_facing_items.empty:
-        # 获取销售数据并排序（从低到高）
-        sorted_items = get_sorted_items_by_sales(double_facing_items, pog_info_dict['sales_data'], ascending=True)
-        
-        for idx in sorted_items.index:
-            # 减少一个facing
-            delete_item_code = sorted_items.loc[idx, 'item_code']
-            mask = new_pog_data['item_code'] == delete_item_code
-            original_facing = new_pog_data.loc[mask, 'facing']
-            new_pog_data.loc[mask, 'facing'] = original_facing - 1
-            
-            # 检查空间是否足够
-            remaining_space_after = calculate_layer_space(target_module, target_layer, new_pog_data)
-            
-            if remaining_space_after >= item_width:
-                # 空间足够，插入商品
-                result = insert_and_rearrange(new_pog_data, item_code, item_width, target_module, target_layer, matching_level, pog_info_dict, pog_config_org)
-                if result['success']:
-                    return {'success': True, 'new_pog_data': result['new_pog_data'], 
-                            'adjust_msg': f"商品{delete_item_code}的facing减一"}
-            
-            # 如果还是不够，恢复原状继续尝试下一个
-            new_pog_data.loc[idx, 'facing'] = original_facing
-        # 若只减少一个facing不够，减少销售额最低的商品后再尝试减少一个
-        # delete_item_code = sorted_items.iloc[0].get(['item_code'])
-        # new_pog_data.loc[new_pog_data['item_code'] == delete_item_code, 'facing'] -= 1
-        # double_facing_items = new_pog_data[layer_mask & (new_pog_data['facing'] > 1)]
+    delete_item_code = reduce_facing_for_space(change_set, (target_module, target_layer), item_width, pog_info_dict['sales_index'], layer_occupancy)
+    if delete_item_code is not None:
+        # 空间足够，可以插入商品
+        return {'success': True, 'adjust_msg': f"商品{delete_item_code}的facing减一"}
     
-    # # 策略2: 删除销售最低的商品
-    # layer_items = new_pog_data[layer_mask]
-    # if len(layer_items) > 1:
-    #     # 获取销售数据并排序（从低到高）
-    #     sorted_items = get_sorted_items_by_sales(layer_items, sales_data, ascending=True)
-        
-    #     for idx in sorted_items.index:
-    #         # 删除一个商品
-    #         temp_pog_data = new_pog_data.drop(index=idx)
-            
-    #         # 检查空间是否足够
-    #         temp_layer_items = temp_pog_data[
-    #             (temp_pog_data['module_id'] == target_module) & 
-    #             (temp_pog_data['layer_id'] == target_layer)
-    #         ]
-    #         module_width = temp_layer_items['module_width'].iloc[0]
-    #         used_space_after = temp_layer_items['item_width'].sum()
-    #         remaining_space_after = module_width - used_space_after
-            
-    #         if remaining_space_after >= item_width:
-    #             # 空间足够，插入商品
-    #             result = insert_and_rearrange(temp_pog_data, item_code, item_width, target_module, target_layer)    # TODO：函数有变，待改
-    #             if result['success']:
-    #                 return {'success': True, 'new_pog_data': result['new_pog_data']}
-    
-    # 所有策略都失败
+    # 减少facing后仍放不下：不删除其他商品，返回失败
     return {
         'success': False, 
         'error_msg': f'空间不足，无法添加商品 {item_code}，即使调整facing和删除商品后仍然无法容纳'
     }
 
-def get_sorted_items_by_sales(items_df, sales_data, ascending=True):
-    """根据销售数据对商品进行排序"""
-    # 合并销售数据
-    merged_df = items_df.merge(
-        sales_data, 
-        left_on='item_code', 
-        right_on='item_code', 
-        how='left'
-    )
-    
-    merged_df['sales'] = merged_df['sales'].fillna(0)   # 填充缺失的销售数据
-    merged_df['sales_total'] = merged_df['sales'] * merged_df['qty']
-    # 按销售排序
-    return merged_df.sort_values('sales_total', ascending=ascending)
+def reduce_facing_for_space(change_set, layer_key, item_width, sales_index, layer_occupancy):
+    """
+    按销售额从低到高，逐个尝试将目标层内double facing商品的facing减一（只调整目标层内的行），直到该层剩余空间足以放下item_width
+    试算只在层占用索引上进行；成功时把该次调整记录进变更集并返回被调整的商品编号，否则恢复原状并返回None
+    """
+    layer_rows = [(row_key, row) for row_key, row in layer_occupancy.layer_rows(layer_key, sort_by_position = False) if row['facing'] > 1]
+    if not layer_rows:
+        return None
+
+    # 按销售额排序（从低到高）
+    double_facing_items = pd.DataFrame({'item_code': [row['item_code'] for _, row in layer_rows]})
+    sorted_items = get_sorted_items_by_sales(double_facing_items, sales_index, ascending=True)
+    for delete_item_code in sorted_items['item_code']:
+        # 减少一个facing
+        original_facing = {row_key: row['facing'] for row_key, row in layer_rows if row['item_code'] == delete_item_code}
+        for row_key, facing in original_facing.items():
+            layer_occupancy.set_facing(row_key, facing - 1)
+
+        # 检查空间是否足够
+        if calculate_layer_space(layer_key[0], layer_key[1], change_set.base, layer_occupancy) >= item_width:
+            for row_key, facing in original_facing.items():
+                change_set.set_value(row_key, 'facing', facing - 1)
+            return delete_item_code
+
+        # 如果还是不够，恢复该商品所有被减少的行，继续尝试下一个
+        for row_key, facing in original_facing.items():
+            layer_occupancy.set_facing(row_key, facing)
+    return None
+
+def get_sorted_items_by_sales(items_df, sales_index, ascending=True):
+    """
+    根据销售额（sales × qty）对商品进行排序，返回带 sales_total 列的排序结果
+    sales_index: SalesIndex（也兼容直接传入销售表），没有销售记录的商品销售额按0处理，销售额相同时保持原顺序
+    """
+    if sales_index is None:
+        return items_df.assign(sales_total = 0.0)
+    if not isinstance(sales_index, SalesIndex):
+        sales_index = SalesIndex(sales_index)
+    sorted_items = sales_index.sort_frame(items_df, 'revenue', ascending)
+    return sorted_items.assign(sales_total = sales_index.revenues(sorted_items['item_code']))
 
 # 使用示例
 if __name__ == "__main__":
     # 数据加载
-    pog_result = pd.read_csv('pog_result.csv')
-    # pog_result = pd.read_csv('test_data/pog_result_test.csv')
-    pog_test_haircare_tray_item = pd.read_csv('pog_test_haircare_tray_item.csv')
-    pog_test_haircare_test = pd.read_csv('pog_test_haircare_test.csv')
-    ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V = pd.read_csv('ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv')
-    brand_2_brand_label = pd.read_csv('brand_2_brand_label.csv')
-    sales_item_sum = pd.read_csv('sales_item_sum.csv')
+    pog_result = read_csv_cached('pog_result.csv')
+    # pog_result = read_csv_cached('test_data/pog_result_test.csv')
+    pog_test_haircare_tray_item = read_csv_cached('pog_test_haircare_tray_item.csv')
+    pog_test_haircare_test = read_csv_cached('pog_test_haircare_test.csv')
+    ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V = read_csv_cached('ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv')
+    brand_2_brand_label = read_csv_cached('brand_2_brand_label.csv')
+    sales_item_sum = read_csv_cached('sales_item_sum.csv')
     
     # 构建var_dict
     var_dict = {
@@ -566,13 +681,13 @@ if __name__ == "__main__":
     }
 
     # 读取config
-    with open('config.txt', 'r', encoding='utf-8') as file:
-        content = file.read()
-    pog_config_org = eval(content)
+    pog_config_org = PogConfig.load('config.txt')
     
     # 执行函数
     result = add_item_func(var_dict, pog_config_org)
-    plt.show()
+    if var_dict.get('render_mode', 'immediate') == 'immediate':
+        import matplotlib.pyplot as plt
+        plt.show()
     
     print(f"执行状态: {result['status']}")
     if result['status'] == 'success':
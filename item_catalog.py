@@ -0,0 +1,83 @@
+import pandas as pd
+
+
+class ItemCatalog:
+    """
+    商品属性目录
+
+    由 item_attributes、item_attributes_detail、brand_2_brand_label 三张表一次性构建，
+    之后按商品编号 O(1) 查询 width / segment / series / brand / brand_label，
+    取代 get_item_info 每次调用时对三张表做整表布尔筛选。
+    查询语义与 get_item_info 保持一致：每张表取第一条匹配记录，三张表缺任何一张的信息即视为未找到。
+    """
+
+    columns = ['item_code', 'item_name', 'width', 'segment', 'series', 'brand', 'brand_label']
+
+    def __init__(self, item_attributes, item_attributes_detail, brand_2_brand_label):
+        item_rows = item_attributes[['ITEM_NBR', 'ITEM_NAME', 'SERIES']].copy()
+        item_rows['ITEM_NBR'] = pd.to_numeric(item_rows['ITEM_NBR'], errors='coerce')
+        item_rows = item_rows.dropna(subset=['ITEM_NBR']).drop_duplicates('ITEM_NBR', keep='first')
+
+        detail_rows = item_attributes_detail[['item_idnt', 'brandname_cn', 'category_name', 'item_breadth']].copy()
+        detail_rows['item_idnt'] = pd.to_numeric(detail_rows['item_idnt'], errors='coerce')
+        detail_rows = detail_rows.dropna(subset=['item_idnt']).drop_duplicates('item_idnt', keep='first')
+
+        brand_rows = brand_2_brand_label[['brand', 'brand_label']].drop_duplicates('brand', keep='first')
+
+        catalog = item_rows.merge(detail_rows, left_on='ITEM_NBR', right_on='item_idnt', how='inner')
+        catalog = catalog.merge(brand_rows, left_on='brandname_cn', right_on='brand', how='inner')
+        catalog = pd.DataFrame({
+            'item_code': catalog['ITEM_NBR'].astype('int64'),
+            'item_name': catalog['ITEM_NAME'],
+            'width': catalog['item_breadth'] * 10,  # ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv表使用的单位为cm，需要换算
+            'segment': catalog['category_name'],
+            'series': catalog['SERIES'],
+            'brand': catalog['brand'],
+            'brand_label': catalog['brand_label']
+        })
+
+        # frame 供向量化关联使用；_items 供逐个商品 O(1) 查询
+        self.frame = catalog.set_index('item_code', drop=False).rename_axis(None)
+        self._items = {
+            row['item_code']: row
+            for row in catalog.to_dict('records')
+        }
+
+    @classmethod
+    def from_bases_data(cls, bases_data):
+        """从 var_dict['bases_data'] 构建；若其中已有构建好的 item_catalog 则直接复用"""
+        item_catalog = bases_data.get('item_catalog')
+        if item_catalog is None:
+            item_catalog = cls(
+                bases_data['item_attributes'],
+                bases_data['item_attributes_detail'],
+                bases_data['brand_2_brand_label']
+            )
+            bases_data['item_catalog'] = item_catalog
+        return item_catalog
+
+    def get(self, item_code):
+        """返回商品属性字典（与 get_item_info 的返回格式一致），未找到时返回 None"""
+        try:
+            item_info = self._items.get(int(item_code))
+        except (TypeError, ValueError):
+            return None
+        if item_info is None:
+            return None
+        item_info = dict(item_info)
+        item_info['item_code'] = item_code
+        return item_info
+
+    def __contains__(self, item_code):
+        try:
+            return int(item_code) in self._items
+        except (TypeError, ValueError):
+            return False
+
+    def __len__(self):
+        return len(self._items)
+
+    def lookup(self, item_codes, column):
+        """批量查询某一属性列，返回与 item_codes 等长的 Series，缺失项为 NaN"""
+        codes = pd.to_numeric(pd.Series(item_codes), errors='coerce')
+        return codes.map(self.frame[column])
@@ -0,0 +1,328 @@
+import time
+import heapq
+
+import numpy as np
+
+from pog_log import get_logger
+
+log = get_logger('knapsack')
+
+KNAPSACK_METHODS = ('auto', 'dp', 'bnb')
+
+# 动态规划表的规模上限（物品数 × (容量+1)）；超过时 auto 改用分支定界
+DP_MAX_CELLS = 20_000_000
+
+# knapsack_dp 的选择表每满多少行压缩一次为位图
+_DP_BLOCK_ROWS = 16
+
+_EPS = 1e-9
+
+
+def solve_knapsack(values, weights, capacity, method = 'auto', time_limit = None, node_limit = None):
+    """
+    0/1 背包：max Σ v_i x_i  s.t. Σ w_i x_i <= capacity, x_i ∈ {0, 1}
+
+    method:
+    - 'dp': 按整数毫米容量的动态规划，逐个物品对整条容量数组向量化更新，要求重量为整数
+    - 'bnb': 最优优先分支定界，上界为按价值密度贪心装入、最后一个物品按比例装入的 Dantzig 界（闭式计算，不解LP），
+      初始下界为贪心解；time_limit（秒）、node_limit（展开的节点数）用尽时返回当前最优解，optimal 为 False
+    - 'auto': 重量为整数且 物品数 × (容量+1) 不超过 DP_MAX_CELLS 时用 'dp'，否则用 'bnb'
+
+    预处理：价值不为正的物品不选；重量不为正且价值为正的物品必选；重量超过容量的物品不选；
+    全部候选都放得下时直接全选。
+
+    返回 dict:
+    selected: 与输入等长的 0/1 整数数组；value / weight: 所选物品的总价值与总重量；
+    optimal: 是否已证明最优；method: 实际使用的方法；nodes: 分支定界展开的节点数（动态规划为0）
+    """
+    if method not in KNAPSACK_METHODS:
+        raise ValueError(f'不支持的背包求解方法 {method}，可选值为 {KNAPSACK_METHODS}')
+    values = np.asarray(values, dtype = float)
+    weights = np.asarray(weights, dtype = float)
+    selected = np.zeros(len(values), dtype = int)
+
+    forced = (values > 0) & (weights <= 0)
+    selected[forced] = 1
+    candidates = np.flatnonzero((values > 0) & (weights > 0) & (weights <= capacity))
+    result = {'selected': selected, 'optimal': True, 'method': method, 'nodes': 0}
+
+    if len(candidates) == 0:
+        pass
+    elif weights[candidates].sum() <= capacity:
+        selected[candidates] = 1
+    else:
+        sub_values, sub_weights = values[candidates], weights[candidates]
+        integral = bool(np.all(sub_weights == np.floor(sub_weights)))
+        if method == 'auto':
+            method = 'dp' if integral and len(candidates) * (int(capacity) + 1) <= DP_MAX_CELLS else 'bnb'
+        if method == 'dp':
+            if not integral:
+                raise ValueError('动态规划要求重量为整数（毫米）')
+            chosen = knapsack_dp(sub_values, sub_weights.astype('int64'), int(capacity))
+            nodes, optimal = 0, True
+        else:
+            chosen, nodes, optimal = knapsack_bnb(sub_values, sub_weights, capacity, time_limit, node_limit)
+        selected[candidates[chosen]] = 1
+        result.update(method = method, nodes = nodes, optimal = optimal)
+
+    result['value'] = float(values[selected == 1].sum())
+    result['weight'] = float(weights[selected == 1].sum())
+    return result
+
+
+
+def solve_bounded_knapsack(values, weights, capacity, max_counts, decay = 1.0, method = 'auto', time_limit = None, node_limit = None):
+    """
+    有界背包：每个物品可选 0..max_counts[i] 件，第 j 件（从0计）的价值为 values[i] × decay^j
+    （decay < 1 表示边际收益递减，decay = 1 为每件价值相同）。
+
+    展开为 0/1 背包交给 solve_knapsack 求解；同一物品的各件重量相同、价值不增，
+    因此只需统计每个物品选中的件数。
+    返回 dict：counts 为每个物品选中的件数，其余字段同 solve_knapsack（不含 selected）
+    """
+    if not 0 < decay <= 1:
+        raise ValueError(f'decay 须在 (0, 1] 内，当前为 {decay}')
+    values = np.asarray(values, dtype = float)
+    weights = np.asarray(weights, dtype = float)
+    max_counts = np.maximum(np.asarray(max_counts, dtype = int), 0)
+    owner = np.repeat(np.arange(len(values)), max_counts)
+    # 每件在所属物品内的序号 0..max_counts[i]-1
+    rank = np.arange(len(owner)) - np.repeat(np.cumsum(max_counts) - max_counts, max_counts)
+
+    result = solve_knapsack(values[owner] * decay ** rank, weights[owner], capacity, method = method,
+                            time_limit = time_limit, node_limit = node_limit)
+    result['counts'] = np.bincount(owner[result.pop('selected') == 1], minlength = len(values))
+    return result
+
+
+
+def solve_multiple_knapsack(values, weights, capacities, eligible, method = 'auto', time_limit = None, node_limit = None, max_passes = 3):
+    """
+    多重背包：每个物品至多放入一个背包
+    max Σ v_i x_ib  s.t. Σ_i w_i x_ib <= capacities[b]，Σ_b x_ib <= 1，仅 eligible[i, b] 为True时 x_ib 可为1
+
+    启发式：按容量从大到小依次为每个背包精确求解 0/1 背包（solve_knapsack），候选为尚未放置且可放入该背包的物品，
+    之后最多 max_passes 轮两两改进（两个背包的物品与未放置物品合并后重新分配）；
+    上界：按 eligible 的连通分量拆分，每个分量把各背包容量合并为一个背包取 Dantzig 界（线性松弛），
+    因此 gap = (上界 - 启发式值) / 上界 给出启发式解距最优的最大差距。
+
+    返回 dict:
+    assignment: 每个物品放入的背包下标（未放置为 -1）；value: 启发式解的总价值；loads: 各背包已用容量；
+    upper_bound: 最优值上界；gap: 相对差距（上界为0时为0）；optimal: gap 是否为0
+    """
+    values = np.asarray(values, dtype = float)
+    weights = np.asarray(weights, dtype = float)
+    capacities = np.asarray(capacities, dtype = float)
+    eligible = np.asarray(eligible, dtype = bool).reshape(len(values), len(capacities))
+    assignment = np.full(len(values), -1, dtype = int)
+
+    def fill(b, candidates):
+        """背包 b 在给定候选中精确求解，返回选中的物品下标"""
+        candidates = candidates[eligible[candidates, b]]
+        if len(candidates) == 0 or capacities[b] <= 0:
+            return candidates[:0]
+        result = solve_knapsack(values[candidates], weights[candidates], capacities[b], method = method,
+                                time_limit = time_limit, node_limit = node_limit)
+        return candidates[result['selected'] == 1]
+
+    order = np.argsort(-capacities, kind = 'stable')
+    for b in order:
+        chosen = fill(b, np.flatnonzero(assignment < 0))
+        assignment[chosen] = b
+
+    # 局部改进：共享候选的两个背包，把二者已放入的与尚未放置的物品合并，按两种先后顺序重新分配，总价值提高时采用
+    pairs = [(a, b) for i, a in enumerate(order) for b in order[i + 1:] if (eligible[:, a] & eligible[:, b]).any()]
+    for _ in range(max_passes):
+        improved = False
+        for a, b in pairs:
+            pool = np.flatnonzero((assignment < 0) | (assignment == a) | (assignment == b))
+            current = values[(assignment == a) | (assignment == b)].sum()
+            for first, second in ((a, b), (b, a)):
+                chosen_first = fill(first, pool)
+                chosen_second = fill(second, np.setdiff1d(pool, chosen_first))
+                if values[chosen_first].sum() + values[chosen_second].sum() > current + _EPS:
+                    assignment[pool] = -1
+                    assignment[chosen_first] = first
+                    assignment[chosen_second] = second
+                    current = values[chosen_first].sum() + values[chosen_second].sum()
+                    improved = True
+        if not improved:
+            break
+
+    loads = np.bincount(assignment[assignment >= 0], weights = weights[assignment >= 0], minlength = len(capacities))
+    value = float(values[assignment >= 0].sum())
+    upper_bound = 0.0
+    for items, bins in _eligible_components(eligible):
+        upper_bound += dantzig_bound(values[items], weights[items], capacities[bins].sum())
+    upper_bound = max(upper_bound, value)
+    gap = (upper_bound - value) / upper_bound if upper_bound > 0 else 0.0
+    return {'assignment': assignment, 'value': value, 'loads': loads, 'upper_bound': upper_bound,
+            'gap': gap, 'optimal': gap <= _EPS}
+
+
+def dantzig_bound(values, weights, capacity):
+    """0/1 背包线性松弛的最优值：价值为正的物品按价值密度降序整件装入，第一件装不下的按比例装入"""
+    values = np.asarray(values, dtype = float)
+    weights = np.asarray(weights, dtype = float)
+    keep = values > 0
+    values, weights = values[keep], weights[keep]
+    free = weights <= 0
+    bound = values[free].sum()
+    values, weights = values[~free], weights[~free]
+    if len(values) == 0 or capacity <= 0:
+        return float(bound)
+    order = np.argsort(-(values / weights), kind = 'stable')
+    prefix_weights = np.cumsum(weights[order])
+    prefix_values = np.cumsum(values[order])
+    full = int(np.searchsorted(prefix_weights, capacity + _EPS, side = 'right'))
+    if full > 0:
+        bound += prefix_values[full - 1]
+    if full < len(order):
+        used = prefix_weights[full - 1] if full > 0 else 0.0
+        last = order[full]
+        bound += (capacity - used) * values[last] / weights[last]
+    return float(bound)
+
+
+def _eligible_components(eligible):
+    """eligible（物品 × 背包）二部图的连通分量，逐个返回 (物品下标数组, 背包下标数组)；不可放入任何背包的物品忽略"""
+    n_items, n_bins = eligible.shape
+    bin_component = np.full(n_bins, -1, dtype = int)
+    component = 0
+    for start in range(n_bins):
+        if bin_component[start] >= 0:
+            continue
+        bin_component[start] = component
+        stack = [start]
+        while stack:
+            b = stack.pop()
+            items = np.flatnonzero(eligible[:, b])
+            for other in np.flatnonzero(eligible[items].any(axis = 0) & (bin_component < 0)):
+                bin_component[other] = component
+                stack.append(other)
+        component += 1
+    for c in range(component):
+        bins = np.flatnonzero(bin_component == c)
+        items = np.flatnonzero(eligible[:, bins].any(axis = 1))
+        if len(items):
+            yield items, bins
+
+
+def knapsack_dp(values, weights, capacity):
+    """
+    整数容量的 0/1 背包动态规划，返回所选物品的下标数组（升序）
+
+    dp[c] 为容量 c 下的最大价值；每个物品用整条数组一次向量化更新：
+    dp[w:] = max(dp[w:], dp[:-w] + v)（右侧先算出新数组，因此每个物品只用一次），仅在严格更优时选入。
+    价值不为正（从不严格更优）或放不下的物品不参与扫描；其余物品全部放得下时直接全选，结果与逐格循环一致。
+    每个物品只做加、比较、取大三次原地运算（预分配缓冲区）；各物品在各容量下是否选入先写入 _DP_BLOCK_ROWS 行一块的布尔表，
+    每满一块用一次 np.packbits 压缩为位图，选择表只占 n × ⌈(容量+1)/8⌉ 字节；最后从满容量回溯
+    """
+    values = np.asarray(values, dtype = float)
+    weights = np.asarray(weights, dtype = np.int64)
+    items = np.flatnonzero((values > 0) & (weights <= capacity))
+    if capacity < 0 or len(items) == 0:
+        return np.zeros(0, dtype = int)
+    if weights[items].sum() <= capacity:
+        return items
+
+    n = len(items)
+    item_values = values[items].tolist()
+    item_weights = weights[items].tolist()
+    dp = np.zeros(capacity + 1)
+    candidate = np.empty(capacity + 1)
+    block = np.zeros((min(n, _DP_BLOCK_ROWS), capacity + 1), dtype = bool)
+    rows = list(block)
+    take = np.empty((n, (capacity + 8) // 8), dtype = np.uint8)
+    for start in range(0, n, _DP_BLOCK_ROWS):
+        stop = min(start + _DP_BLOCK_ROWS, n)
+        if start:
+            block[:] = False
+        for row, weight, value in zip(rows, item_weights[start:stop], item_values[start:stop]):
+            low, high = candidate[:capacity + 1 - weight], dp[weight:]
+            np.add(dp[:capacity + 1 - weight], value, out = low)
+            np.greater(low, high, out = row[weight:])
+            np.maximum(high, low, out = high)
+        take[start:stop] = np.packbits(block[:stop - start], axis = 1)
+
+    # 回溯：位图转为 bytes 后按下标取字节，避免逐个读取 numpy 标量
+    bits, stride = take.tobytes(), take.shape[1]
+    chosen = []
+    remaining = capacity
+    for i in range(n - 1, -1, -1):
+        if bits[i * stride + (remaining >> 3)] >> (7 - (remaining & 7)) & 1:
+            chosen.append(i)
+            remaining -= item_weights[i]
+    return items[chosen[::-1]]
+
+
+def knapsack_bnb(values, weights, capacity, time_limit = None, node_limit = None):
+    """
+    最优优先分支定界，返回 (所选下标数组, 展开的节点数, 是否证明最优)
+
+    物品按价值密度降序排列，依次决定选或不选；节点上界为 Dantzig 界：
+    剩余容量内按密度顺序整件装入，第一件装不下的按比例装入（前缀和 + 二分查找，O(log n)）。
+    每次取上界最大的节点展开，上界不超过当前最优时即证明最优
+    """
+    n = len(values)
+    order = np.argsort(-(values / weights), kind = 'stable')
+    sorted_values = values[order]
+    sorted_weights = weights[order]
+    prefix_values = np.r_[0.0, np.cumsum(sorted_values)]
+    prefix_weights = np.r_[0.0, np.cumsum(sorted_weights)]
+
+    def upper_bound(level, value, weight):
+        remaining = capacity - weight
+        # 从 level 起整件装入的最远位置
+        last = int(np.searchsorted(prefix_weights, prefix_weights[level] + remaining + _EPS, side = 'right')) - 1
+        last = max(last, level)
+        bound = value + prefix_values[last] - prefix_values[level]
+        if last < n:
+            bound += (remaining - (prefix_weights[last] - prefix_weights[level])) * sorted_values[last] / sorted_weights[last]
+        return bound
+
+    # 初始下界：按密度顺序贪心装入（装不下的跳过）
+    best_value, best_mask, used = 0.0, 0, 0.0
+    for i in range(n):
+        if used + sorted_weights[i] <= capacity:
+            used += sorted_weights[i]
+            best_value += sorted_values[i]
+            best_mask |= 1 << i
+
+    start = time.perf_counter()
+    nodes = 0
+    counter = 0
+    optimal = True
+    heap = [(-upper_bound(0, 0.0, 0.0), counter, 0, 0.0, 0.0, 0)]
+    while heap:
+        neg_bound, _, level, value, weight, mask = heapq.heappop(heap)
+        if -neg_bound <= best_value + _EPS:
+            break
+        if (node_limit is not None and nodes >= node_limit) or (time_limit is not None and time.perf_counter() - start > time_limit):
+            optimal = False
+            log.warning("背包分支定界达到预算（节点 {nodes}，耗时 {seconds:.3f}s），返回当前最优解", nodes=nodes, seconds=time.perf_counter() - start)
+            break
+        nodes += 1
+        if level >= n:
+            continue
+
+        # 选入第 level 件
+        item_weight = sorted_weights[level]
+        if weight + item_weight <= capacity + _EPS:
+            take_value = value + sorted_values[level]
+            take_mask = mask | (1 << level)
+            if take_value > best_value + _EPS:
+                best_value, best_mask = take_value, take_mask
+            bound = upper_bound(level + 1, take_value, weight + item_weight)
+            if bound > best_value + _EPS:
+                counter += 1
+                heapq.heappush(heap, (-bound, counter, level + 1, take_value, weight + item_weight, take_mask))
+
+        # 不选第 level 件
+        bound = upper_bound(level + 1, value, weight)
+        if bound > best_value + _EPS:
+            counter += 1
+            heapq.heappush(heap, (-bound, counter, level + 1, value, weight, mask))
+
+    chosen = np.sort(order[[i for i in range(n) if best_mask >> i & 1]])
+    return chosen, nodes, optimal
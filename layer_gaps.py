@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+
+# compute_layer_gaps 输出的列
+GAP_COLUMNS = ['module_id', 'layer_id', 'item_count', 'module_width', 'used_width',
+               'head_gap', 'inner_gap', 'tail_gap', 'total_space', 'largest_gap', 'largest_gap_start']
+
+
+def layer_gap_arrays(layer_codes, positions, widths, layer_widths):
+    """
+    向量化计算各层空隙
+
+    参数（与行一一对应的数组）:
+    layer_codes: 层编号（0..n_layers-1 的整数）
+    positions: 起始位置
+    widths: 占用宽度（一般为 item_width × facing）
+    layer_widths: 所在层的层宽
+
+    返回 dict，数组均按层编号索引:
+    item_count / used_width / head_gap / inner_gap / tail_gap / total_space / largest_gap / largest_gap_start
+
+    空隙口径：层内按 position 排序，开头空隙 = 第一行 position，商品间空隙 = 本行起点 - 之前各行的最远终点，
+    结尾空隙 = 层宽 - 最远终点；负值（重叠或超出）按0计。
+    取之前各行的最远终点而不是前一行的终点，使重叠商品（如同一position的两行）的结果与行顺序无关
+    """
+    layer_codes = np.asarray(layer_codes)
+    n_layers = int(layer_codes.max()) + 1 if len(layer_codes) > 0 else 0
+    positions = np.asarray(positions, dtype=float)
+    widths = np.asarray(widths, dtype=float)
+    layer_widths = np.asarray(layer_widths, dtype=float)
+
+    order = np.lexsort((positions, layer_codes))
+    codes, starts = layer_codes[order], positions[order]
+    ends = starts + widths[order]
+    first = np.r_[True, codes[1:] != codes[:-1]] if len(codes) > 0 else np.zeros(0, dtype=bool)
+    last = np.r_[codes[1:] != codes[:-1], True] if len(codes) > 0 else np.zeros(0, dtype=bool)
+
+    # 每行之前的空隙：段首为开头空隙，其余为与之前各行最远终点之间的空隙
+    reach = pd.Series(ends).groupby(codes).cummax().to_numpy() if len(codes) > 0 else ends
+    gap_start = np.where(first, 0.0, np.r_[0.0, reach[:-1]])
+    gap_before = np.maximum(starts - gap_start, 0)
+    tail_start = reach[last]
+    tail_gap = np.maximum(layer_widths[order][last] - tail_start, 0)
+
+    item_count = np.bincount(codes, minlength=n_layers)
+    used_width = np.bincount(codes, weights=widths[order], minlength=n_layers)
+    head_gap = np.zeros(n_layers)
+    head_gap[codes[first]] = gap_before[first]
+    inner_gap = np.bincount(codes, weights=np.where(first, 0.0, gap_before), minlength=n_layers)
+    tail = np.zeros(n_layers)
+    tail[codes[last]] = tail_gap
+
+    # 最大连续空隙：行前空隙与结尾空隙中取最大，并记录其起点
+    largest_gap = np.zeros(n_layers)
+    largest_gap_start = np.zeros(n_layers)
+    if len(codes) > 0:
+        candidate_codes = np.r_[codes, codes[last]]
+        candidate_gaps = np.r_[gap_before, tail_gap]
+        candidate_starts = np.r_[gap_start, tail_start]
+        # 按 (层, 空隙从大到小) 排序后每层取第一个；空隙相同时取靠前的
+        best = np.lexsort((candidate_starts, -candidate_gaps, candidate_codes))
+        best_first = np.r_[True, candidate_codes[best][1:] != candidate_codes[best][:-1]]
+        best = best[best_first]
+        largest_gap[candidate_codes[best]] = candidate_gaps[best]
+        largest_gap_start[candidate_codes[best]] = candidate_starts[best]
+
+    return {
+        'item_count': item_count,
+        'used_width': used_width,
+        'head_gap': head_gap,
+        'inner_gap': inner_gap,
+        'tail_gap': tail,
+        'total_space': head_gap + inner_gap + tail,
+        'largest_gap': largest_gap,
+        'largest_gap_start': largest_gap_start
+    }
+
+
+def compute_layer_gaps(pog_data, width_col='module_width', default_width=1000, use_facing=True, exclude_mask=None):
+    """
+    一次性计算整张pog_data每一层的空隙汇总，返回以 (module_id, layer_id) 为索引的DataFrame（列见 GAP_COLUMNS）
+
+    参数:
+    width_col: 层宽所在列，每层取第一行的值，缺失时用 default_width
+    use_facing: True 时一行占用 item_width × facing
+    exclude_mask: 与pog_data等长的布尔数组，为True的行不参与计算（例如互换时排除待移出的商品）
+    """
+    frame = pog_data if exclude_mask is None else pog_data[~np.asarray(exclude_mask, dtype=bool)]
+    if frame.empty:
+        return pd.DataFrame(columns=GAP_COLUMNS).set_index(['module_id', 'layer_id'])
+
+    layer_index = pd.MultiIndex.from_arrays([frame['module_id'].to_numpy(), frame['layer_id'].to_numpy()], names=['module_id', 'layer_id'])
+    layer_codes, layer_keys = pd.factorize(layer_index)
+    widths = frame['item_width'].to_numpy(dtype=float)
+    if use_facing and 'facing' in frame.columns:
+        widths = widths * frame['facing'].to_numpy(dtype=float)
+    if width_col in frame.columns:
+        row_widths = pd.to_numeric(frame[width_col], errors='coerce').to_numpy(dtype=float)
+        _, first_rows = np.unique(layer_codes, return_index=True)
+        layer_widths = row_widths[first_rows]
+        layer_widths = np.where(np.isnan(layer_widths), default_width, layer_widths)
+    else:
+        layer_widths = np.full(len(layer_keys), float(default_width))
+
+    gaps = layer_gap_arrays(layer_codes, frame['position'].to_numpy(dtype=float), widths, layer_widths[layer_codes])
+    result = pd.DataFrame(gaps, index=layer_keys)
+    result.insert(1, 'module_width', layer_widths)
+    return result[GAP_COLUMNS[2:]]
@@ -0,0 +1,208 @@
+import pandas as pd
+
+
+class LayerOccupancy:
+    """
+    货架层占用索引
+
+    以 (module_id, layer_id) 为键，维护每层的 module_width、已用宽度（item_width × facing）、
+    商品数量以及空隙信息。新增、删除、互换、调整facing时只更新受影响的层，O(1) 完成，
+    各场景函数查询层空间时不再需要对整个pog_data做筛选。
+
+    行以 row_key（通常为pog_data的行索引）标识，每行记录 layer_key、item_code、item_width、facing、position。
+    use_facing=False 时每行只按一个 item_width 计宽（删除/补位流程中一行即一个陈列单元）。
+    """
+
+    summary_columns = ['module_id', 'layer_id', 'item_count', 'used_width', 'total_width', 'remaining_width']
+
+    def __init__(self, use_facing=True, default_module_width=1000):
+        self.use_facing = use_facing
+        self.default_module_width = default_module_width
+        self._layers = {}   # layer_key -> {'module_width', 'used_width', 'item_count', 'rows'}
+        self._rows = {}     # row_key -> {'layer_key', 'item_code', 'item_width', 'facing', 'position'}
+        self._gap_cache = {}
+
+    @classmethod
+    def from_frame(cls, pog_data, use_facing=True, total_width=None, default_module_width=1000):
+        """
+        由pog_data一次性构建索引
+        total_width: 若指定，则所有层统一使用该宽度；否则取每层第一行的 module_width
+        """
+        occupancy = cls(use_facing=use_facing, default_module_width=default_module_width)
+        if pog_data is None or pog_data.empty:
+            return occupancy
+
+        n = len(pog_data)
+        item_codes = pog_data['item_code'].to_numpy()
+        module_ids = pog_data['module_id'].to_numpy()
+        layer_ids = pog_data['layer_id'].to_numpy()
+        item_widths = pog_data['item_width'].to_numpy()
+        facings = pog_data['facing'].to_numpy() if 'facing' in pog_data.columns else [1] * n
+        positions = pog_data['position'].to_numpy() if 'position' in pog_data.columns else [None] * n
+        if total_width is not None:
+            module_widths = [total_width] * n
+        elif 'module_width' in pog_data.columns:
+            module_widths = pog_data['module_width'].to_numpy()
+        else:
+            module_widths = [default_module_width] * n
+
+        for row_key, item_code, module_id, layer_id, item_width, facing, position, module_width in zip(
+                pog_data.index, item_codes, module_ids, layer_ids, item_widths, facings, positions, module_widths):
+            layer_key = (module_id, layer_id)
+            if layer_key not in occupancy._layers:
+                occupancy._layers[layer_key] = occupancy._new_layer(module_width)
+            occupancy.add_item(layer_key, row_key, item_code, item_width, facing, position)
+        return occupancy
+
+    def _new_layer(self, module_width=None):
+        return {
+            'module_width': self.default_module_width if module_width is None else module_width,
+            'used_width': 0,
+            'item_count': 0,
+            'rows': {}      # 用dict保持行的插入顺序
+        }
+
+    def _row_width(self, row):
+        if self.use_facing:
+            return row['item_width'] * row['facing']
+        return row['item_width']
+
+    def _layer(self, layer_key):
+        if layer_key not in self._layers:
+            self._layers[layer_key] = self._new_layer()
+        return self._layers[layer_key]
+
+    # ---------------- 增量更新 ----------------
+    def add_item(self, layer_key, row_key, item_code, item_width, facing=1, position=None):
+        """向某层新增一行商品"""
+        if row_key in self._rows:
+            raise KeyError(f'行 {row_key} 已存在于占用索引中')
+        row = {
+            'layer_key': layer_key,
+            'item_code': item_code,
+            'item_width': item_width,
+            'facing': facing,
+            'position': position
+        }
+        layer = self._layer(layer_key)
+        self._rows[row_key] = row
+        layer['rows'][row_key] = None
+        layer['used_width'] += self._row_width(row)
+        layer['item_count'] += 1
+        self._gap_cache.pop(layer_key, None)
+
+    def remove_item(self, row_key):
+        """删除一行商品，返回被删除行的记录"""
+        row = self._rows.pop(row_key)
+        layer = self._layers[row['layer_key']]
+        layer['rows'].pop(row_key, None)
+        layer['used_width'] -= self._row_width(row)
+        layer['item_count'] -= 1
+        self._gap_cache.pop(row['layer_key'], None)
+        return row
+
+    def update_item(self, row_key, **fields):
+        """更新一行商品的 item_width / facing / position"""
+        row = self._rows[row_key]
+        layer = self._layers[row['layer_key']]
+        layer['used_width'] -= self._row_width(row)
+        for field, value in fields.items():
+            if field not in ('item_width', 'facing', 'position', 'item_code'):
+                raise KeyError(f'不支持更新字段 {field}')
+            row[field] = value
+        layer['used_width'] += self._row_width(row)
+        self._gap_cache.pop(row['layer_key'], None)
+
+    def set_facing(self, row_key, facing):
+        self.update_item(row_key, facing=facing)
+
+    def move_item(self, row_key, layer_key, position=None):
+        """把一行商品移到另一层（position为None时保持原位置）"""
+        row = self.remove_item(row_key)
+        if position is None:
+            position = row['position']
+        self.add_item(layer_key, row_key, row['item_code'], row['item_width'], row['facing'], position)
+
+    def swap_items(self, row_key1, row_key2):
+        """互换两行商品所在的层和位置"""
+        row1 = self._rows[row_key1]
+        row2 = self._rows[row_key2]
+        layer_key1, position1 = row1['layer_key'], row1['position']
+        layer_key2, position2 = row2['layer_key'], row2['position']
+        self.move_item(row_key1, layer_key2, position2)
+        self.move_item(row_key2, layer_key1, position1)
+
+    # ---------------- 查询 ----------------
+    def __contains__(self, layer_key):
+        return layer_key in self._layers
+
+    def layer_keys(self):
+        return list(self._layers.keys())
+
+    def layer_of(self, row_key):
+        """某行当前所在的层，行不存在时返回None"""
+        row = self._rows.get(row_key)
+        return None if row is None else row['layer_key']
+
+    def module_width(self, layer_key):
+        layer = self._layers.get(layer_key)
+        return self.default_module_width if layer is None else layer['module_width']
+
+    def used_width(self, layer_key):
+        layer = self._layers.get(layer_key)
+        return 0 if layer is None else layer['used_width']
+
+    def item_count(self, layer_key):
+        layer = self._layers.get(layer_key)
+        return 0 if layer is None else layer['item_count']
+
+    def remaining_width(self, layer_key):
+        """层剩余宽度 = module_width - 已用宽度"""
+        return self.module_width(layer_key) - self.used_width(layer_key)
+
+    def layer_rows(self, layer_key, sort_by_position=True):
+        """返回某层各行记录（默认按position升序，position相同时保持加入顺序；否则按加入顺序），元素为 (row_key, row)"""
+        layer = self._layers.get(layer_key)
+        if layer is None:
+            return []
+        rows = [(row_key, self._rows[row_key]) for row_key in layer['rows']]
+        if not sort_by_position:
+            return rows
+        rows.sort(key=lambda x: (x[1]['position'] is None, x[1]['position'] if x[1]['position'] is not None else 0))
+        return rows
+
+    def free_gaps(self, layer_key):
+        """
+        返回某层的空隙列表 [(起点, 宽度), ...]，包含开头、商品间与结尾的正空隙
+        结果按层缓存，该层发生更新时失效
+        """
+        if layer_key not in self._gap_cache:
+            gaps = []
+            current_end = 0
+            for _, row in self.layer_rows(layer_key):
+                if row['position'] is None:
+                    continue
+                if row['position'] > current_end:
+                    gaps.append((current_end, row['position'] - current_end))
+                current_end = max(current_end, row['position'] + self._row_width(row))
+            module_width = self.module_width(layer_key)
+            if current_end < module_width:
+                gaps.append((current_end, module_width - current_end))
+            self._gap_cache[layer_key] = gaps
+        return self._gap_cache[layer_key]
+
+    def summary(self):
+        """以DataFrame形式返回各层空间汇总（与各模块 analyze_layer_space 的输出列一致）"""
+        records = [
+            {
+                'module_id': layer_key[0],
+                'layer_id': layer_key[1],
+                'item_count': layer['item_count'],
+                'used_width': layer['used_width'],
+                'total_width': layer['module_width'],
+                'remaining_width': layer['module_width'] - layer['used_width']
+            }
+            for layer_key, layer in self._layers.items()
+        ]
+        summary = pd.DataFrame(records, columns=self.summary_columns)
+        return summary.sort_values(['module_id', 'layer_id']).reset_index(drop=True)
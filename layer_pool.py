@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from knapsack import knapsack_dp, solve_bounded_knapsack
+
+
+def resolve_workers(workers, task_count):
+    """实际使用的进程数：None 或 0 为CPU核数，且不超过任务数"""
+    if not workers:
+        workers = os.cpu_count() or 1
+    return max(1, min(int(workers), task_count))
+
+
+def run_layer_tasks(solver, arrays, tasks, workers = 1):
+    """
+    逐层求解的并行调度：solver(arrays, task) 对一层求解，返回值按 tasks 的顺序排列（与进程调度无关，结果确定）。
+
+    arrays 为 {名称: numpy数组}，各层的输入拼接在这些数组里，task 中只带本层的切片范围与参数；
+    workers > 1 时数组一次性写入共享内存，子进程启动时映射为只读视图，不再为每个任务pickle层数据。
+    workers 为 1（或只有一个任务）时在当前进程内顺序执行。
+    solver 须为可按模块导入的顶层函数（spawn 方式启动的子进程按名称导入）。
+    """
+    tasks = list(tasks)
+    workers = resolve_workers(workers, len(tasks))
+    if workers <= 1:
+        return [solver(arrays, task) for task in tasks]
+
+    blocks = []
+    specs = {}
+    try:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+            blocks.append(block)
+            np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf)[...] = array
+            specs[name] = (block.name, array.shape, array.dtype.str)
+        with ProcessPoolExecutor(max_workers = workers, initializer = _attach_shared, initargs = (specs,)) as pool:
+            chunksize = max(1, len(tasks) // (workers * 4))
+            return list(pool.map(_run_task, [solver] * len(tasks), tasks, chunksize = chunksize))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+# 子进程内共享内存映射出的数组，及保持映射有效的 SharedMemory 对象
+_SHARED_ARRAYS = {}
+_SHARED_BLOCKS = []
+
+
+def _attach_shared(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name = block_name)
+        _SHARED_BLOCKS.append(block)
+        array = np.ndarray(shape, dtype = np.dtype(dtype), buffer = block.buf)
+        array.flags.writeable = False
+        _SHARED_ARRAYS[name] = array
+
+
+def _run_task(solver, task):
+    return solver(_SHARED_ARRAYS, task)
+
+
+# ---------------- 各删除流程的单层求解 ----------------
+def first_fit_layer(arrays, task):
+    """delete.py：按销量降序排列的本层商品中，第一个放得下的下标（本层切片内），没有则为 -1"""
+    start, end, remaining = task
+    fits = np.flatnonzero(arrays['widths'][start:end] <= remaining)
+    return int(fits[0]) if len(fits) else -1
+
+
+def knapsack_01_layer(arrays, task):
+    """01delete.py：本层候选的 0/1 背包，返回选中的下标数组（本层切片内）"""
+    start, end, capacity = task
+    if end <= start or capacity <= 0:
+        return np.zeros(0, dtype = int)
+    return knapsack_dp(arrays['values'][start:end], arrays['weights'][start:end], capacity)
+
+
+def bounded_knapsack_layer(arrays, task):
+    """IP.py：本层候选的有界背包（第 i 个 SKU 至多 max_counts[i] 个新增 facing），返回 solve_bounded_knapsack 的结果"""
+    start, end, capacity, options = task
+    return solve_bounded_knapsack(arrays['values'][start:end], arrays['weights'][start:end], capacity, arrays['max_counts'][start:end],
+                                  decay = options['decay'], method = options['method'],
+                                  time_limit = options['time_limit'], node_limit = options['node_limit'])
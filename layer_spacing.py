@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+
+# 可选的间距规则：
+# - 'even_split'        两端贴边，层内剩余空间在商品间均分，余数部分前若干个间隙向上取整、其余向下取整（新增商品场景）
+# - 'justify'           两端贴边，层内剩余空间在商品间按浮点均分（移除托盘场景）
+# - 'edge_margin'       两端留空，剩余空间按 商品数+1 个间隙浮点均分（删除商品场景）
+# - 'edge_margin_floor' 同 edge_margin，但间距向下取整为整数（IP 删除场景）
+# - 'fixed_interval'    从层起点开始按固定间隔 interval 依次紧排（商品互换场景）
+RESPACING_RULES = ('even_split', 'justify', 'edge_margin', 'edge_margin_floor', 'fixed_interval')
+
+
+def respace_layers(pog_data, rule = 'even_split', layer_keys = None, fixed_mask = None, total_width = None,
+                   width_col = 'module_width', default_width = 1000, interval = 5, use_facing = True, sort_by_position = True):
+    """
+    整店向量化重排：一次性为所有（或指定）层的每一行计算新的 position，返回新的DataFrame
+
+    参数:
+    pog_data: 至少包含 module_id、layer_id、position、item_width 列
+    rule: 间距规则，见 RESPACING_RULES
+    layer_keys: 只重排这些 (module_id, layer_id) 层，None 表示全部层
+    fixed_mask: 与pog_data等长的布尔数组，为True的行保持原position不动（托盘及其前方商品等固定位置商品）。
+                固定商品把层切成若干段，每段内的非固定商品在 [前一个固定商品右端, 后一个固定商品左端] 区间内按规则重排，
+                与固定商品相邻的一侧视为有间隙
+    total_width: 所有层统一使用的层宽；None 时取每层第一行的 width_col 列（默认 module_width），缺失时用 default_width
+    interval: fixed_interval 规则下的间隔
+    use_facing: True 时一行占用 item_width × facing，否则只按 item_width 计
+    sort_by_position: True 时层内按原 position 排序（相同时保持行顺序），否则直接按行顺序
+    """
+    if rule not in RESPACING_RULES:
+        raise ValueError(f'不支持的间距规则 {rule}，可选值为 {RESPACING_RULES}')
+
+    new_pog_data = pog_data.copy()
+    if new_pog_data.empty:
+        return new_pog_data
+
+    layer_index = pd.MultiIndex.from_arrays([new_pog_data['module_id'].to_numpy(), new_pog_data['layer_id'].to_numpy()])
+    selected = np.ones(len(new_pog_data), dtype = bool) if layer_keys is None else layer_index.isin(list(layer_keys))
+    rows = np.flatnonzero(selected)
+    if len(rows) == 0:
+        return new_pog_data
+
+    # 各行的层编号、占用宽度、原位置、层宽
+    layer_codes = pd.factorize(layer_index[rows])[0]
+    widths = new_pog_data['item_width'].to_numpy()[rows]
+    if use_facing and 'facing' in new_pog_data.columns:
+        widths = widths * new_pog_data['facing'].to_numpy()[rows]
+    positions = new_pog_data['position'].to_numpy()[rows]
+    fixed = np.zeros(len(rows), dtype = bool) if fixed_mask is None else np.asarray(fixed_mask, dtype = bool)[rows]
+    if total_width is not None:
+        layer_widths = np.full(len(rows), total_width)
+    else:
+        # 每层取行顺序中第一行的层宽
+        if width_col in new_pog_data.columns:
+            row_widths = pd.to_numeric(new_pog_data[width_col], errors = 'coerce').to_numpy(dtype = float)[rows]
+        else:
+            row_widths = np.full(len(rows), np.nan)
+        _, first_rows = np.unique(layer_codes, return_index = True)
+        layer_widths = row_widths[first_rows][layer_codes]
+        layer_widths = np.where(np.isnan(layer_widths), default_width, layer_widths)
+
+    # 层内排序
+    if sort_by_position:
+        order = np.lexsort((positions, layer_codes))
+    else:
+        order = np.argsort(layer_codes, kind = 'stable')
+    rows, layer_codes, widths, positions, fixed, layer_widths = (
+        rows[order], layer_codes[order], widths[order], positions[order], fixed[order], layer_widths[order]
+    )
+
+    # 每行前后最近的固定商品（同一层内）
+    ordinal = pd.Series(np.where(fixed, np.arange(len(rows)), np.nan))
+    prev_fixed = ordinal.groupby(layer_codes).ffill().to_numpy()
+    next_fixed = ordinal.groupby(layer_codes).bfill().to_numpy()
+
+    movable = ~fixed
+    if not movable.any():
+        return new_pog_data
+    prev_fixed, next_fixed = prev_fixed[movable], next_fixed[movable]
+    has_prev, has_next = ~np.isnan(prev_fixed), ~np.isnan(next_fixed)
+    prev_idx = np.where(has_prev, prev_fixed, 0).astype(int)
+    next_idx = np.where(has_next, next_fixed, 0).astype(int)
+    span_start = np.where(has_prev, positions[prev_idx] + widths[prev_idx], 0)
+    span_end = np.where(has_next, positions[next_idx], layer_widths[movable])
+
+    # 以 (层, 前一个固定商品) 划分段，段内各行的序号、段内商品数及总宽
+    move_widths = widths[movable]
+    segments = pd.factorize(pd.MultiIndex.from_arrays([layer_codes[movable], np.where(has_prev, prev_fixed, -1)]))[0]
+    segment_series = pd.Series(move_widths).groupby(segments)
+    seq = segment_series.cumcount().to_numpy()
+    item_cnt = segment_series.transform('size').to_numpy()
+    free_space = span_end - span_start - segment_series.transform('sum').to_numpy()
+
+    # 每段首尾是否留间隙
+    if rule in ('edge_margin', 'edge_margin_floor'):
+        lead = np.ones(len(seq), dtype = int)
+        tail = np.ones(len(seq), dtype = int)
+    else:
+        lead = has_prev.astype(int)
+        tail = has_next.astype(int)
+    gap_cnt = item_cnt - 1 + lead + tail
+
+    # gap_before: 该行之前的间隙；gap_after: 该行之后的间隙
+    if rule == 'fixed_interval':
+        gap_before = np.where(seq == 0, np.where(has_prev, interval, 0), interval)
+        gap_after = np.full(len(seq), interval)
+    elif rule == 'even_split':
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            avg_gap = np.where(gap_cnt > 0, free_space / np.maximum(gap_cnt, 1), 0)
+            ceil_cnt = np.where(gap_cnt > 0, np.mod(free_space, np.maximum(gap_cnt, 1)), 0).astype(int)   # 向上取整的空隙数量
+        gap_no = seq + lead
+        gap_before = np.where(gap_no - 1 < ceil_cnt, np.ceil(avg_gap), np.floor(avg_gap))
+        gap_after = np.where(gap_no < ceil_cnt, np.ceil(avg_gap), np.floor(avg_gap))
+        gap_before = np.where(seq == 0, np.where(lead > 0, gap_before, 0), gap_before)
+    else:
+        spacing = np.where(gap_cnt > 0, free_space / np.maximum(gap_cnt, 1), 0)
+        if rule == 'edge_margin_floor':
+            spacing = np.floor(spacing)
+        gap_before = np.where(seq == 0, spacing * lead, spacing)
+        gap_after = spacing
+
+    # 段首行的增量为起点，其余行的增量为前一行宽度 + 间隙，段内顺序累加
+    increments = np.full(len(seq), np.nan)
+    first = seq == 0
+    increments[first] = span_start[first] + gap_before[first]
+    increments[~first] = move_widths[:-1][~first[1:]] + gap_after[:-1][~first[1:]]
+    new_positions = pd.Series(increments).groupby(segments).cumsum().to_numpy()
+
+    position_col = new_pog_data.columns.get_loc('position')
+    if pd.api.types.is_integer_dtype(new_pog_data['position']) and np.all(np.mod(new_positions, 1) == 0):
+        new_positions = new_positions.astype(new_pog_data['position'].dtype)
+    elif rule == 'edge_margin_floor':
+        new_positions = new_positions.astype(int)
+    else:
+        new_pog_data['position'] = new_pog_data['position'].astype(float)
+    new_pog_data.iloc[rows[movable], position_col] = new_positions
+    return new_pog_data
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+
+class PogChangeSet:
+    """
+    pog_data 变更集
+
+    编辑过程中不再复制整张pog_data，只记录三类变更：新增行、删除行、逐行字段更新；
+    读取时在原表之上叠加这些变更，全部编辑完成后调用 apply() 一次性生成新的pog_data。
+    每次编辑的时间和内存只与被改动的行数有关，与pog_data的大小无关。
+
+    行以标签（原表的行索引）标识，新增行的标签从原表最大索引+1开始依次分配。
+    """
+
+    def __init__(self, pog_data):
+        self.base = pog_data
+        self.inserted = {}    # label -> 行字典（按新增顺序）
+        self.deleted = set()
+        self.updates = {}     # label -> {field: value}
+        self._next_label = int(pog_data.index.max()) + 1 if not pog_data.empty else 0
+
+    # ---------------- 记录变更 ----------------
+    def insert_row(self, row):
+        """新增一行，返回分配的行标签"""
+        label = self._next_label
+        self._next_label += 1
+        self.inserted[label] = dict(row)
+        return label
+
+    def delete_row(self, label):
+        if label in self.inserted:
+            del self.inserted[label]
+        else:
+            self.deleted.add(label)
+            self.updates.pop(label, None)
+
+    def set_value(self, label, field, value):
+        if label in self.inserted:
+            self.inserted[label][field] = value
+        else:
+            self.updates.setdefault(label, {})[field] = value
+
+    def set_values(self, labels, field, values):
+        for label, value in zip(labels, values):
+            self.set_value(label, field, value)
+
+    # ---------------- 读取（叠加变更后的当前状态） ----------------
+    def get_value(self, label, field):
+        if label in self.inserted:
+            return self.inserted[label][field]
+        row_updates = self.updates.get(label)
+        if row_updates is not None and field in row_updates:
+            return row_updates[field]
+        return self.base.at[label, field]
+
+    def rows(self, labels, columns = None):
+        """按给定顺序取出若干行的当前状态（DataFrame，索引为行标签）"""
+        labels = list(labels)
+        base_labels = [label for label in labels if label not in self.inserted]
+        frame = self.base.loc[base_labels] if columns is None else self.base.loc[base_labels, columns]
+        frame = _overlay_updates(frame.copy(), {label: self.updates[label] for label in base_labels if label in self.updates})
+        inserted_labels = [label for label in labels if label in self.inserted]
+        if inserted_labels:
+            inserted_frame = pd.DataFrame([self.inserted[label] for label in inserted_labels], index = inserted_labels)
+            if columns is not None:
+                inserted_frame = inserted_frame.reindex(columns = columns)
+            frame = pd.concat([frame, inserted_frame]) if not frame.empty else inserted_frame
+        return frame.loc[labels]
+
+    def find_rows(self, field, value):
+        """返回当前状态下 field == value 的所有行标签（原表向量化比较，不复制）"""
+        matched = set(self.base.index[self.base[field].to_numpy() == value]) - self.deleted
+        for label, row_updates in self.updates.items():
+            if field in row_updates:
+                if row_updates[field] == value:
+                    matched.add(label)
+                else:
+                    matched.discard(label)
+        labels = list(self.base.index[self.base.index.isin(list(matched))]) if matched else []
+        labels += [label for label, row in self.inserted.items() if row.get(field) == value]
+        return labels
+
+    def __len__(self):
+        return len(self.inserted) + len(self.deleted) + len(self.updates)
+
+    # ---------------- 一次性应用 ----------------
+    def apply(self):
+        """把全部变更一次性应用到原表上，返回新的pog_data（原表不被修改）"""
+        new_pog_data = self.base.drop(index = list(self.deleted)) if self.deleted else self.base.copy()
+        new_pog_data = _overlay_updates(new_pog_data, self.updates)
+        if self.inserted:
+            inserted_frame = pd.DataFrame.from_dict(self.inserted, orient = 'index')
+            new_pog_data = pd.concat([new_pog_data, inserted_frame])
+        return new_pog_data
+
+
+def _overlay_updates(frame, updates):
+    """把 {label: {field: value}} 形式的逐行更新写入frame，按字段汇总后每个字段只写一次"""
+    field_updates = {}
+    for label, row_updates in updates.items():
+        for field, value in row_updates.items():
+            field_updates.setdefault(field, {})[label] = value
+    for field, values in field_updates.items():
+        if field not in frame.columns:
+            continue
+        values = pd.Series(values)
+        column = frame[field]
+        updated = column.where(~column.index.isin(values.index), values.reindex(column.index))
+        if pd.api.types.is_integer_dtype(column) and updated.dtype != column.dtype and np.all(np.mod(updated.to_numpy(), 1) == 0):
+            updated = updated.astype(column.dtype)      # 更新值都是整数时保持原整数类型
+        frame[field] = updated
+    return frame
+
+
+def diff_pog_data(old_pog_data, new_pog_data, columns = None):
+    """
+    按行内容比较两版pog_data（不依赖行索引，各场景函数返回的新表通常已重建索引）
+
+    每一行视为 columns 各字段取值的元组，两版按多重集合相减：
+    removed 为旧版中多出的行，added 为新版中多出的行（重复行按出现次数计）；
+    touched_layers 为发生变化的 (module_id, layer_id)。
+    columns 默认取两版共有的列
+    """
+    if columns is None:
+        columns = [column for column in old_pog_data.columns if column in new_pog_data.columns]
+    columns = list(columns)
+    old_rows = old_pog_data[columns].assign(_side = 0)
+    new_rows = new_pog_data[columns].assign(_side = 1)
+    counts = pd.concat([old_rows, new_rows], ignore_index = True).groupby(columns, dropna = False, sort = False)['_side'].agg(['size', 'sum'])
+    delta = (2 * counts['sum'] - counts['size']).astype('int64')      # 新版行数 - 旧版行数
+
+    def _expand(repeats):
+        repeats = repeats[repeats > 0]
+        rows = repeats.index.repeat(repeats.to_numpy()).to_frame(index = False)
+        return rows.reindex(columns = columns)
+
+    added = _expand(delta)
+    removed = _expand(-delta)
+    touched_layers = []
+    if 'module_id' in columns and 'layer_id' in columns:
+        changed = pd.concat([added[['module_id', 'layer_id']], removed[['module_id', 'layer_id']]]).drop_duplicates()
+        touched_layers = sorted(tuple(key) for key in changed.itertuples(index = False))
+    return {'added': added, 'removed': removed, 'touched_layers': touched_layers}
@@ -0,0 +1,189 @@
+import os
+import ast
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from csv_cache import resolve_cache_dir, file_hash
+
+
+class PogConfig(Mapping):
+    """
+    POG配置
+
+    config.txt 只解析一次（ast.literal_eval，不再使用 eval），并预先编译热点路径上用到的查询表：
+    segment / brand_label 排名数组、按层和按模块索引的托盘表、各模块宽度、连带商品与指定位置商品列表。
+    对象本身仍可像原来的配置字典一样按 config['segment']['assign_brand_rank'] 访问，
+    因此原先接收字典的函数传入 PogConfig 也能正常工作。
+
+    load() 会把 literal_eval 的结果以字面量文本（repr）缓存到 .pog_cache 下，源文件未变时其他进程读取缓存后重建查询表；
+    缓存同样只用 ast.literal_eval 读取，缓存目录被他人写入时也不会执行任意代码。
+    """
+
+    CACHE_VERSION = 4
+
+    def __init__(self, raw_config):
+        self.raw = raw_config if raw_config is not None else {}
+        global_config = self.raw.get('global', {})
+
+        # segment / brand_label 排名：名称数组 + 排名数组，向量化查询时用 Index.get_indexer
+        self.segment_rank_map = dict(self.raw.get('segment', {}).get('assign_brand_rank', {}))
+        self.brand_label_rank_map = dict(self.raw.get('brand_label', {}).get('assign_brand_rank', {}))
+        self._segment_index = pd.Index(list(self.segment_rank_map.keys()))
+        self._segment_ranks = np.array(list(self.segment_rank_map.values()), dtype = float)
+        self._brand_label_index = pd.Index(list(self.brand_label_rank_map.keys()))
+        self._brand_label_ranks = np.array(list(self.brand_label_rank_map.values()), dtype = float)
+
+        # 各模块宽度（module_id 从1开始）
+        self.module_widths = np.array(global_config.get('module_meter', []), dtype = float)
+
+        # 托盘表：tray_id -> 配置；固定位置托盘（layer_type 为 module）；按层、按模块索引的托盘编号
+        self.trays = {int(tray_id): tray_info for tray_id, tray_info in self.raw.get('tray', {}).items()}
+        self.fixed_trays = {tray_id: tray_info for tray_id, tray_info in self.trays.items() if tray_info.get('layer_type') == 'module'}
+        self.trays_by_layer = {}
+        self.trays_by_module = {}
+        self.fixed_trays_by_layer = {}
+        for tray_id, tray_info in self.trays.items():
+            self.trays_by_layer.setdefault(tray_info.get('layer'), []).append(tray_id)
+            self.trays_by_module.setdefault(tray_info.get('meter'), []).append(tray_id)
+            if tray_id in self.fixed_trays:
+                self.fixed_trays_by_layer.setdefault(tray_info.get('layer'), []).append(tray_id)
+
+        # 每层最多商品数（global.max_item_cnt_layer，未配置为 None）
+        self.max_item_cnt_layer = global_config.get('max_item_cnt_layer')
+        # 单个商品最多增加的 facing 数（item.max_vert_facing）
+        self.max_vert_facing = int(self.raw.get('item', {}).get('max_vert_facing', 1))
+
+        # 托盘连带商品、指定位置商品
+        series_items = set()
+        for tray_info in self.trays.values():
+            series_items.update(_to_int(code) for code in tray_info.get('series_item', {}).keys())
+        self.series_items = sorted(series_items)
+        self.specified_items = [_to_int(code) for code in self.raw.get('item_position', {}).get('item_list', [])]
+
+    # ---------------- 构建 ----------------
+    @classmethod
+    def parse(cls, text):
+        """解析 config.txt 文本，兼容 'pog_config = {...}' 形式"""
+        text = text.strip()
+        if not text.startswith('{') and '=' in text:
+            text = text.split('=', 1)[1].strip()
+        return cls(ast.literal_eval(text))
+
+    @classmethod
+    def load(cls, file_path, cache_dir = None, use_cache = True):
+        """
+        读取并解析 config.txt；use_cache 为True时把解析出的配置字典以字面量文本写入缓存目录，
+        源文件 mtime、大小未变（或内容哈希未变）时读取缓存中的配置字典并重建查询表
+        """
+        if not use_cache:
+            with open(file_path, 'r', encoding = 'utf-8') as f:
+                return cls.parse(f.read())
+
+        stat = os.stat(file_path)
+        cache_path = os.path.join(resolve_cache_dir(file_path, cache_dir), os.path.basename(file_path) + '.pogconfig.txt')
+        cached = _read_literal(cache_path)
+        if cached is not None and cached.get('version') == cls.CACHE_VERSION and cached.get('source') == os.path.abspath(file_path):
+            if (cached['mtime_ns'], cached['size']) == (stat.st_mtime_ns, stat.st_size) or cached['content_hash'] == file_hash(file_path):
+                return cls(cached['raw'])
+
+        with open(file_path, 'r', encoding = 'utf-8') as f:
+            config = cls.parse(f.read())
+        _write_literal(cache_path, {
+            'version': cls.CACHE_VERSION,
+            'source': os.path.abspath(file_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'content_hash': file_hash(file_path),
+            'raw': config.raw,
+        })
+        return config
+
+    @classmethod
+    def ensure(cls, config):
+        """传入 PogConfig 时原样返回，传入配置字典时包装为 PogConfig"""
+        return config if isinstance(config, cls) else cls(config)
+
+    # ---------------- 兼容字典访问 ----------------
+    def __getitem__(self, key):
+        return self.raw[key]
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __len__(self):
+        return len(self.raw)
+
+    # ---------------- 排名查询 ----------------
+    def segment_rank(self, segment):
+        """单个 segment 的排名，未配置时抛出 KeyError（与直接查字典一致）"""
+        return self.segment_rank_map[segment]
+
+    def segment_ranks(self, segments):
+        """批量查询 segment 排名，返回 float ndarray，未配置的为 NaN"""
+        return _lookup_ranks(self._segment_index, self._segment_ranks, segments)
+
+    def brand_label_rank(self, brand_label):
+        return self.brand_label_rank_map[brand_label]
+
+    def brand_label_ranks(self, brand_labels):
+        return _lookup_ranks(self._brand_label_index, self._brand_label_ranks, brand_labels)
+
+    # ---------------- 模块 / 托盘 ----------------
+    def module_width(self, module_id, default = None):
+        """模块宽度（module_meter[module_id - 1]）；超出范围时返回 default，default 为 None 时抛出 IndexError"""
+        if 1 <= module_id <= len(self.module_widths):
+            width = self.module_widths[int(module_id) - 1]
+            return int(width) if float(width).is_integer() else float(width)
+        if default is None:
+            raise IndexError(f'module_meter 中没有模块 {module_id} 的宽度')
+        return default
+
+    def fixed_tray_ids_in_layer(self, layer_id):
+        return self.fixed_trays_by_layer.get(layer_id, [])
+
+    @property
+    def global_config(self):
+        return self.raw.get('global', {})
+
+
+def _lookup_ranks(index, ranks, values):
+    positions = index.get_indexer(pd.Index(values, dtype = object)) if len(index) > 0 else np.full(len(values), -1)
+    return np.where(positions >= 0, ranks[np.maximum(positions, 0)] if len(ranks) > 0 else np.nan, np.nan)
+
+
+def _to_int(value, default = 0):
+    """商品编号转整数，规则与 sku_switcher.safe_int_conversion 一致（字符串去掉 '例:' 等前缀后只保留数字）"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return default if pd.isna(value) else int(value)
+    if isinstance(value, str):
+        cleaned_value = value.strip()
+        if ':' in cleaned_value:
+            cleaned_value = cleaned_value.split(':', 1)[1].strip()
+        cleaned_value = ''.join(filter(str.isdigit, cleaned_value))
+        return int(cleaned_value) if cleaned_value else default
+    return default
+
+
+def _read_literal(path):
+    """读取 _write_literal 写入的缓存；文件缺失或内容不是合法字面量时返回 None"""
+    try:
+        with open(path, 'r', encoding = 'utf-8') as f:
+            cached = ast.literal_eval(f.read())
+    except (OSError, ValueError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return cached if isinstance(cached, dict) else None
+
+
+def _write_literal(path, obj):
+    """obj 只含 literal_eval 可还原的类型（dict / list / tuple / str / 数字 / bool / None），以 repr 文本原子写入"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        with open(tmp_path, 'w', encoding = 'utf-8') as f:
+            f.write(repr(obj))
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
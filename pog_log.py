@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import time
+import threading
+import unicodedata
+
+
+# 日志级别
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR', OFF: 'OFF'}
+_LEVEL_VALUES = {name: level for level, name in LEVEL_NAMES.items()}
+
+
+class _State:
+    """全局日志设置：级别、输出格式（text / json）、输出流、自定义处理函数"""
+    level = INFO
+    format = 'text'
+    stream = None           # None 表示输出时取当前的 sys.stdout（兼容 redirect_stdout）
+    handler = None          # 设置后每条记录（dict）交给 handler 处理，不再写入输出流
+    collect_timing = True   # 是否按步骤累计耗时统计
+
+
+_state = _State()
+_timing_stats = {}
+_timing_lock = threading.Lock()      # 服务中多个线程同时退出计时块时保护 _timing_stats 的累加
+_event_names = {}                   # 信息模板 -> 事件名 的缓存
+
+
+def _to_level(level):
+    if isinstance(level, str):
+        return _LEVEL_VALUES[level.upper()]
+    return int(level)
+
+
+def configure(level = None, fmt = None, stream = None, handler = None, collect_timing = None):
+    """
+    修改全局日志设置，未传入的参数保持不变
+
+    level: DEBUG / INFO / WARNING / ERROR / OFF（或对应的字符串）；OFF 时所有日志与计时均直接跳过
+    fmt: 'text' 只输出格式化后的信息（与原先的 print 输出一致）；'json' 每条记录输出一行JSON，便于机器解析
+    stream: 输出流，默认当前的 sys.stdout
+    handler: 自定义处理函数 handler(record)，用于收集到内存、转发到其他系统等
+    """
+    if level is not None:
+        _state.level = _to_level(level)
+    if fmt is not None:
+        if fmt not in ('text', 'json'):
+            raise ValueError(f'不支持的日志格式 {fmt}，可选值为 text / json')
+        _state.format = fmt
+    if stream is not None:
+        _state.stream = stream
+    if handler is not None:
+        _state.handler = handler
+    if collect_timing is not None:
+        _state.collect_timing = collect_timing
+
+
+def reset_handler():
+    """取消自定义处理函数，恢复写入输出流"""
+    _state.handler = None
+
+
+def is_enabled(level):
+    return level >= _state.level
+
+
+def timing_stats():
+    """各计时步骤的累计统计 {step: {'count', 'total_ms', 'max_ms', 'rows'}}"""
+    with _timing_lock:
+        return {step: dict(stats) for step, stats in _timing_stats.items()}
+
+
+def reset_timing_stats():
+    with _timing_lock:
+        _timing_stats.clear()
+
+
+def _event_name(template):
+    """
+    信息模板对应的事件名：去掉首尾的换行、空白，以及 ✅ ⚠️ 📦 等 emoji 符号，
+    使 '\\n处理层：...'、'✅ 排序完成。' 这类为了终端排版加上的装饰不影响按事件聚合
+    """
+    name = _event_names.get(template)
+    if name is None:
+        name = ' '.join(part for part in ''.join(c for c in template if not _is_emoji(c)).strip().split(' ') if part)
+        name = name or template.strip()
+        _event_names[template] = name
+    return name
+
+
+def _is_emoji(char):
+    # So：emoji / 图形符号；FE0F 为 emoji 变体选择符，200D 为 emoji 连接符
+    return unicodedata.category(char) == 'So' or char in '\ufe0f\u200d'
+
+
+def _emit(logger, level, event, fields):
+    """生成并输出一条记录；只有在级别开启时才会被调用，信息模板在这里才格式化"""
+    try:
+        message = event.format(**fields) if fields else event
+    except (KeyError, IndexError, ValueError):
+        message = event
+    record = {'ts': time.time(), 'level': LEVEL_NAMES.get(level, level), 'logger': logger, 'event': _event_name(event), 'msg': message}
+    record.update(fields)
+
+    if _state.handler is not None:
+        _state.handler(record)
+        return
+    stream = _state.stream or sys.stdout
+    if _state.format == 'json':
+        stream.write(json.dumps(record, ensure_ascii = False, default = str) + '\n')
+    else:
+        stream.write(message + '\n')
+
+
+class EventLog:
+    """
+    模块级的结构化事件日志
+
+    event 为信息模板（如 '互换商品: {sku1} ↔ {sku2}'），去掉首尾换行与 emoji 后作为稳定的事件名，便于按事件聚合；
+    字段以关键字参数传入，只在该级别开启时才格式化，关闭时调用开销只有一次级别比较。
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def log(self, level, event, **fields):
+        if level >= _state.level:
+            _emit(self.name, level, event, fields)
+
+    def debug(self, event, **fields):
+        if DEBUG >= _state.level:
+            _emit(self.name, DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        if INFO >= _state.level:
+            _emit(self.name, INFO, event, fields)
+
+    def warning(self, event, **fields):
+        if WARNING >= _state.level:
+            _emit(self.name, WARNING, event, fields)
+
+    def error(self, event, **fields):
+        if ERROR >= _state.level:
+            _emit(self.name, ERROR, event, fields)
+
+    def enabled(self, level):
+        return level >= _state.level
+
+    def timed(self, step, level = DEBUG, **fields):
+        """
+        计时上下文：with log.timed('switch.relayout', rows = n) as step: ...
+        退出时把耗时累计到 timing_stats，level 开启时再输出一条包含 duration_ms、rows 等字段的记录；
+        可在块内通过 step.set(rows = ...) 补充字段。日志为 OFF，或该级别关闭且不累计统计时返回空操作对象，不计时
+        """
+        if _state.level >= OFF or (level < _state.level and not _state.collect_timing):
+            return _NULL_STEP
+        return _TimedStep(self, level, step, fields)
+
+
+class _TimedStep:
+    __slots__ = ('log', 'level', 'step', 'fields', 'start')
+
+    def __init__(self, log, level, step, fields):
+        self.log = log
+        self.level = level
+        self.step = step
+        self.fields = fields
+        self.start = None
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self.start) * 1000
+        fields = dict(self.fields, step = self.step, duration_ms = round(duration_ms, 3), status = 'error' if exc_type else 'ok')
+        if _state.collect_timing:
+            rows = fields.get('rows')
+            with _timing_lock:
+                stats = _timing_stats.setdefault(self.step, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+                stats['count'] += 1
+                stats['total_ms'] += duration_ms
+                stats['max_ms'] = max(stats['max_ms'], duration_ms)
+                if isinstance(rows, (int, float)):
+                    stats['rows'] += rows
+        if self.level >= _state.level:
+            _emit(self.log.name, self.level, '[{step}] 耗时 {duration_ms:.1f}ms', fields)
+        return False
+
+
+class _NullStep:
+    __slots__ = ()
+
+    def set(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STEP = _NullStep()
+_loggers = {}
+
+
+def get_logger(name):
+    """取得（或创建）名为 name 的事件日志"""
+    if name not in _loggers:
+        _loggers[name] = EventLog(name)
+    return _loggers[name]
+
+
+# 环境变量中的初始设置：POG_LOG_LEVEL=DEBUG|INFO|WARNING|ERROR|OFF，POG_LOG_FORMAT=text|json
+if os.environ.get('POG_LOG_LEVEL'):
+    configure(level = os.environ['POG_LOG_LEVEL'])
+if os.environ.get('POG_LOG_FORMAT'):
+    configure(fmt = os.environ['POG_LOG_FORMAT'])
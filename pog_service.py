@@ -0,0 +1,591 @@
+import os
+import io
+import json
+import base64
+import argparse
+import threading
+import socketserver
+import importlib.util
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+os.environ.setdefault('MPLBACKEND', 'Agg')     # 常驻服务没有图形界面，按需绘图时只输出图片
+
+import numpy as np
+import pandas as pd
+
+import item_addition
+import visualizing
+from item_catalog import ItemCatalog
+from sales_index import SalesIndex
+from csv_cache import read_csv_cached
+from pog_config import PogConfig
+from pog_changeset import diff_pog_data
+from pog_versions import PogVersionStore
+from pog_log import get_logger, timing_stats
+
+log = get_logger('pog_service')
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# planogram 目录下的基础数据文件，load 请求中可用 files 覆盖
+DEFAULT_FILES = {
+    'pog_data': 'pog_result.csv',
+    'item_attributes': 'pog_test_haircare_test.csv',
+    'item_attributes_detail': 'ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv',
+    'brand_2_brand_label': 'brand_2_brand_label.csv',
+    'sales_data': 'sales_item_sum.csv',
+    'tray_data': 'pog_test_haircare_tray.csv',
+    'tray_item': 'pog_test_haircare_tray_item.csv',
+    'config': 'config.txt'
+}
+
+RETURN_MODES = ('diff', 'pog', 'none')
+
+# 子目录中的场景脚本（文件名不能直接import），按路径加载一次后常驻
+SCENARIO_MODULES = {
+    'sku_switcher': 'Pog_switch/sku_switcher.py',
+    'delete_fill': 'POG_DELETE/delete.py',
+    'delete_dp': 'POG_DELETE/01delete.py',
+    'delete_ip': 'POG_DELETE/IP.py',
+    'remove_tray': 'RemoveTray/POG_ remove_tray.py'
+}
+DELETE_VARIANTS = {'fill': 'delete_fill', 'dp': 'delete_dp', 'ip': 'delete_ip'}
+
+_modules = {}
+_modules_lock = threading.Lock()
+
+
+def load_scenario_module(name):
+    """按路径导入场景脚本（只导入一次）"""
+    with _modules_lock:
+        if name not in _modules:
+            path = os.path.join(REPO_ROOT, SCENARIO_MODULES[name])
+            spec = importlib.util.spec_from_file_location(f'pog_scenario_{name}', path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _modules[name] = module
+        return _modules[name]
+
+
+class Planogram:
+    """
+    常驻内存的一张货架图
+
+    基础数据表、编译后的配置、商品目录与销量索引只在加载时构建一次；
+    pog_data 为当前版本，每次提交的操作在版本库 versions（PogVersionStore，按层共享未改动的数据）中生成新版本，
+    可撤销 / 重做，超过 max_versions 的旧版本被淘汰。
+    互换所需的 sku_data / 层占用 / 固定位置索引在首次互换时构建，连续的互换之间保持增量状态，
+    其他操作提交新版本后失效，下次互换时由内存中的新POG重建。
+    同一张货架图上的请求由 lock 串行执行，不同货架图之间互不阻塞。
+    """
+
+    def __init__(self, name, base_path, files = None, max_versions = 100, max_rows = None):
+        self.name = name
+        self.base_path = base_path
+        self.files = dict(DEFAULT_FILES, **(files or {}))
+        self.max_versions = max_versions
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.versions = None
+        self.config = None
+        self.bases_data = {}
+        self.pog_data = None
+        self.switch_state = None
+        self.load()
+
+    def load(self):
+        """从目录读取基础数据（经 csv_cache，源文件未变时直接读缓存），版本历史从头开始"""
+        bases_data = {}
+        for key, file_name in self.files.items():
+            if key == 'config':
+                continue
+            file_path = os.path.join(self.base_path, file_name)
+            bases_data[key] = read_csv_cached(file_path) if os.path.exists(file_path) else pd.DataFrame()
+
+        config_path = os.path.join(self.base_path, self.files['config'])
+        self.config = PogConfig.load(config_path) if os.path.exists(config_path) else PogConfig({})
+        self.pog_data = _normalize_item_codes(bases_data.pop('pog_data'))
+        self.bases_data = bases_data
+
+        # 商品目录与销量索引只构建一次，之后每个请求共用
+        if all(not bases_data[key].empty for key in ('item_attributes', 'item_attributes_detail', 'brand_2_brand_label')):
+            ItemCatalog.from_bases_data(bases_data)
+        SalesIndex.from_bases_data(bases_data)
+
+        self.versions = PogVersionStore(self.pog_data, max_versions=self.max_versions, max_rows=self.max_rows, label='load')
+        self.switch_state = None
+        log.info("planogram {name} 已加载: {rows} 行, 目录 {base_path}", name=self.name, rows=len(self.pog_data), base_path=self.base_path)
+
+    def request_bases_data(self, **extra):
+        """单个请求用的 bases_data：共享基础数据与索引，pog_data 为当前版本"""
+        bases_data = dict(self.bases_data, pog_data=self.pog_data)
+        bases_data.update(extra)
+        return bases_data
+
+    def get_switch_state(self):
+        """互换用的常驻 var_dict（首次使用或POG被其他操作修改后重建）"""
+        if self.switch_state is None:
+            sku_switcher = load_scenario_module('sku_switcher')
+            var_dict = {
+                'bases_data': {
+                    'config': self.config,
+                    'item_master': self.bases_data['item_attributes_detail'].copy(),
+                    'sales_data': self.bases_data['sales_data'].copy(),
+                    'pog_data': self.pog_data.copy(),
+                    'tray_data': self.bases_data['tray_data'],
+                    'tray_item_data': self.bases_data['tray_item'].copy()
+                }
+            }
+            if self.bases_data.get('sales_index') is not None:
+                var_dict['bases_data']['sales_index'] = self.bases_data['sales_index']
+            self.switch_state = sku_switcher.prepare_switch_state(var_dict)
+        return self.switch_state
+
+    @property
+    def version(self):
+        return self.versions.current_version
+
+    def commit(self, new_pog_data, label = None, touched_layers = None, keep_switch_state = False):
+        """新POG成为当前版本；keep_switch_state 为True时（互换产生的新版本）常驻的互换状态继续沿用"""
+        self.pog_data = new_pog_data
+        self.versions.commit(new_pog_data, label=label, touched_layers=touched_layers)
+        if keep_switch_state and self.switch_state is not None:
+            self.switch_state['bases_data']['pog_data'] = self.pog_data
+        else:
+            self.switch_state = None
+
+    def checkout(self, move, steps = 1):
+        """撤销（move='undo'）或重做（move='redo'）若干步，返回 (原版本号, 新版本号)"""
+        old_version = self.version
+        new_version = self.versions.undo(steps) if move == 'undo' else self.versions.redo(steps)
+        if new_version != old_version:
+            self.pog_data = self.versions.get()
+            self.switch_state = None
+        return old_version, new_version
+
+
+class PogService:
+    """
+    常驻的POG操作服务
+
+    请求与响应均为JSON可序列化的dict：
+        {'op': 'add' | 'switch' | 'recommend_swaps' | 'delete' | 'remove_tray' | 'visualize'
+               | 'undo' | 'redo' | 'history' | 'diff'
+               | 'load' | 'reload' | 'unload' | 'list' | 'get' | 'stats',
+         'planogram': 货架图名称,
+         'params': 操作参数（与各场景函数的 var_dict 参数同名）,
+         'return': 'diff'（默认，只返回变化的行）| 'pog'（返回整张新POG）| 'none',
+         'commit': True（默认，新POG成为当前版本）| False（试算，不改变当前版本）}
+    响应中 status 为 success / fail，并附带 msg、planogram、version 以及 diff 或 pog。
+    undo / redo 的 params 为 {'steps': 1}；diff 的 params 为 {'from_version', 'to_version'（默认当前版本）}。
+    """
+
+    def __init__(self):
+        self.planograms = {}
+        self._registry_lock = threading.Lock()
+        self._operations = {
+            'add': self._op_add,
+            'switch': self._op_switch,
+            'recommend_swaps': self._op_recommend_swaps,
+            'delete': self._op_delete,
+            'remove_tray': self._op_remove_tray,
+            'visualize': self._op_visualize,
+            'get': self._op_get
+        }
+        self._version_operations = {
+            'undo': self._op_checkout,
+            'redo': self._op_checkout,
+            'history': self._op_history,
+            'diff': self._op_diff
+        }
+
+    # ---------------- 货架图管理 ----------------
+    def load(self, name, base_path, files = None, max_versions = 100, max_rows = None):
+        planogram = Planogram(name, base_path, files, max_versions=max_versions, max_rows=max_rows)
+        with self._registry_lock:
+            self.planograms[name] = planogram
+        return planogram
+
+    def get_planogram(self, name):
+        with self._registry_lock:
+            if name not in self.planograms:
+                raise KeyError(f'planogram {name} 未加载')
+            return self.planograms[name]
+
+    def unload(self, name):
+        with self._registry_lock:
+            return self.planograms.pop(name, None) is not None
+
+    # ---------------- 请求分发 ----------------
+    def handle(self, request):
+        """处理一个请求，返回JSON可序列化的响应；异常不会抛出，统一转为 fail 响应"""
+        op = request.get('op')
+        name = request.get('planogram')
+        try:
+            with log.timed(f'service.{op}', planogram=name):
+                response = self._dispatch(op, name, request)
+        except Exception as e:
+            log.error("请求 {op} ({name}) 执行异常: {error}", op=op, name=name, error=e)
+            response = {'status': 'fail', 'msg': f'请求执行异常: {e}'}
+        response.setdefault('op', op)
+        if name is not None:
+            response.setdefault('planogram', name)
+        return _to_jsonable(response)
+
+    def _dispatch(self, op, name, request):
+        params = request.get('params') or {}
+        if op == 'list':
+            with self._registry_lock:
+                planograms = list(self.planograms.values())
+            return {'status': 'success', 'msg': f'共 {len(planograms)} 个planogram',
+                    'planograms': [{'name': p.name, 'version': p.version, 'rows': len(p.pog_data), 'base_path': p.base_path} for p in planograms]}
+        if op == 'stats':
+            return {'status': 'success', 'msg': '各步骤累计耗时', 'timing': timing_stats()}
+        if name is None:
+            return {'status': 'fail', 'msg': '缺少参数 planogram'}
+        if op == 'load':
+            base_path = params.get('path') or request.get('path')
+            if not base_path:
+                return {'status': 'fail', 'msg': 'load 请求缺少参数 path'}
+            planogram = self.load(name, base_path, params.get('files'), params.get('max_versions', 100), params.get('max_rows'))
+            return {'status': 'success', 'msg': f'已加载 {len(planogram.pog_data)} 行', 'version': planogram.version}
+        if op == 'unload':
+            removed = self.unload(name)
+            return {'status': 'success' if removed else 'fail', 'msg': '已卸载' if removed else f'planogram {name} 未加载'}
+        if op not in self._operations and op not in self._version_operations and op != 'reload':
+            return {'status': 'fail', 'msg': f'不支持的操作 {op}'}
+
+        return_mode = request.get('return', 'diff')
+        if return_mode not in RETURN_MODES:
+            return {'status': 'fail', 'msg': f'非法的return {return_mode}，可选值为 {RETURN_MODES}'}
+        commit = bool(request.get('commit', True))
+
+        planogram = self.get_planogram(name)
+        with planogram.lock:
+            if op == 'reload':
+                planogram.load()
+                return {'status': 'success', 'msg': '已重新加载', 'version': planogram.version}
+            if op in self._version_operations:
+                response = self._version_operations[op](planogram, op, params, return_mode)
+                response['version'] = planogram.version
+                return response
+
+            old_pog_data = planogram.pog_data
+            response = self._operations[op](planogram, params)
+            new_pog_data = response.pop('pog_data', None)
+            keep_switch_state = response.pop('keep_switch_state', False)
+            succeeded = new_pog_data is not None and response.get('status') == 'success'
+            if succeeded:
+                new_pog_data = _normalize_item_codes(new_pog_data)
+                diff = diff_pog_data(old_pog_data, new_pog_data) if commit or return_mode == 'diff' else None
+                if commit:
+                    # 列相同时按内容差异得到的改动层提交；列有增减时由版本库逐层比较
+                    touched_layers = diff['touched_layers'] if set(old_pog_data.columns) == set(new_pog_data.columns) else None
+                    planogram.commit(new_pog_data, label=op, touched_layers=touched_layers, keep_switch_state=keep_switch_state)
+                elif keep_switch_state:
+                    planogram.switch_state = None       # 试算的互换已修改常驻的 sku_data，下次互换时重建
+                if return_mode == 'pog':
+                    response['pog'] = new_pog_data
+                elif return_mode == 'diff':
+                    response['diff'] = diff
+            response['version'] = planogram.version
+            response['committed'] = commit and succeeded
+            return response
+
+    # ---------------- 各操作 ----------------
+    def _op_add(self, planogram, params):
+        render_mode = params.get('render_mode', 'none')
+        if render_mode == 'immediate':
+            return {'status': 'fail', 'msg': "服务中不支持 render_mode='immediate'，请使用 'deferred' 取得快照"}
+        var_dict = {'bases_data': planogram.request_bases_data(), 'render_mode': render_mode}
+        if 'add_item_list' in params:
+            var_dict['add_item_list'] = params['add_item_list']
+            result = item_addition.add_items_func(var_dict, planogram.config)
+            extra_keys = ('item_results', 'touched_layers')
+        else:
+            if 'add_item' not in params:
+                return {'status': 'fail', 'msg': '缺少参数 add_item 或 add_item_list'}
+            var_dict['add_item'] = params['add_item']
+            result = item_addition.add_item_func(var_dict, planogram.config)
+            extra_keys = ('adjust_msg', 'target_module', 'target_layer', 'layer_snapshots')
+
+        response = {key: result[key] for key in extra_keys if key in result}
+        response['status'] = 'success' if result['status'] in ('success', 'partial') else 'fail'
+        response['msg'] = result.get('error_msg') or result.get('msg') or result['status']
+        if response['status'] == 'success':
+            response['pog_data'] = result['pog_data']
+        return response
+
+    def _op_switch(self, planogram, params):
+        sku_switcher = load_scenario_module('sku_switcher')
+        state = planogram.get_switch_state()
+        var_dict = dict(state)      # 共享常驻的 bases_data，互换参数只放在本次请求的 var_dict 上
+        for key in ('item1', 'item2', 'pairs', 'relayout_scope'):
+            if key in params:
+                var_dict[key] = params[key]
+        result = sku_switcher.switch_items_batch(var_dict) if 'pairs' in params else sku_switcher.switch_item_func(var_dict)
+
+        response = {key: value for key, value in result.items() if key != 'pog_data'}
+        if result['status'] == 'success':
+            response['pog_data'] = result['pog_data']
+            response['keep_switch_state'] = True
+        return response
+
+    def _op_recommend_swaps(self, planogram, params):
+        sku_switcher = load_scenario_module('sku_switcher')
+        return sku_switcher.recommend_swaps(planogram.get_switch_state(), **params)
+
+    def _op_delete(self, planogram, params):
+        variant = params.get('variant', 'fill')
+        if variant not in DELETE_VARIANTS:
+            return {'status': 'fail', 'msg': f'非法的variant {variant}，可选值为 {list(DELETE_VARIANTS)}'}
+        module = load_scenario_module(DELETE_VARIANTS[variant])
+        del_params = {key: value for key, value in params.items() if key != 'variant'}
+        # delete.py 直接按原类型比较商品编号，01delete / IP 内部统一转为字符串
+        codes = del_params.get('del_item_list', [])
+        del_params['del_item_list'] = [_to_item_code(code) for code in codes] if variant == 'fill' else [str(code) for code in codes]
+
+        var_dict = {
+            'bases_data': planogram.request_bases_data(sales_item_sum=planogram.bases_data['sales_data'], config=planogram.config),
+            'func': {'del_item_func': del_params}
+        }
+        filler = module.FillLayerSKU()
+        new_pog_data, status = filler.run_delete_fill_pipeline(var_dict)
+        response = dict(status)
+        if status.get('status') == 'success':
+            response['pog_data'] = new_pog_data
+        return response
+
+    def _op_remove_tray(self, planogram, params):
+        sales_index = planogram.bases_data.get('sales_index')
+        if sales_index is None:
+            return {'status': 'fail', 'msg': '缺少销量数据，无法按销量填充'}
+        module = load_scenario_module('remove_tray')
+        filler = module.FillLayer()
+        filler.dataframes['pog_result'] = planogram.pog_data.copy()
+        filler.sales_index = sales_index
+        filler.max_extra_facings = planogram.config.max_vert_facing
+        filler.remove_tray_items(data_key='pog_result')
+        filler.calculate_space_for_affected_layers()
+        filler.sort_items_by_sales_in_affected_layers()
+        filler.sort_items_by_position_in_affected_layers()
+        filler.fill_and_reposition_layers(total_layer_width=params.get('total_layer_width', 1000))
+
+        new_pog_data = filler.dataframes.get('pog_result_filled')
+        if new_pog_data is None:
+            return {'status': 'fail', 'msg': '移除托盘后填充失败'}
+        return {'status': 'success', 'msg': f'移除托盘并填充完成，受影响 {len(filler.affected_layers_by_removal)} 层',
+                'affected_layers': filler.affected_layers_by_removal, 'pog_data': new_pog_data}
+
+    def _op_visualize(self, planogram, params):
+        if 'module_id' not in params or 'layer_id' not in params:
+            return {'status': 'fail', 'msg': '缺少参数 module_id 和 layer_id'}
+        item_catalog = planogram.bases_data.get('item_catalog')
+        if item_catalog is None:
+            return {'status': 'fail', 'msg': '缺少商品属性数据，无法可视化'}
+        snapshot = visualizing.build_layer_snapshot(planogram.pog_data, params['module_id'], params['layer_id'], planogram.config, item_catalog)
+        if snapshot is None:
+            return {'status': 'fail', 'msg': '该层有托盘，暂时无法可视化'}
+        response = {'status': 'success', 'msg': '已生成层快照', 'snapshot': snapshot}
+        if params.get('render') == 'png':
+            fig = visualizing.render_layer_snapshot(snapshot, params.get('option', 'rec'))
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format = 'png')
+            visualizing._load_pyplot().close(fig)
+            response['png_base64'] = base64.b64encode(buffer.getvalue()).decode('ascii')
+        return response
+
+    def _op_get(self, planogram, params):
+        return {'status': 'success', 'msg': f'当前版本 {planogram.version}', 'pog': planogram.pog_data}
+
+    # ---------------- 版本历史 ----------------
+    def _op_checkout(self, planogram, op, params, return_mode):
+        old_version, new_version = planogram.checkout(op, int(params.get('steps', 1)))
+        if new_version == old_version:
+            return {'status': 'fail', 'msg': '没有可撤销的版本' if op == 'undo' else '没有可重做的版本'}
+        response = {'status': 'success', 'msg': f'已从版本 {old_version} 切换到版本 {new_version}'}
+        if return_mode == 'pog':
+            response['pog'] = planogram.pog_data
+        elif return_mode == 'diff':
+            response['diff'] = planogram.versions.diff(old_version, new_version)
+        return response
+
+    def _op_history(self, planogram, op, params, return_mode):
+        return {'status': 'success', 'msg': f'共 {len(planogram.versions)} 个版本',
+                'history': planogram.versions.history(), 'memory': planogram.versions.memory_stats()}
+
+    def _op_diff(self, planogram, op, params, return_mode):
+        if 'from_version' not in params:
+            return {'status': 'fail', 'msg': '缺少参数 from_version'}
+        try:
+            to_version = params.get('to_version')
+            diff = planogram.versions.diff(int(params['from_version']), None if to_version is None else int(to_version))
+        except KeyError as e:
+            return {'status': 'fail', 'msg': str(e.args[0])}
+        return {'status': 'success', 'msg': f"{len(diff['added'])} 行新增, {len(diff['removed'])} 行移除", 'diff': diff}
+
+
+# ---------------- 传输层 ----------------
+class _HttpHandler(BaseHTTPRequestHandler):
+    """POST / 或 POST /<op>，请求体为JSON；GET /health、GET /planograms"""
+    service = None
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._reply(200, {'status': 'success', 'msg': 'ok'})
+        elif self.path.rstrip('/') == '/planograms':
+            self._reply(200, self.service.handle({'op': 'list'}))
+        else:
+            self._reply(404, {'status': 'fail', 'msg': f'未知路径 {self.path}'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except (ValueError, json.JSONDecodeError) as e:
+            self._reply(400, {'status': 'fail', 'msg': f'请求不是合法的JSON: {e}'})
+            return
+        op = self.path.strip('/')
+        if op:
+            request.setdefault('op', op)
+        self._reply(200, self.service.handle(request))
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii = False).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("http {client} {line}", client=self.client_address, line=format % args)
+
+
+class _UnixHandler(socketserver.StreamRequestHandler):
+    """Unix socket：每行一个JSON请求，按行返回JSON响应"""
+    service = None
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.service.handle(json.loads(line))
+            except json.JSONDecodeError as e:
+                response = {'status': 'fail', 'msg': f'请求不是合法的JSON: {e}'}
+            self.wfile.write(json.dumps(response, ensure_ascii = False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_http_server(service, host = '127.0.0.1', port = 8765):
+    handler = type('PogHttpHandler', (_HttpHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def make_unix_server(service, socket_path):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    handler = type('PogUnixHandler', (_UnixHandler,), {'service': service})
+    return _UnixServer(socket_path, handler)
+
+
+def send_request(request, socket_path = None, url = None, timeout = 60):
+    """客户端：把请求发给运行中的服务（socket_path 与 url 二选一），返回响应dict"""
+    payload = json.dumps(_to_jsonable(request), ensure_ascii = False).encode('utf-8')
+    if socket_path is not None:
+        import socket
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(payload + b'\n')
+            with sock.makefile('rb') as reader:
+                return json.loads(reader.readline())
+    if url is None:
+        raise ValueError('需要指定 socket_path 或 url')
+    from urllib.request import Request, urlopen
+    http_request = Request(url, data = payload, headers = {'Content-Type': 'application/json'})
+    with urlopen(http_request, timeout = timeout) as reply:
+        return json.loads(reply.read())
+
+
+# ---------------- 工具函数 ----------------
+def _to_item_code(code):
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return code
+
+
+def _normalize_item_codes(pog_data):
+    """各场景的商品编号类型不一（删除流程会转成字符串），可全部转为整数时统一为 int64"""
+    if pog_data is None or pog_data.empty or 'item_code' not in pog_data.columns or pog_data['item_code'].dtype.kind in 'iu':
+        return pog_data
+    codes = pd.to_numeric(pog_data['item_code'], errors='coerce')
+    if codes.notna().all() and (codes % 1 == 0).all():
+        pog_data = pog_data.assign(item_code=codes.astype('int64'))
+    return pog_data
+
+
+def _to_jsonable(value):
+    """DataFrame 转为逐行记录（NaN 转为 None），numpy 标量转为Python标量，元组键转为字符串"""
+    if isinstance(value, pd.DataFrame):
+        frame = value.astype(object).where(value.notna(), None)
+        return [{key: _to_jsonable(item) for key, item in row.items()} for row in frame.to_dict('records')]
+    if isinstance(value, pd.Series):
+        return _to_jsonable(value.to_list())
+    if isinstance(value, dict):
+        return {(key if isinstance(key, str) else str(_to_jsonable(key))): _to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_to_jsonable(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _to_jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'POG常驻操作服务')
+    parser.add_argument('--http', help = '监听的HTTP地址，如 127.0.0.1:8765')
+    parser.add_argument('--unix', help = '监听的Unix socket路径，如 /tmp/pog.sock')
+    parser.add_argument('--load', action = 'append', default = [], metavar = 'NAME=DIR', help = '启动时预加载的planogram，可重复')
+    args = parser.parse_args(argv)
+    if not args.http and not args.unix:
+        parser.error('至少需要指定 --http 或 --unix')
+
+    service = PogService()
+    for item in args.load:
+        name, _, base_path = item.partition('=')
+        service.load(name, base_path or '.')
+
+    servers = []
+    if args.http:
+        host, _, port = args.http.rpartition(':')
+        servers.append(make_http_server(service, host or '127.0.0.1', int(port)))
+        print(f"HTTP 服务已启动: http://{host or '127.0.0.1'}:{port}")
+    if args.unix:
+        servers.append(make_unix_server(service, args.unix))
+        print(f"Unix socket 服务已启动: {args.unix}")
+
+    for server in servers[1:]:
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+    try:
+        servers[0].serve_forever()
+    except KeyboardInterrupt:
+        print("服务已停止")
+    finally:
+        for server in servers:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from pog_changeset import diff_pog_data
+
+
+LAYER_KEY_COLUMNS = ['module_id', 'layer_id']
+
+
+class PogVersionStore:
+    """
+    pog_data 版本库（撤销 / 重做 / 任意两版差异）
+
+    每个版本按层保存：{(module_id, layer_id): 该层的行（按position排序的DataFrame）}。
+    提交新版本时只为发生变化的层保存新的行，其余层直接引用上一版本的同一个DataFrame，
+    因此100次编辑只占用“初始POG + 各次改动层”的内存，而不是100份完整拷贝。
+
+    - undo / redo 只移动当前版本指针，O(1)；取某一版本的完整pog_data时才按层拼接（并缓存最近一次的结果）
+    - diff 只比较两版中引用不同的层，代价与改动的行数成正比
+    - 版本数超过 max_versions、或各版本共同引用的行数超过 max_rows 时，从最旧的版本开始淘汰，
+      淘汰后不再被任何版本引用的层数据随之释放；当前版本永远不会被淘汰
+    - 在撤销后提交新版本时，被撤销的那些版本（重做分支）被丢弃
+
+    保存的层数据与 get() 返回的pog_data由多个版本共享，调用方不要原地修改。
+    """
+
+    def __init__(self, pog_data, max_versions = 100, max_rows = None, label = 'initial'):
+        self.max_versions = max_versions
+        self.max_rows = max_rows
+        self._versions = {}      # version_id -> {'layers', 'label', 'created', 'changed_layers', 'changed_rows'}
+        self._timeline = []      # 线性历史中的版本号，_cursor 指向当前版本
+        self._cursor = -1
+        self._next_id = 0
+        self._frames = {}        # id(层DataFrame) -> [DataFrame, 引用次数]
+        self._stored_rows = 0
+        self._materialized = None    # (version_id, pog_data)
+
+        layers = _split_layers(pog_data)
+        self._add_version(layers, label, list(layers), len(pog_data))
+        self._materialized = (self.current_version, pog_data)
+
+    # ---------------- 提交 ----------------
+    def commit(self, new_pog_data, label = None, touched_layers = None):
+        """
+        以完整的新pog_data提交一个版本，返回版本号
+        touched_layers: 已知的改动层（例如来自 diff_pog_data），给出时只重新切分这些层，其余层直接沿用；
+        不给出时逐层与当前版本比较，内容未变的层沿用旧数据
+        """
+        previous = self._versions[self.current_version]['layers']
+        if touched_layers is not None:
+            touched_layers = [_layer_key(layer_key) for layer_key in touched_layers]
+            layer_frames = _split_layers(new_pog_data, touched_layers)
+            layer_frames.update({layer_key: None for layer_key in touched_layers if layer_key not in layer_frames})
+        else:
+            new_layers = _split_layers(new_pog_data)
+            layer_frames = {layer_key: frame for layer_key, frame in new_layers.items()
+                            if layer_key not in previous or not _frames_equal(previous[layer_key], frame)}
+            layer_frames.update({layer_key: None for layer_key in previous if layer_key not in new_layers})
+        version_id = self.commit_layers(layer_frames, label)
+        self._materialized = (version_id, new_pog_data)
+        return version_id
+
+    def commit_layers(self, layer_frames, label = None):
+        """
+        只提交改动的层：layer_frames 为 {(module_id, layer_id): 该层的新行}，值为 None 或空表表示该层被清空。
+        适合已知改动层的场景（如互换后的脏层），代价只与这些层的行数有关
+        """
+        previous = self._versions[self.current_version]['layers']
+        layers = dict(previous)
+        changed_layers = []
+        changed_rows = 0
+        for layer_key, frame in layer_frames.items():
+            layer_key = _layer_key(layer_key)
+            if frame is None or frame.empty:
+                if layers.pop(layer_key, None) is not None:
+                    changed_layers.append(layer_key)
+                continue
+            if 'position' in frame.columns:
+                frame = frame.sort_values('position', kind = 'stable')
+            layers[layer_key] = frame.reset_index(drop = True)
+            changed_layers.append(layer_key)
+            changed_rows += len(frame)
+
+        # 丢弃重做分支
+        for version_id in self._timeline[self._cursor + 1:]:
+            self._drop_version(version_id)
+        del self._timeline[self._cursor + 1:]
+
+        version_id = self._add_version(layers, label, changed_layers, changed_rows)
+        self._evict()
+        return version_id
+
+    # ---------------- 撤销 / 重做 ----------------
+    @property
+    def current_version(self):
+        return self._timeline[self._cursor]
+
+    def can_undo(self):
+        return self._cursor > 0
+
+    def can_redo(self):
+        return self._cursor < len(self._timeline) - 1
+
+    def undo(self, steps = 1):
+        """回到之前的版本（最多回到最旧的未淘汰版本），返回当前版本号"""
+        self._cursor = max(0, self._cursor - steps)
+        return self.current_version
+
+    def redo(self, steps = 1):
+        self._cursor = min(len(self._timeline) - 1, self._cursor + steps)
+        return self.current_version
+
+    # ---------------- 读取 ----------------
+    def get(self, version_id = None):
+        """
+        某一版本（默认当前版本）的完整pog_data：按层拼接，按 (module_id, layer_id, position) 排列；
+        刚用 commit 提交的版本直接返回提交时的表
+        """
+        version_id = self.current_version if version_id is None else version_id
+        if self._materialized is not None and self._materialized[0] == version_id:
+            return self._materialized[1]
+        layers = self._get_version(version_id)['layers']
+        frames = [layers[layer_key] for layer_key in sorted(layers)]
+        pog_data = pd.concat(frames, ignore_index = True) if frames else pd.DataFrame()
+        self._materialized = (version_id, pog_data)
+        return pog_data
+
+    def layer(self, layer_key, version_id = None):
+        """某一版本中单层的行（不拼接整张表）"""
+        version_id = self.current_version if version_id is None else version_id
+        return self._get_version(version_id)['layers'].get(_layer_key(layer_key))
+
+    def diff(self, from_version, to_version = None):
+        """
+        两个版本之间的差异，格式同 diff_pog_data：added / removed / touched_layers
+        只比较两版中引用不同的层
+        """
+        to_version = self.current_version if to_version is None else to_version
+        old_layers = self._get_version(from_version)['layers']
+        new_layers = self._get_version(to_version)['layers']
+        changed = sorted(layer_key for layer_key in set(old_layers) | set(new_layers)
+                         if old_layers.get(layer_key) is not new_layers.get(layer_key))
+        old_frames = [old_layers[layer_key] for layer_key in changed if layer_key in old_layers]
+        new_frames = [new_layers[layer_key] for layer_key in changed if layer_key in new_layers]
+        template = next(iter(old_layers.values()), None)
+        if template is None:
+            template = next(iter(new_layers.values()), pd.DataFrame(columns = LAYER_KEY_COLUMNS))
+        old_rows = pd.concat(old_frames, ignore_index = True) if old_frames else template.iloc[0:0]
+        new_rows = pd.concat(new_frames, ignore_index = True) if new_frames else template.iloc[0:0]
+        return diff_pog_data(old_rows, new_rows)
+
+    def history(self):
+        """线性历史中各版本的摘要（最旧在前）"""
+        return [
+            {
+                'version': version_id,
+                'label': self._versions[version_id]['label'],
+                'created': self._versions[version_id]['created'],
+                'changed_layers': list(self._versions[version_id]['changed_layers']),
+                'changed_rows': self._versions[version_id]['changed_rows'],
+                'current': position == self._cursor
+            }
+            for position, version_id in enumerate(self._timeline)
+        ]
+
+    def memory_stats(self):
+        """保留的版本数、共享后实际保存的层数据块数与行数"""
+        return {'versions': len(self._timeline), 'layer_frames': len(self._frames), 'stored_rows': self._stored_rows}
+
+    def __len__(self):
+        return len(self._timeline)
+
+    # ---------------- 内部 ----------------
+    def _get_version(self, version_id):
+        if version_id not in self._versions:
+            raise KeyError(f'版本 {version_id} 不存在或已被淘汰')
+        return self._versions[version_id]
+
+    def _add_version(self, layers, label, changed_layers, changed_rows):
+        version_id = self._next_id
+        self._next_id += 1
+        self._versions[version_id] = {
+            'layers': layers,
+            'label': label,
+            'created': time.time(),
+            'changed_layers': changed_layers,
+            'changed_rows': changed_rows
+        }
+        for frame in layers.values():
+            entry = self._frames.get(id(frame))
+            if entry is None:
+                self._frames[id(frame)] = [frame, 1]
+                self._stored_rows += len(frame)
+            else:
+                entry[1] += 1
+        self._timeline.append(version_id)
+        self._cursor = len(self._timeline) - 1
+        return version_id
+
+    def _drop_version(self, version_id):
+        version = self._versions.pop(version_id)
+        for frame in version['layers'].values():
+            entry = self._frames[id(frame)]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._frames[id(frame)]
+                self._stored_rows -= len(frame)
+        if self._materialized is not None and self._materialized[0] == version_id:
+            self._materialized = None
+
+    def _evict(self):
+        """从最旧的版本开始淘汰，直到满足版本数与行数上限（当前版本不淘汰）"""
+        while self._cursor > 0 and (
+            (self.max_versions is not None and len(self._timeline) > self.max_versions) or
+            (self.max_rows is not None and self._stored_rows > self.max_rows)
+        ):
+            self._drop_version(self._timeline.pop(0))
+            self._cursor -= 1
+
+
+def _split_layers(pog_data, layer_keys = None):
+    """把pog_data切分为 {(module_id, layer_id): 该层按position排序的行}；给出 layer_keys 时只切分这些层"""
+    if pog_data is None or pog_data.empty:
+        return {}
+    frame = pog_data
+    if layer_keys is not None:
+        wanted = pd.MultiIndex.from_tuples(list(layer_keys), names = LAYER_KEY_COLUMNS) if layer_keys else None
+        if wanted is None:
+            return {}
+        mask = pd.MultiIndex.from_frame(frame[LAYER_KEY_COLUMNS]).isin(wanted)
+        frame = frame[mask]
+    if 'position' in frame.columns:
+        frame = frame.sort_values('position', kind = 'stable')
+    rows_by_layer = pd.Series(np.arange(len(frame))).groupby([frame['module_id'].to_numpy(), frame['layer_id'].to_numpy()]).indices
+    return {_layer_key(layer_key): frame.iloc[rows].reset_index(drop = True) for layer_key, rows in rows_by_layer.items()}
+
+
+def _layer_key(layer_key):
+    """层键统一为Python标量组成的元组"""
+    return tuple(value.item() if isinstance(value, np.generic) else value for value in layer_key)
+
+
+def _frames_equal(old_frame, new_frame):
+    """两层数据是否相同（列顺序不同视为相同，取值与类型需一致）"""
+    if len(old_frame) != len(new_frame) or set(old_frame.columns) != set(new_frame.columns):
+        return False
+    return old_frame.equals(new_frame[old_frame.columns])
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from csv_cache import read_csv_cached
+
+
+class SalesIndex:
+    """
+    销售指标索引
+
+    由 sales_item_sum（item_code, sales, qty）一次性构建，计算 revenue = sales × qty 以及按 revenue 降序的全局排名，
+    之后按商品编号 O(1) 查询 sales / qty / revenue，并支持对一批商品编号向量化排序、按层计算排名，
+    取代各场景函数中各自 merge 销售表、计算 revenue、逐行 .loc 查询的做法。
+
+    商品编号统一按整数匹配（字符串编号如 '101372844' 同样可以查询）；同一商品有多条记录时取第一条；
+    没有销售记录的商品 sales / qty / revenue 均按 0 处理（lookup 除外，其缺失项为 NaN，便于保持合并语义）。
+    """
+
+    columns = ['sales', 'qty', 'revenue']
+
+    def __init__(self, sales_data):
+        frame = pd.DataFrame({
+            'item_code': pd.to_numeric(sales_data['item_code'], errors='coerce'),
+            'sales': pd.to_numeric(sales_data['sales'], errors='coerce').astype(float),
+            'qty': pd.to_numeric(sales_data['qty'], errors='coerce').astype(float) if 'qty' in sales_data.columns else np.nan
+        })
+        frame = frame.dropna(subset=['item_code']).drop_duplicates('item_code', keep='first')
+        frame['item_code'] = frame['item_code'].astype('int64')
+        frame['revenue'] = frame['sales'] * frame['qty']
+        # 全局排名：revenue 降序，1 为最高；revenue 相同时按销售表中的先后顺序
+        frame['rank'] = frame['revenue'].fillna(0).rank(ascending=False, method='first').astype('int64')
+
+        self.frame = frame.set_index('item_code').rename_axis(None)
+        self._revenue = self.frame['revenue'].fillna(0).to_dict()
+        self._sales = self.frame['sales'].fillna(0).to_dict()
+        self._rank = self.frame['rank'].to_dict()
+
+    @classmethod
+    def from_csv(cls, file_path):
+        return cls(read_csv_cached(file_path))
+
+    @classmethod
+    def from_bases_data(cls, bases_data, key='sales_data'):
+        """从 var_dict['bases_data'] 构建；若其中已有构建好的 sales_index 则直接复用。没有销售数据时返回 None"""
+        sales_index = bases_data.get('sales_index')
+        if sales_index is None:
+            sales_data = bases_data.get(key)
+            if sales_data is None or sales_data.empty or 'item_code' not in sales_data.columns or 'sales' not in sales_data.columns:
+                return None
+            sales_index = cls(sales_data)
+            bases_data['sales_index'] = sales_index
+        return sales_index
+
+    @staticmethod
+    def _to_code(item_code):
+        try:
+            return int(item_code)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _to_codes(item_codes):
+        return pd.to_numeric(pd.Series(item_codes, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+    # ---------------- 单个商品 O(1) 查询 ----------------
+    def revenue(self, item_code, default=0.0):
+        return self._revenue.get(self._to_code(item_code), default)
+
+    def sales(self, item_code, default=0.0):
+        return self._sales.get(self._to_code(item_code), default)
+
+    def global_rank(self, item_code):
+        """全局 revenue 排名（1 为最高），没有销售记录时返回 None"""
+        return self._rank.get(self._to_code(item_code))
+
+    def __contains__(self, item_code):
+        return self._to_code(item_code) in self._rank
+
+    def __len__(self):
+        return len(self.frame)
+
+    # ---------------- 批量向量化 ----------------
+    def lookup(self, item_codes, column):
+        """批量查询 sales / qty / revenue，返回与 item_codes 等长的 ndarray，缺失项为 NaN"""
+        return self.frame[column].reindex(self._to_codes(item_codes)).to_numpy()
+
+    def values(self, item_codes, by='revenue'):
+        """批量查询 sales / revenue，缺失项按 0 处理"""
+        return np.nan_to_num(self.lookup(item_codes, by), nan=0.0)
+
+    def revenues(self, item_codes):
+        return self.values(item_codes, 'revenue')
+
+    def sort_order(self, item_codes, by='revenue', ascending=True):
+        """返回按 sales / revenue 排序后的位置下标（稳定排序，取值相同时保持原顺序）"""
+        keys = self.values(item_codes, by)
+        return np.argsort(keys if ascending else -keys, kind='stable')
+
+    def sort_frame(self, items_df, by='revenue', ascending=True, code_col='item_code'):
+        """按 sales / revenue 对一张含商品编号的表排序"""
+        return items_df.iloc[self.sort_order(items_df[code_col], by, ascending)]
+
+    def layer_ranks(self, pog_data, by='revenue'):
+        """一次性计算 pog_data 每行在所在层内的排名（降序，1 为最高，取值相同时按行顺序），返回与 pog_data 对齐的 Series"""
+        keys = pd.Series(self.values(pog_data['item_code'], by), index=pog_data.index)
+        return keys.groupby([pog_data['module_id'], pog_data['layer_id']]).rank(ascending=False, method='first').astype('int64')
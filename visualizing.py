@@ -1,8 +1,25 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 import pandas as pd
 import numpy as np
-plt.rcParams['font.family'] = 'SimHei'
+from item_catalog import ItemCatalog
+from csv_cache import read_csv_cached
+from pog_config import PogConfig
+from pog_log import get_logger
+
+log = get_logger('visualizing')
+
+# matplotlib 只在真正需要绘图时才导入（见 _load_pyplot），导入本模块本身不产生绘图开销
+plt = None
+patches = None
+
+def _load_pyplot():
+    """首次绘图时导入matplotlib并设置中文字体"""
+    global plt, patches
+    if plt is None:
+        import matplotlib.pyplot as pyplot
+        import matplotlib.patches as mpatches
+        pyplot.rcParams['font.family'] = 'SimHei'
+        plt, patches = pyplot, mpatches
+    return plt
 
 def plot_layer_arrangement(shelf_width, layer_items_df):
     """
@@ -21,6 +38,7 @@ def plot_layer_arrangement(shelf_width, layer_items_df):
     matplotlib图形对象
     """
     # 创建图形和坐标轴
+    _load_pyplot()
     fig, ax = plt.subplots(figsize=(15, 8))
     
     # 设置y轴位置（所有商品在同一水平线上）
@@ -109,6 +127,7 @@ def plot_layer_arrangement_rec(shelf_width, layer_items_df):
     """
     增强版货架排列图 - 使用矩形表示每个商品
     """
+    _load_pyplot()
     fig, ax = plt.subplots(figsize=(15, 8))
     
     # 设置y轴位置
@@ -185,36 +204,57 @@ def plot_layer_arrangement_rec(shelf_width, layer_items_df):
     return fig, ax
 
 # 可视化接口：输入三个数据文件、要可视化的module和layer编号、config文件
-def pog_layer_visualize(pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, target_module, target_layer, pog_config_org, option = 'rec'):
+# item_catalog: 可选的ItemCatalog，传入时直接按商品编号查属性，不再逐行筛选三张表
+def pog_layer_visualize(pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, target_module, target_layer, pog_config_org, option = 'rec', item_catalog = None):
+    if item_catalog is None:
+        item_catalog = ItemCatalog(item_attributes, item_attributes_detail, brand_2_brand_label)
+    layer_snapshot = build_layer_snapshot(pog_data, target_module, target_layer, pog_config_org, item_catalog)
+    if layer_snapshot is None:
+        return None
+    return render_layer_snapshot(layer_snapshot, option)
+
+def build_layer_snapshot(pog_data, target_module, target_layer, pog_config_org, item_catalog):
+    """
+    生成某一层的轻量快照（只含基本类型的dict，可序列化），供稍后或在其他进程中调用render_layer_snapshot绘图
+    不导入matplotlib；该层有托盘时返回None
+    """
     layer_mask = (pog_data['module_id'] == target_module) & (pog_data['layer_id'] == target_layer)
-    layer_items = pog_data[layer_mask]
-    for idx in layer_items.index:
-        item_code = layer_items.loc[idx]['item_code']
-        if item_code < 100000:
-            print('error：该层有托盘，暂时无法可视化')
-            return None
-        
-        item_row = item_attributes[item_attributes['ITEM_NBR'] == int(item_code)]
-        item_row_detail = item_attributes_detail[item_attributes_detail['item_idnt'] == int(item_code)]
-        brand = item_row_detail.iloc[0]['brandname_cn']
-        brand_row = brand_2_brand_label[brand_2_brand_label['brand'] == brand]
+    layer_items = pog_data.loc[layer_mask, ['item_code', 'position', 'item_width', 'facing']]
+    if (layer_items['item_code'] < 100000).any():
+        log.warning('error：该层有托盘，暂时无法可视化')
+        return None
 
-        brand_label = brand_row.iloc[0]['brand_label']
-        series = item_row.iloc[0]['SERIES']
-        segment = item_row_detail.iloc[0]['category_name']
-        segment_rank_rule = pog_config_org['segment']['assign_brand_rank']
-        segment_rank = segment_rank_rule[segment]
+    pog_config = PogConfig.ensure(pog_config_org)
+    items = []
+    for item_code, position, item_width, facing in layer_items.itertuples(index = False):
+        item_info = item_catalog.get(item_code)
+        items.append({
+            'item_code': int(item_code),
+            'position': float(position),
+            'item_width': float(item_width),
+            'facing': int(facing),
+            'brand_label': item_info['brand_label'],
+            'brand': item_info['brand'],
+            'series': item_info['series'],
+            'segment': item_info['segment'],
+            'segment_rank': int(pog_config.segment_rank(item_info['segment']))
+        })
+    return {
+        'module_id': int(target_module),
+        'layer_id': int(target_layer),
+        'shelf_width': pog_config.module_width(target_module),
+        'items': items
+    }
 
-        layer_items.loc[idx, 'brand_label'] = brand_label
-        layer_items.loc[idx, 'brand'] = brand
-        layer_items.loc[idx, 'series'] = series
-        layer_items.loc[idx, 'segment'] = segment
-        layer_items.loc[idx, 'segment_rank'] = int(segment_rank)
+def render_layer_snapshot(layer_snapshot, option = 'rec'):
+    """把build_layer_snapshot生成的快照绘制成图，返回fig"""
+    layer_items = pd.DataFrame(layer_snapshot['items'], columns = ['item_code', 'position', 'item_width', 'facing', 'brand_label', 'brand', 'series', 'segment', 'segment_rank'])
     if option == 'rec':
-        fig, ax = plot_layer_arrangement_rec(pog_config_org['global']['module_meter'][target_module - 1], layer_items)
+        fig, ax = plot_layer_arrangement_rec(layer_snapshot['shelf_width'], layer_items)
     elif option == 'line':
-        fig, ax = plot_layer_arrangement(pog_config_org['global']['module_meter'][target_module - 1], layer_items)
-    ax.set_title(f'layer_arrangement(module={target_module},layer={target_layer})', fontsize=14, fontweight='bold')
+        fig = plot_layer_arrangement(layer_snapshot['shelf_width'], layer_items)
+        ax = fig.axes[0]
+    ax.set_title(f"layer_arrangement(module={layer_snapshot['module_id']},layer={layer_snapshot['layer_id']})", fontsize=14, fontweight='bold')
     return fig
 
 # 测试代码
@@ -233,13 +273,11 @@ if __name__ == "__main__":
     
     # # fig1 = plot_layer_arrangement(shelf_width, df)
     # fig2 = plot_layer_arrangement_rec(shelf_width, df)
-    pog_data = pd.read_csv('pog_result.csv')
-    item_attributes = pd.read_csv('pog_test_haircare_test.csv')
-    item_attributes_detail = pd.read_csv('ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv')
-    brand_2_brand_label = pd.read_csv('brand_2_brand_label.csv')
-    with open('config.txt', 'r', encoding='utf-8') as file:
-        content = file.read()
-    pog_config_org = eval(content)
+    pog_data = read_csv_cached('pog_result.csv')
+    item_attributes = read_csv_cached('pog_test_haircare_test.csv')
+    item_attributes_detail = read_csv_cached('ADS_SPAM_SPACE_ITEM_ATTRIBUTE_WTCCN_V.csv')
+    brand_2_brand_label = read_csv_cached('brand_2_brand_label.csv')
+    pog_config_org = PogConfig.load('config.txt')
     pog_layer_visualize(pog_data, item_attributes, item_attributes_detail, brand_2_brand_label, 2, 5, pog_config_org)
     
-    plt.show()
\ No newline at end of file
+    _load_pyplot().show()
\ No newline at end of file